@@ -1,20 +1,226 @@
 from django.contrib import admin
 
-from . import models
+from . import audit, events, models, receiving, tabs
 
 
-class ComponentAdmin(admin.ModelAdmin):
+def get_before(form) -> dict:
+    """
+    Return the initial values of the model fields changed in a form,
+    keyed by attribute name.
+    """
+    fields = {field.name: field for field in form.instance._meta.concrete_fields}
+    return {
+        fields[name].attname: form.initial.get(name)
+        for name in form.changed_data
+        if name in fields
+    }
+
+
+class AuditAdmin(admin.ModelAdmin):
+    """
+    Model admin recording every addition, change and deletion, along
+    with the fields changed, in the audit log.
+    """
+
+    def save_model(self, request, object, form, change):
+        before = get_before(form) if change else None
+        super().save_model(request, object, form, change)
+        audit.record(
+            object,
+            models.AuditEntry.CHANGE if change else models.AuditEntry.CREATE,
+            before,
+        )
+
+    def save_formset(self, request, form, formset, change):
+        before = {
+            inline.instance.pk: get_before(inline)
+            for inline in formset.initial_forms
+            if inline.has_changed()
+        }
+        for inline in formset.deleted_forms:
+            if inline.instance.pk is not None:
+                audit.record(inline.instance, models.AuditEntry.DELETE)
+        super().save_formset(request, form, formset, change)
+        for object in formset.new_objects:
+            audit.record(object, models.AuditEntry.CREATE)
+        for object, _ in formset.changed_objects:
+            audit.record(object, models.AuditEntry.CHANGE, before.get(object.pk))
+
+    def delete_model(self, request, object):
+        audit.record(object, models.AuditEntry.DELETE)
+        super().delete_model(request, object)
+
+    def delete_queryset(self, request, queryset):
+        for object in queryset:
+            audit.record(object, models.AuditEntry.DELETE)
+        super().delete_queryset(request, queryset)
+
+
+class AuditEntryAdmin(admin.ModelAdmin):
+    list_display = ["time", "user", "content_type", "object_id", "action"]
+    list_filter = ["action", "content_type"]
+    search_fields = ["object_id"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, object=None):
+        return False
+
+    def has_delete_permission(self, request, object=None):
+        return False
+
+
+class ArchivableAdmin(AuditAdmin):
+    """
+    Model admin listing archived rows along with active ones, with an
+    action restoring archived rows.
+    """
+
+    list_filter = ["archived"]
+    actions = ["restore"]
+
+    def get_queryset(self, request):
+        queryset = self.model.all_objects.all()
+        ordering = self.get_ordering(request)
+        return queryset.order_by(*ordering) if ordering else queryset
+
+    @admin.action(description="Restore selected archived rows")
+    def restore(self, request, queryset):
+        archived = queryset.filter(archived__isnull=False)
+        for object in archived:
+            object.restore()
+        self.message_user(request, f"Restored {len(archived)} archived rows.")
+
+
+class CustomerAdmin(ArchivableAdmin):
+    list_display = ["__str__", "planet", "uba", "archived"]
+
+
+class TabAdmin(ArchivableAdmin):
+    list_display = ["__str__", "opened", "closed", "archived"]
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == "customer":
+            kwargs["queryset"] = models.Customer.all_objects.all()
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class VoidingAdmin(AuditAdmin):
+    """
+    Model admin voiding the purchases deleted along with its rows, found
+    through purchase_lookup, on the ledgers of their tabs.
+    """
+
+    purchase_lookup = None
+
+    def delete_model(self, request, object):
+        tabs.void_purchases(
+            models.Purchase.objects.filter(**{self.purchase_lookup: object.pk})
+        )
+        super().delete_model(request, object)
+
+    def delete_queryset(self, request, queryset):
+        tabs.void_purchases(
+            models.Purchase.objects.filter(**{f"{self.purchase_lookup}__in": queryset})
+        )
+        super().delete_queryset(request, queryset)
+
+
+class MenuItemCategoryAdmin(VoidingAdmin):
+    purchase_lookup = "item__category"
+
+
+class MenuItemAdmin(VoidingAdmin):
+    purchase_lookup = "item"
+
+
+class PurchaseAdmin(VoidingAdmin):
+    """
+    Model admin recording purchases added or changed on the ledgers of
+    their tabs, as the purchase views do.
+    """
+
+    purchase_lookup = "pk"
+
+    def save_model(self, request, object, form, change):
+        previous = (
+            models.Purchase.objects.select_related("tab").get(pk=object.pk)
+            if change
+            else None
+        )
+        super().save_model(request, object, form, change)
+        if previous:
+            tabs.record_purchase_change(object, previous.tab, previous.amount)
+            events.publish("purchase", sorted({previous.tab_id, object.tab_id}))
+        else:
+            object.tab.record_entry(models.TabEntry.CHARGE, object.amount, object)
+            events.publish("purchase", [object.tab_id])
+
+
+class ComponentAdmin(AuditAdmin):
     fields = ["item", "ingredient", "amount"]
 
     def get_readonly_fields(self, request, object=None):
         return ["item"] if object else []
 
 
-admin.site.register(models.Customer)
-admin.site.register(models.MenuItemCategory)
-admin.site.register(models.MenuItem)
-admin.site.register(models.InventoryItemCategory)
-admin.site.register(models.InventoryItem)
+class TabEntryAdmin(AuditAdmin):
+    list_display = ["tab", "kind", "amount", "balance", "time"]
+    list_filter = ["kind"]
+
+    def has_change_permission(self, request, object=None):
+        return False
+
+    def has_delete_permission(self, request, object=None):
+        return False
+
+
+class ShiftReportAdmin(AuditAdmin):
+    list_display = ["created", "tab_count", "revenue", "comps"]
+
+    def has_change_permission(self, request, object=None):
+        return False
+
+
+class PurchaseOrderLineInline(admin.TabularInline):
+    model = models.PurchaseOrderLine
+
+    def has_add_permission(self, request, object=None):
+        return not (object and object.received)
+
+    def has_change_permission(self, request, object=None):
+        return not (object and object.received)
+
+    def has_delete_permission(self, request, object=None):
+        return not (object and object.received)
+
+
+class PurchaseOrderAdmin(AuditAdmin):
+    list_display = ["supplier", "created", "received"]
+    list_filter = ["received"]
+    inlines = [PurchaseOrderLineInline]
+    actions = ["receive"]
+
+    @admin.action(description="Receive selected purchase orders")
+    def receive(self, request, queryset):
+        orders = queryset.filter(received__isnull=True)
+        for order in orders:
+            receiving.receive(order)
+        self.message_user(request, f"Received {len(orders)} purchase orders.")
+
+
+admin.site.register(models.Customer, CustomerAdmin)
+admin.site.register(models.MenuItemCategory, MenuItemCategoryAdmin)
+admin.site.register(models.MenuItem, MenuItemAdmin)
+admin.site.register(models.PricingRule, AuditAdmin)
+admin.site.register(models.InventoryItemCategory, AuditAdmin)
+admin.site.register(models.InventoryItem, AuditAdmin)
 admin.site.register(models.Component, ComponentAdmin)
-admin.site.register(models.Tab)
-admin.site.register(models.Purchase)
+admin.site.register(models.Tab, TabAdmin)
+admin.site.register(models.Purchase, PurchaseAdmin)
+admin.site.register(models.TabEntry, TabEntryAdmin)
+admin.site.register(models.ShiftReport, ShiftReportAdmin)
+admin.site.register(models.InventoryCount, AuditAdmin)
+admin.site.register(models.PurchaseOrder, PurchaseOrderAdmin)
+admin.site.register(models.AuditEntry, AuditEntryAdmin)
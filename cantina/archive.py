@@ -0,0 +1,80 @@
+import datetime
+import time
+
+from django.db import transaction
+from django.db.models import Q, QuerySet
+
+from .models import Customer, Purchase, Tab, TabEntry, record_deletions
+
+
+def purge(before: datetime.datetime, batch_size: int = 1000, pause: float = 0) -> dict:
+    """
+    Delete customers and tabs archived before the given time along with
+    their purchases and ledger entries. Entries on other tabs for
+    purchases moved off them keep their amounts but lose the purchase,
+    so the balances of those tabs are unchanged. Rows are deleted in
+    batches of at most batch_size, each in its own short transaction,
+    optionally pausing between batches so other traffic is not held up.
+    Return the number of purchases, tabs and customers deleted.
+    """
+    tabs = Tab.all_objects.filter(
+        Q(archived__lte=before) | Q(customer__archived__lte=before)
+    )
+    customers = Customer.all_objects.filter(archived__lte=before).exclude(
+        id__in=Tab.all_objects.values("customer")
+    )
+    delete_in_batches(TabEntry._base_manager.filter(tab__in=tabs), batch_size, pause)
+    return {
+        "purchases": delete_in_batches(
+            Purchase.objects.filter(tab__in=tabs),
+            batch_size,
+            pause,
+            detached=[(TabEntry, "purchase")],
+        ),
+        "tabs": delete_in_batches(tabs, batch_size, pause, [(TabEntry, "tab")]),
+        "customers": delete_in_batches(customers, batch_size, pause),
+    }
+
+
+def delete_in_batches(
+    queryset: QuerySet,
+    batch_size: int,
+    pause: float = 0,
+    dependents: list = (),
+    detached: list = (),
+) -> int:
+    """
+    Delete the rows of a queryset batch by batch with set-based DELETE
+    statements, first deleting rows of dependent (model, field) pairs
+    that reference them and setting the field of detached (model,
+    field) pairs to NULL with a single UPDATE. Rows are not loaded into
+    memory and no signals are sent, but the deletions are recorded so
+    pages built from the tables are rendered again. Return the number
+    of rows deleted.
+    """
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+
+        with transaction.atomic():
+            rows = {}
+            for model, field in dependents:
+                # _raw_delete is the DELETE Django itself issues for fast deletes.
+                rows[model._meta.label] = model._base_manager.filter(
+                    **{f"{field}__in": ids}
+                )._raw_delete(model._base_manager.db)
+            for model, field in detached:
+                model._default_manager.filter(**{f"{field}__in": ids}).update(
+                    **{field: None}
+                )
+            manager = queryset.model._base_manager
+            rows[queryset.model._meta.label] = manager.filter(id__in=ids)._raw_delete(
+                manager.db
+            )
+            deleted += rows[queryset.model._meta.label]
+            record_deletions(rows)
+
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,114 @@
+import contextlib
+import contextvars
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+from .models import AuditEntry
+
+_buffer = contextvars.ContextVar("audit_buffer", default=None)
+
+
+def snapshot(instance: models.Model) -> dict:
+    """
+    Return the value of every concrete field of a model instance, keyed
+    by attribute name and converted to the field's Python type. Fields
+    stamped on every save are left out.
+    """
+    return {
+        field.attname: field.to_python(field.value_from_object(instance))
+        for field in instance._meta.concrete_fields
+        if not getattr(field, "auto_now", False)
+    }
+
+
+def record(instance: models.Model, action: str, before: dict = None) -> None:
+    """
+    Record an action on a model instance along with the fields it
+    changed. Changes are compared with a snapshot taken before the
+    action, limited to the fields in the snapshot. Deletions must be
+    recorded before the instance is deleted. Entries recorded while
+    handling a request are buffered until the end of the request.
+    """
+    after = snapshot(instance)
+    if action == AuditEntry.DELETE:
+        changes = {name: [value, None] for name, value in after.items()}
+    elif before is None:
+        changes = {name: [None, value] for name, value in after.items()}
+    else:
+        changes = {
+            name: [value, after[name]]
+            for name, value in before.items()
+            if value != after[name]
+        }
+        if not changes:
+            return
+
+    entry = AuditEntry(
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+        action=action,
+        changes=changes,
+    )
+    buffer = _buffer.get()
+    if buffer is None:
+        entry.save()
+    else:
+        buffer.append(entry)
+
+
+def start() -> contextvars.Token:
+    """
+    Start buffering audit entries. Return a token for stop().
+    """
+    return _buffer.set([])
+
+
+def flush(user=None) -> None:
+    """
+    Write every buffered audit entry with a single INSERT, attributed to
+    the given user.
+    """
+    buffer = _buffer.get()
+    if buffer:
+        for entry in buffer:
+            entry.user = user
+        AuditEntry.objects.bulk_create(buffer)
+        buffer.clear()
+
+
+def stop(token: contextvars.Token) -> None:
+    """
+    Stop buffering audit entries, discarding any left unwritten.
+    """
+    _buffer.reset(token)
+
+
+@contextlib.contextmanager
+def batch():
+    """
+    Buffer the audit entries recorded in the block and write them with a
+    single INSERT at its end, or hand them to the buffer of the request
+    being handled. The entries are discarded if the block raises, since
+    the transaction it runs in is rolled back.
+    """
+    outer = _buffer.get()
+    token = start()
+    try:
+        yield
+        if outer is None:
+            flush()
+        else:
+            outer.extend(_buffer.get())
+    finally:
+        stop(token)
+
+
+def history(instance: models.Model) -> models.query.QuerySet:
+    """
+    Return the audit entries of a model instance, latest first.
+    """
+    return AuditEntry.objects.filter(
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+    ).order_by("-time", "-id")
@@ -0,0 +1,275 @@
+import decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+
+from . import audit, menu, stocklevels
+from .models import (
+    AuditEntry,
+    Component,
+    InventoryCount,
+    InventoryCountLine,
+    InventoryItem,
+    InventoryItemCategory,
+    Purchase,
+    PurchaseOrderLine,
+)
+
+CENTS = decimal.Decimal("0.01")
+
+
+def expected_stock(items: models.query.QuerySet) -> models.query.QuerySet:
+    """
+    Annotate inventory items with the time and result of their latest
+    count, the bottles received and the bottles used by the recipes of
+    purchases made since then, and the stock expected as a result, all
+    in a single query. Items never counted are expected to hold their
+    current stock.
+    """
+    latest = InventoryCountLine.objects.filter(item=models.OuterRef("pk")).order_by(
+        "-count_id"
+    )
+    usage = (
+        Component.objects.filter(
+            ingredient=models.OuterRef("pk"),
+            item__purchase__time__gt=models.OuterRef("counted_at"),
+        )
+        .values("ingredient")
+        .annotate(
+            total=models.Sum(models.F("item__purchase__quantity") * models.F("amount"))
+        )
+        .values("total")
+    )
+    received = (
+        PurchaseOrderLine.objects.filter(
+            item=models.OuterRef("pk"),
+            order__received__gt=models.OuterRef("counted_at"),
+        )
+        .values("item")
+        .annotate(total=models.Sum("quantity"))
+        .values("total")
+    )
+    ounces = models.Value(decimal.Decimal(settings.OUNCES_PER_BOTTLE))
+    zero = models.Value(decimal.Decimal(0))
+    return items.annotate(
+        counted_at=models.Subquery(latest.values("count__created")[:1]),
+        previous=Coalesce(
+            models.Subquery(latest.values("counted")[:1]), models.F("stock")
+        ),
+    ).annotate(
+        received=Coalesce(models.Subquery(received), zero),
+        usage=Coalesce(
+            models.Subquery(usage, output_field=models.DecimalField()) / ounces, zero
+        ),
+        expected=models.F("previous") + models.F("received") - models.F("usage"),
+    )
+
+
+def record_count(category: InventoryItemCategory, counted: dict) -> InventoryCount:
+    """
+    Store a count of an inventory category, given the bottles counted
+    by inventory item id, along with the variance of every item from
+    its expected stock. The counted stock is applied with a single
+    UPDATE and recorded in the audit log. Return the count.
+    """
+    with transaction.atomic(), audit.batch():
+        items = list(expected_stock(category.inventoryitem_set.filter(id__in=counted)))
+        count = InventoryCount.objects.create(category=category)
+        audit.record(count, AuditEntry.CREATE)
+        lines = []
+        for item in items:
+            before = audit.snapshot(item)
+            item.stock = counted[item.id]
+            audit.record(item, AuditEntry.CHANGE, before)
+            expected = item.expected.quantize(CENTS)
+            lines.append(
+                InventoryCountLine(
+                    count=count,
+                    item=item,
+                    expected=expected,
+                    counted=item.stock,
+                    variance=item.stock - expected,
+                )
+            )
+        InventoryItem.objects.bulk_update(items, ["stock"])
+        InventoryCountLine.objects.bulk_create(lines)
+        stock_changed([item.id for item in items])
+    return count
+
+
+def stock_changed(ingredients: list[int]) -> None:
+    """
+    Record the stock levels of the given inventory items and publish
+    the menu after their stock was changed in bulk, which sends no
+    signals.
+    """
+    stocklevels.record_levels(
+        dict(
+            InventoryItem.objects.filter(id__in=ingredients).values_list("id", "stock")
+        )
+    )
+    menu.schedule_publish()
+
+
+def shrinkage(category: InventoryItemCategory, since=None) -> list[dict]:
+    """
+    Return the theoretical and actual usage of every item of an
+    inventory category over each period between consecutive counts,
+    flagging items used more or less than their recipes account for.
+    Periods are cached once measured under a version of their
+    purchases, so only new periods and periods whose purchases were
+    added, changed or deleted since are measured again.
+    """
+    counts = category.inventorycount_set.order_by("created", "id")
+    if since is not None:
+        counts = counts.filter(created__gte=since)
+    counts = list(counts)
+    periods = list(zip(counts, counts[1:]))
+    if not periods:
+        return []
+
+    versions = get_versions(periods)
+    keys = [
+        f"shrinkage-{start.id}-{end.id}-{versions.get(index, '')}"
+        for index, (start, end) in enumerate(periods)
+    ]
+    results = cache.get_many(keys)
+    missing = [period for key, period in zip(keys, periods) if key not in results]
+    if missing:
+        measured = dict(
+            zip([key for key in keys if key not in results], measure(missing))
+        )
+        cache.set_many(measured, None)
+        results.update(measured)
+    return [results[key] for key in keys]
+
+
+def get_versions(periods: list[tuple]) -> dict[int, str]:
+    """
+    Return a version of the purchases made during each period with any,
+    keyed by period index, from their latest update and their number,
+    which catches deletions, in one grouped query.
+    """
+    purchases = (
+        Purchase.objects.filter(
+            time__gt=periods[0][0].created, time__lte=periods[-1][1].created
+        )
+        .annotate(period=bucket(periods, "time"))
+        .filter(period__isnull=False)
+        .order_by()
+        .values("period")
+        .annotate(latest=models.Max("updated_at"), rows=models.Count("id"))
+    )
+    return {
+        row["period"]: f"{row['latest'].timestamp()}-{row['rows']}" for row in purchases
+    }
+
+
+def measure(periods: list[tuple]) -> list[dict]:
+    """
+    Return the theoretical and actual usage of every counted item over
+    each of the given periods, as pairs of counts. Actual usage accounts
+    for deliveries received during a period. Theoretical usage and
+    deliveries for all periods are each read with one grouped query.
+    """
+    lines = InventoryCountLine.objects.filter(
+        count__in=[count for period in periods for count in period]
+    ).values_list("count", "item", "item__name", "counted")
+    counted = {}
+    for count, item, name, stock in lines:
+        counted.setdefault(count, {})[item] = (name, stock)
+
+    category = periods[0][0].category_id
+    usage = (
+        Component.objects.filter(
+            ingredient__category=category,
+            item__purchase__time__gt=periods[0][0].created,
+            item__purchase__time__lte=periods[-1][1].created,
+        )
+        .annotate(period=bucket(periods, "item__purchase__time"))
+        .filter(period__isnull=False)
+        .order_by()
+        .values("period", "ingredient")
+        .annotate(
+            total=models.Sum(models.F("item__purchase__quantity") * models.F("amount"))
+        )
+    )
+    ounces = decimal.Decimal(settings.OUNCES_PER_BOTTLE)
+    theoretical = {
+        (row["period"], row["ingredient"]): row["total"] / ounces for row in usage
+    }
+    deliveries = (
+        PurchaseOrderLine.objects.filter(
+            item__category=category,
+            order__received__gt=periods[0][0].created,
+            order__received__lte=periods[-1][1].created,
+        )
+        .annotate(period=bucket(periods, "order__received"))
+        .filter(period__isnull=False)
+        .order_by()
+        .values("period", "item")
+        .annotate(total=models.Sum("quantity"))
+    )
+    received = {(row["period"], row["item"]): row["total"] for row in deliveries}
+
+    return [
+        {
+            "start": start.created,
+            "end": end.created,
+            "items": [
+                compare(
+                    item,
+                    name,
+                    theoretical.get((index, item), 0),
+                    counted[start.id][item][1] + received.get((index, item), 0) - stock,
+                )
+                for item, (name, stock) in counted.get(end.id, {}).items()
+                if item in counted.get(start.id, {})
+            ],
+        }
+        for index, (start, end) in enumerate(periods)
+    ]
+
+
+def bucket(periods: list[tuple], field: str) -> models.Case:
+    """
+    Return a CASE expression giving the index of the period a time field
+    falls in, or NULL if it falls in none of them.
+    """
+    return models.Case(
+        *[
+            models.When(
+                **{f"{field}__gt": start.created, f"{field}__lte": end.created},
+                then=models.Value(index),
+            )
+            for index, (start, end) in enumerate(periods)
+        ],
+        output_field=models.IntegerField(),
+    )
+
+
+def compare(item: int, name: str, theoretical, actual) -> dict:
+    """
+    Return the theoretical and actual usage of an item along with their
+    variance, flagged as over or under when it exceeds the shrinkage
+    tolerance.
+    """
+    theoretical = decimal.Decimal(theoretical).quantize(CENTS)
+    variance = actual - theoretical
+    tolerance = decimal.Decimal(settings.SHRINKAGE_TOLERANCE) * theoretical
+    if variance > tolerance:
+        flag = "over"
+    elif variance < -tolerance:
+        flag = "under"
+    else:
+        flag = ""
+    return {
+        "id": item,
+        "name": name,
+        "theoretical": theoretical,
+        "actual": actual,
+        "variance": variance,
+        "flag": flag,
+    }
@@ -1,30 +1,64 @@
-from . import forms, models
+from . import forms, models, tabs
 
+# The pages of each table are rendered from the rows of its "depends" models,
+# which must inherit TimestampedModel so the pages can be revalidated.
 objects = {
     "customers": {
         "model": models.Customer,
         "form": forms.CustomerForm,
+        "depends": [models.Customer, models.Tab, models.Purchase],
     },
     "menu": {
         "model": models.MenuItem,
         "categories": models.MenuItemCategory,
         "form": forms.MenuItemForm,
+        "depends": [
+            models.MenuItemCategory,
+            models.MenuItem,
+            models.Component,
+            models.InventoryItem,
+        ],
     },
     "inventory": {
         "model": models.InventoryItem,
         "categories": models.InventoryItemCategory,
         "form": forms.InventoryItemForm,
+        "depends": [models.InventoryItemCategory, models.InventoryItem],
     },
     "components": {
         "model": models.Component,
         "form": forms.ComponentForm,
+        "depends": [models.Component, models.MenuItem, models.InventoryItem],
     },
     "tabs": {
         "model": models.Tab,
         "form": forms.TabForm,
+        "depends": [
+            models.Tab,
+            models.Customer,
+            models.TabEntry,
+            models.Purchase,
+            models.MenuItem,
+        ],
     },
     "purchases": {
         "model": models.Purchase,
         "form": forms.PurchaseForm,
+        "depends": [models.Purchase, models.Tab, models.Customer, models.MenuItem],
+    },
+}
+
+tab_operations = {
+    "split": {
+        "form": forms.SplitTabForm,
+        "function": tabs.split,
+    },
+    "merge": {
+        "form": forms.MergeTabForm,
+        "function": tabs.merge,
+    },
+    "transfer": {
+        "form": forms.TransferTabForm,
+        "function": tabs.transfer,
     },
 }
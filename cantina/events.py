@@ -0,0 +1,140 @@
+import asyncio
+import functools
+import json
+import uuid
+
+import psycopg
+from psycopg.conninfo import make_conninfo
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+CHANNEL = "cantina_events"
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more.
+PAYLOAD_LIMIT = 7999
+
+_origin = uuid.uuid4().hex
+_subscribers = set()
+_loop = None
+_listener = None
+
+
+def publish(kind: str, tabs: list[int] = None) -> None:
+    """
+    Publish an event about the given tabs, or about every tab, to the
+    live streams once the current transaction commits. Streams in this
+    process receive it directly; on PostgreSQL it is also sent with
+    NOTIFY, which is delivered on commit, to streams in other processes.
+    """
+    payload = json.dumps({"type": kind, "tabs": tabs, "origin": _origin})
+    if len(payload.encode()) > PAYLOAD_LIMIT:
+        payload = json.dumps({"type": kind, "tabs": None, "origin": _origin})
+
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, payload])
+    transaction.on_commit(functools.partial(_relay, payload))
+
+
+def format_event(payload: str) -> str:
+    """
+    Return an event payload framed as a server-sent event named after
+    the event type.
+    """
+    return f"event: {json.loads(payload)['type']}\ndata: {payload}\n\n"
+
+
+async def stream():
+    """
+    Yield server-sent events for every event published while the stream
+    is open, with a comment line whenever the stream has been quiet for
+    EVENTS_KEEPALIVE seconds so proxies keep the connection open.
+    """
+    queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+    _subscribe(queue)
+    try:
+        yield f"retry: {settings.EVENTS_RETRY * 1000}\n\n"
+        while True:
+            try:
+                payload = await asyncio.wait_for(queue.get(), settings.EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+            else:
+                yield format_event(payload)
+    finally:
+        _unsubscribe(queue)
+
+
+async def listen() -> None:
+    """
+    Relay events published by other processes to the streams of this
+    process, reconnecting to the database whenever the connection is
+    lost.
+    """
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(
+                _conninfo(), autocommit=True
+            ) as listener:
+                await listener.execute(f"LISTEN {CHANNEL}")
+                async for notify in listener.notifies():
+                    if json.loads(notify.payload)["origin"] != _origin:
+                        _dispatch(notify.payload)
+        except psycopg.OperationalError:
+            await asyncio.sleep(settings.EVENTS_RETRY)
+
+
+def _subscribe(queue: asyncio.Queue) -> None:
+    """
+    Add a queue to the streams of this process and start listening for
+    events from other processes when it is the first one.
+    """
+    global _loop, _listener
+    _loop = asyncio.get_running_loop()
+    _subscribers.add(queue)
+    if connections["default"].vendor == "postgresql" and _listener is None:
+        _listener = asyncio.create_task(listen())
+
+
+def _unsubscribe(queue: asyncio.Queue) -> None:
+    """
+    Remove a queue from the streams of this process and stop listening
+    for events from other processes when it was the last one.
+    """
+    global _listener
+    _subscribers.discard(queue)
+    if not _subscribers and _listener is not None:
+        _listener.cancel()
+        _listener = None
+
+
+def _relay(payload: str) -> None:
+    """
+    Hand an event published by a request thread to the event loop
+    serving the streams of this process, if there is one.
+    """
+    if _loop is not None and not _loop.is_closed():
+        _loop.call_soon_threadsafe(_dispatch, payload)
+
+
+def _dispatch(payload: str) -> None:
+    """
+    Queue an event on every stream of this process, skipping streams
+    too far behind to keep up.
+    """
+    for queue in _subscribers:
+        if not queue.full():
+            queue.put_nowait(payload)
+
+
+def _conninfo() -> str:
+    """
+    Return a connection string for the default database.
+    """
+    database = settings.DATABASES["default"]
+    return make_conninfo(
+        dbname=database["NAME"],
+        user=database["USER"] or None,
+        password=database["PASSWORD"] or None,
+        host=database["HOST"] or None,
+        port=database["PORT"] or None,
+    )
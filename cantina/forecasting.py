@@ -0,0 +1,94 @@
+import datetime
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+from .inventory import get_recipes
+from .models import Purchase
+
+
+def daily_usage(since: datetime.date = None) -> tuple:
+    """
+    Return the first day of purchase history, the ids of the
+    ingredients used in recipes and an array of the bottles of each of
+    those ingredients used on every day since then. Daily sales of
+    every menu item are read as plain rows and converted into
+    ingredient usage with a single product by the recipe matrix.
+    """
+    recipes = get_recipes()
+    sales = Purchase.objects.annotate(day=TruncDate("time")).filter(
+        item__in=recipes.items
+    )
+    if since is not None:
+        sales = sales.filter(day__gte=since)
+    rows = list(sales.order_by().values_list("day", "item").annotate(Sum("quantity")))
+    if not rows:
+        return since, recipes.ingredients, np.zeros((0, len(recipes.ingredients)))
+
+    first = min(day for day, _, _ in rows)
+    days = (max(day for day, _, _ in rows) - first).days + 1
+    items = {item: index for index, item in enumerate(recipes.items)}
+    quantities = np.zeros((days, len(items)))
+    for day, item, quantity in rows:
+        quantities[(day - first).days, items[item]] = quantity
+    return first, recipes.ingredients, recipes.multiply(quantities)
+
+
+def fit(usage: np.ndarray, weekday: int) -> tuple:
+    """
+    Fit exponential smoothing with weekday seasonality to the daily
+    usage of every ingredient at once, the first day of usage falling
+    on the given weekday. Return the final level and weekday seasons of
+    every ingredient along with the standard deviation of its one-day
+    forecast errors.
+    """
+    alpha, gamma = settings.FORECAST_ALPHA, settings.FORECAST_GAMMA
+    level = usage[:7].mean(axis=0)
+    seasons = np.zeros((7, usage.shape[1]))
+    for day in range(min(7, len(usage))):
+        seasons[(weekday + day) % 7] = usage[day] - level
+
+    errors = np.zeros(usage.shape[1])
+    for day in range(7, len(usage)):
+        season = (weekday + day) % 7
+        errors += (usage[day] - level - seasons[season]) ** 2
+        previous = level
+        level = alpha * (usage[day] - seasons[season]) + (1 - alpha) * previous
+        seasons[season] = gamma * (usage[day] - level) + (1 - gamma) * seasons[season]
+    deviation = np.sqrt(errors / max(len(usage) - 7, 1))
+    return level, seasons, deviation
+
+
+def project(level: np.ndarray, seasons: np.ndarray, weekday: int, days: int):
+    """
+    Return the forecast usage of every ingredient on each of the given
+    number of days, starting on the given weekday.
+    """
+    weekdays = (weekday + np.arange(days)) % 7
+    return np.clip(level + seasons[weekdays], 0, None)
+
+
+def suggest_reorders(since: datetime.date = None) -> dict:
+    """
+    Return suggested reorder points and amounts, by ingredient id. The
+    reorder point covers forecast usage over the lead time plus safety
+    stock for forecast errors, and the reorder amount covers forecast
+    usage over an ordering cycle.
+    """
+    first, ingredients, usage = daily_usage(since)
+    if not len(usage):
+        return {}
+
+    level, seasons, deviation = fit(usage, first.weekday())
+    weekday = (first.weekday() + len(usage)) % 7
+    lead, cycle = settings.REORDER_LEAD_DAYS, settings.REORDER_CYCLE_DAYS
+    forecast = project(level, seasons, weekday, max(lead, cycle))
+    safety = settings.REORDER_SAFETY_FACTOR * deviation * np.sqrt(lead)
+    points = np.ceil(np.round(forecast[:lead].sum(axis=0) + safety, 6))
+    amounts = np.ceil(np.round(forecast[:cycle].sum(axis=0), 6))
+    return {
+        ingredient: (int(point), int(amount))
+        for ingredient, point, amount in zip(ingredients, points, amounts)
+    }
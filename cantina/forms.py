@@ -1,3 +1,5 @@
+import uuid
+
 from django import forms
 
 from . import models
@@ -36,10 +38,29 @@ class ComponentForm(forms.ModelForm):
 
 class PurchaseForm(forms.ModelForm):
     customer = forms.ModelChoiceField(queryset=models.Customer.objects.all())
+    idempotency_key = forms.CharField(
+        max_length=64,
+        required=False,
+        initial=lambda: uuid.uuid4().hex,
+        widget=forms.HiddenInput,
+    )
 
     class Meta:
         model = models.Purchase
-        fields = ["customer", "item", "quantity"]
+        fields = ["customer", "item", "quantity", "idempotency_key"]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        item, quantity = cleaned_data.get("item"), cleaned_data.get("quantity")
+
+        if item and quantity and not self.instance.pk:
+            makeable = item.get_makeable()
+            if makeable == 0:
+                raise forms.ValidationError(f"{item.name} is unavailable.")
+            elif makeable is not None and quantity > makeable:
+                raise forms.ValidationError(f"Only {makeable} {item.name} can be made.")
+
+        return cleaned_data
 
 
 class TabForm(forms.ModelForm):
@@ -50,3 +71,82 @@ class TabForm(forms.ModelForm):
             "due": forms.DateTimeInput(attrs={"type": "datetime-local"}),
             "closed": forms.DateTimeInput(attrs={"type": "datetime-local"}),
         }
+
+
+class SplitTabForm(forms.Form):
+    purchases = forms.ModelMultipleChoiceField(
+        queryset=models.Purchase.objects.none(),
+        widget=forms.CheckboxSelectMultiple,
+    )
+    customer = forms.ModelChoiceField(
+        queryset=models.Customer.objects.all(),
+        required=False,
+        help_text="Leave blank to split onto a new tab for the same customer.",
+    )
+
+    def __init__(self, tab, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["purchases"].queryset = tab.get_purchases()
+
+
+class MergeTabForm(forms.Form):
+    target = forms.ModelChoiceField(
+        queryset=models.Tab.objects.none(), label="Merge into"
+    )
+
+    def __init__(self, tab, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["target"].queryset = models.Tab.objects.filter(
+            closed__isnull=True
+        ).exclude(pk=tab.pk)
+
+
+class TransferTabForm(forms.Form):
+    customer = forms.ModelChoiceField(queryset=models.Customer.objects.all())
+
+    def __init__(self, tab, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["customer"].queryset = models.Customer.objects.exclude(
+            pk=tab.customer_id
+        )
+
+
+class CloseOutForm(forms.Form):
+    tabs = forms.ModelMultipleChoiceField(
+        queryset=models.Tab.objects.filter(closed__isnull=True),
+        widget=forms.CheckboxSelectMultiple,
+        required=False,
+        help_text="Leave blank to close every open tab.",
+    )
+
+
+class EventPlanForm(forms.Form):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.items = models.MenuItem.objects.filter(component__isnull=False).distinct()
+        for item in self.items:
+            self.fields[f"item_{item.id}"] = forms.IntegerField(
+                label=item.name, min_value=0, required=False
+            )
+
+    def get_order_mix(self) -> dict:
+        """
+        Return the expected quantity of every menu item, by id.
+        """
+        return {
+            item.id: self.cleaned_data[f"item_{item.id}"]
+            for item in self.items
+            if self.cleaned_data[f"item_{item.id}"]
+        }
+
+
+class CountForm(forms.ModelForm):
+    class Meta:
+        model = models.InventoryItem
+        fields = ["stock"]
+        labels = {"stock": "Counted"}
+
+
+CountSheetFormSet = forms.modelformset_factory(
+    models.InventoryItem, form=CountForm, extra=0
+)
@@ -0,0 +1,210 @@
+import decimal
+import math
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Min, Sum, Value, Window
+from django.db.models.functions import Floor
+
+from .models import (
+    Component,
+    InventoryItem,
+    InventoryItemCategory,
+    MenuItem,
+    get_version,
+)
+
+VALUATION_KEY = "inventory-valuation"
+MAKEABLE_KEY = "menu-makeable"
+
+_recipes = None
+
+
+def build_valuation() -> dict:
+    """
+    Return the value of every inventory item along with subtotals per
+    category and a grand total. Item values, subtotals and the total
+    are all computed by the database in a single query.
+    """
+    value = F("stock") * F("cost")
+    items = (
+        InventoryItem.objects.order_by("category__name", "name")
+        .values("id", "name", "stock", "cost", "category", "category__name")
+        .annotate(
+            value=value,
+            subtotal=Window(Sum(value), partition_by=F("category")),
+            total=Window(Sum(value)),
+        )
+    )
+
+    categories, total = {}, 0
+    for item in items:
+        category = categories.setdefault(
+            item["category"],
+            {
+                "id": item["category"],
+                "name": item["category__name"],
+                "items": [],
+                "subtotal": item["subtotal"],
+            },
+        )
+        category["items"].append(
+            {key: item[key] for key in ["id", "name", "stock", "cost", "value"]}
+        )
+        total = item["total"]
+    return {"categories": list(categories.values()), "total": total}
+
+
+def get_valuation() -> dict:
+    """
+    Return the inventory valuation. It is cached under the version of
+    the inventory items and categories in the database, so a change
+    made by any process is picked up by all.
+    """
+    _, version = get_version([InventoryItemCategory, InventoryItem])
+    key = f"{VALUATION_KEY}-{version}"
+    valuation = cache.get(key)
+    if valuation is None:
+        valuation = build_valuation()
+        cache.set(key, valuation)
+    return valuation
+
+
+def count_makeable(items: list[int] = None) -> dict:
+    """
+    Return how many more servings of each menu item, or of the given
+    menu items, can be made from the current stock, by menu item id.
+    Counts for the whole menu are computed in a single query. Menu
+    items without ingredients are left out since they can always be
+    made.
+    """
+    ounces = Value(decimal.Decimal(settings.OUNCES_PER_BOTTLE))
+    components = Component.objects.filter(amount__gt=0)
+    if items is not None:
+        components = components.filter(item__in=items)
+    counts = (
+        components.order_by()
+        .values("item")
+        .annotate(makeable=Min(Floor(F("ingredient__stock") * ounces / F("amount"))))
+    )
+    return {count["item"]: max(int(count["makeable"]), 0) for count in counts}
+
+
+def get_makeable() -> dict:
+    """
+    Return how many more servings of each menu item can be made, by
+    menu item id. The counts are cached under the version of the menu
+    items, components and inventory items in the database, so a change
+    made by any process is picked up by all.
+    """
+    _, version = get_version([InventoryItem, Component, MenuItem])
+    key = f"{MAKEABLE_KEY}-{version}"
+    counts = cache.get(key)
+    if counts is None:
+        counts = count_makeable()
+        cache.set(key, counts)
+    return counts
+
+
+def annotate_makeable(items) -> list:
+    """
+    Return the given menu items with how many more servings of each can
+    be made set as its makeable attribute, looking the counts up once.
+    """
+    counts = get_makeable()
+    items = list(items)
+    for item in items:
+        item.makeable = counts.get(item.id)
+    return items
+
+
+class RecipeMatrix:
+    """
+    Sparse menu item by ingredient matrix of the bottles of each
+    ingredient used per serving, stored as parallel arrays of rows,
+    columns and amounts.
+    """
+
+    def __init__(self, components: list[tuple], version: str = None):
+        self.version = version
+        ounces = decimal.Decimal(settings.OUNCES_PER_BOTTLE)
+        self.items = sorted({item for item, _, _ in components})
+        self.ingredients = sorted({ingredient for _, ingredient, _ in components})
+        rows = {item: index for index, item in enumerate(self.items)}
+        columns = {
+            ingredient: index for index, ingredient in enumerate(self.ingredients)
+        }
+        self.rows = np.array([rows[item] for item, _, _ in components], dtype=int)
+        self.columns = np.array(
+            [columns[ingredient] for _, ingredient, _ in components], dtype=int
+        )
+        self.amounts = np.array([float(amount / ounces) for _, _, amount in components])
+
+    def multiply(self, quantities: np.ndarray) -> np.ndarray:
+        """
+        Return the bottles of every ingredient needed for the given
+        servings of every menu item. The last axis of the quantities
+        follows the items of the matrix and the last axis of the result
+        follows its ingredients.
+        """
+        quantities = np.asarray(quantities, dtype=float)
+        need = np.zeros(quantities.shape[:-1] + (len(self.ingredients),))
+        np.add.at(need.T, self.columns, (quantities[..., self.rows] * self.amounts).T)
+        return need
+
+
+def get_recipes() -> RecipeMatrix:
+    """
+    Return the recipe matrix of the whole menu. The matrix is only
+    rebuilt when the version of the components in the database changes,
+    so a recipe edited by any process is picked up by all.
+    """
+    global _recipes
+    _, version = get_version([Component])
+    if _recipes is None or _recipes.version != version:
+        components = Component.objects.values_list("item", "ingredient", "amount")
+        _recipes = RecipeMatrix(list(components), version)
+    return _recipes
+
+
+def plan_requirements(order_mix: dict) -> dict:
+    """
+    Return the bottles of every ingredient needed for an expected order
+    mix of menu item ids and quantities, compared with current stock.
+    Ingredients short of stock list the cost of the whole bottles
+    needed to cover the shortfall.
+    """
+    recipes = get_recipes()
+    quantities = np.zeros(len(recipes.items))
+    for index, item in enumerate(recipes.items):
+        quantities[index] = order_mix.get(item, 0)
+    need = recipes.multiply(quantities)
+
+    needed = {
+        ingredient: decimal.Decimal(str(round(amount, 2)))
+        for ingredient, amount in zip(recipes.ingredients, need)
+        if amount > 0
+    }
+    ingredients, total = [], decimal.Decimal(0)
+    for item in InventoryItem.objects.filter(id__in=needed):
+        shortfall = max(needed[item.id] - item.stock, 0)
+        cost = math.ceil(shortfall) * item.cost
+        total += cost
+        ingredients.append(
+            {
+                "id": item.id,
+                "name": item.name,
+                "need": needed[item.id],
+                "stock": item.stock,
+                "shortfall": shortfall,
+                "cost": cost,
+            }
+        )
+    return {
+        "ingredients": ingredients,
+        "shortfalls": [
+            ingredient for ingredient in ingredients if ingredient["shortfall"]
+        ],
+        "total": total,
+    }
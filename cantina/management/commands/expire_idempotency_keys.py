@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cantina.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete order idempotency keys older than the given number of days."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timezone.timedelta(days=options["days"])
+        deleted = IdempotencyKey.expire(before, batch_size=options["batch_size"])
+        self.stdout.write(f"Expired {deleted} idempotency keys.")
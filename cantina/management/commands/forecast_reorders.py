@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cantina.forecasting import suggest_reorders
+from cantina.models import InventoryItem
+
+
+class Command(BaseCommand):
+    help = "Suggest reorder points and amounts from forecast ingredient usage."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Only forecast from this many days of purchase history.",
+        )
+        parser.add_argument(
+            "--apply",
+            action="store_true",
+            help="Save the suggestions instead of only listing them.",
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options["days"]:
+            since = timezone.localdate() - timezone.timedelta(days=options["days"])
+
+        suggestions = suggest_reorders(since)
+        items = InventoryItem.objects.filter(id__in=suggestions)
+        for item in items:
+            point, amount = suggestions[item.id]
+            self.stdout.write(
+                f"{item.name}: reorder point {item.reorder_point} -> {point}, "
+                f"reorder amount {item.reorder_amount} -> {amount}"
+            )
+            item.reorder_point, item.reorder_amount = point, amount
+
+        if options["apply"]:
+            InventoryItem.objects.bulk_update(
+                items, ["reorder_point", "reorder_amount"]
+            )
+            self.stdout.write(f"Updated {len(items)} inventory items.")
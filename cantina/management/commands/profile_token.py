@@ -0,0 +1,12 @@
+from django.core import signing
+from django.core.management.base import BaseCommand
+
+from cantina.middleware import ProfilingMiddleware
+
+
+class Command(BaseCommand):
+    help = "Print a signed token that enables profiling of requests sending it."
+
+    def handle(self, *args, **options):
+        signer = signing.TimestampSigner(salt=ProfilingMiddleware.salt)
+        self.stdout.write(signer.sign("profile"))
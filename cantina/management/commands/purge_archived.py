@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cantina.archive import purge
+
+
+class Command(BaseCommand):
+    help = "Delete archived customers and tabs along with their purchases, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=30,
+            help="Only purge rows archived this long ago.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--pause", type=float, default=0.1, help="Seconds to wait between batches."
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timezone.timedelta(days=options["days"])
+        counts = purge(before, options["batch_size"], options["pause"])
+        self.stdout.write(
+            f"Purged {counts['purchases']} purchases, {counts['tabs']} tabs and "
+            f"{counts['customers']} customers."
+        )
@@ -0,0 +1,25 @@
+import decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cantina.models import MenuItemCategory
+from cantina.pricing import reprice
+
+
+class Command(BaseCommand):
+    help = "Change the price of every item in a menu category."
+
+    def add_arguments(self, parser):
+        parser.add_argument("category", help="Name of the menu category.")
+        change = parser.add_mutually_exclusive_group(required=True)
+        change.add_argument("--percent", type=decimal.Decimal)
+        change.add_argument("--amount", type=decimal.Decimal)
+
+    def handle(self, *args, **options):
+        try:
+            category = MenuItemCategory.objects.get(name=options["category"])
+        except MenuItemCategory.DoesNotExist:
+            raise CommandError(f"Menu category {options['category']} does not exist.")
+
+        count = reprice(category, percent=options["percent"], amount=options["amount"])
+        self.stdout.write(f"Repriced {count} {category.name} items.")
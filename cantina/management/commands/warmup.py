@@ -0,0 +1,66 @@
+import argparse
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from cantina.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = "Import views, resolve URLs, compile templates and open connections."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--measure",
+            metavar="PATH",
+            help="Compare the first request to PATH in a cold and a warm process.",
+        )
+        parser.add_argument("--first-request", help=argparse.SUPPRESS)
+        parser.add_argument("--cold", action="store_true", help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options["first_request"]:
+            if not options["cold"]:
+                warm_up()
+            self.stdout.write(f"{self.time_request(options['first_request']):.6f}")
+        elif options["measure"]:
+            cold = self.time_child(options["measure"], cold=True)
+            warm = self.time_child(options["measure"])
+            self.stdout.write(f"Cold first request: {cold * 1000:.1f} ms")
+            self.stdout.write(f"Warm first request: {warm * 1000:.1f} ms")
+        else:
+            start = time.perf_counter()
+            counts = warm_up()
+            self.stdout.write(
+                f"Warmed {counts['urls']} URLs, {counts['templates']} templates "
+                f"and {counts['connections']} connections in "
+                f"{(time.perf_counter() - start) * 1000:.1f} ms."
+            )
+
+    def time_request(self, path: str) -> float:
+        """
+        Return the number of seconds taken to serve a GET request.
+        """
+        client = Client()
+        start = time.perf_counter()
+        client.get(path)
+        return time.perf_counter() - start
+
+    def time_child(self, path: str, cold: bool = False) -> float:
+        """
+        Return the number of seconds a fresh process takes to serve its
+        first request, optionally warming up beforehand.
+        """
+        command = [sys.executable, "-m", "django", "warmup", "--first-request", path]
+        output = subprocess.run(
+            command + (["--cold"] if cold else []),
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        return float(output.strip().splitlines()[-1])
@@ -0,0 +1,127 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Subquery
+
+from . import inventory
+from .models import MenuItem, MenuItemCategory, MenuSnapshot
+
+
+def build_document() -> dict:
+    """
+    Return the whole menu as a document of categories, each with its
+    items, prices and availability. An item is unavailable if not a
+    single serving of it can be made from the current stock.
+    """
+    makeable = inventory.count_makeable()
+    categories = {
+        category["id"]: dict(category, items=[])
+        for category in MenuItemCategory.objects.values("id", "name")
+    }
+    for item in MenuItem.objects.values("id", "name", "price", "category"):
+        categories[item.pop("category")]["items"].append(
+            dict(
+                item,
+                price=str(item["price"]),
+                available=makeable.get(item["id"]) != 0,
+            )
+        )
+    return {"categories": list(categories.values())}
+
+
+def publish() -> MenuSnapshot:
+    """
+    Store a new version of the menu if it differs from the latest one
+    and prune versions beyond MENU_SNAPSHOT_HISTORY. Return the latest
+    snapshot.
+    """
+    document = build_document()
+    with transaction.atomic():
+        latest = MenuSnapshot.objects.select_for_update().order_by("-id").first()
+        if latest and latest.document == document:
+            return latest
+        snapshot = MenuSnapshot.objects.create(document=document)
+        history = settings.MENU_SNAPSHOT_HISTORY
+        versions = MenuSnapshot.objects.order_by("-id").values_list("id", flat=True)
+        stale = versions[history:][:1]
+        MenuSnapshot.objects.filter(id__lte=Subquery(stale)).delete()
+    return snapshot
+
+
+def schedule_publish(**kwargs) -> None:
+    """
+    Signal receiver publishing a new version of the menu once the
+    current transaction commits.
+    """
+    transaction.on_commit(publish)
+
+
+def latest_version() -> int:
+    """
+    Return the latest version of the menu, publishing the first one if
+    none exists yet.
+    """
+    version = MenuSnapshot.objects.order_by("-id").values_list("id", flat=True)
+    return version.first() or publish().id
+
+
+def get_document(version: int) -> dict:
+    """
+    Return the menu document of a version, or None if it has been
+    pruned. Documents never change once published, so they are cached
+    by version.
+    """
+    key = f"menu-snapshot-{version}"
+    document = cache.get(key)
+    if document is None:
+        snapshot = MenuSnapshot.objects.filter(id=version).first()
+        if snapshot is None:
+            return None
+        document = snapshot.document
+        cache.set(key, document, None)
+    return document
+
+
+def get_delta(since: int, version: int) -> dict:
+    """
+    Return the categories and items added or changed since an earlier
+    version along with the ids of those removed, or None if the
+    earlier version has been pruned.
+    """
+    previous, current = get_document(since), get_document(version)
+    if previous is None:
+        return None
+
+    old_categories, new_categories = _categories(previous), _categories(current)
+    old_items, new_items = _items(previous), _items(current)
+    return {
+        "categories": [
+            category
+            for id, category in new_categories.items()
+            if old_categories.get(id) != category
+        ],
+        "removed_categories": sorted(old_categories.keys() - new_categories.keys()),
+        "items": [item for id, item in new_items.items() if old_items.get(id) != item],
+        "removed_items": sorted(old_items.keys() - new_items.keys()),
+    }
+
+
+def _categories(document: dict) -> dict:
+    """
+    Return the id and name of every category of a document, by id.
+    """
+    return {
+        category["id"]: {"id": category["id"], "name": category["name"]}
+        for category in document["categories"]
+    }
+
+
+def _items(document: dict) -> dict:
+    """
+    Return every item of a document along with its category, by id.
+    """
+    return {
+        item["id"]: dict(item, category=category["id"])
+        for category in document["categories"]
+        for item in category["items"]
+    }
@@ -0,0 +1,142 @@
+import contextvars
+import threading
+import time
+
+from .data import objects
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_lock = threading.Lock()
+_series = {}
+_template_time = contextvars.ContextVar("template_time", default=None)
+
+
+class Series:
+    """
+    Request measurements accumulated for one view and table.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+class QueryTimer:
+    """
+    Execute wrapper counting the queries run on a connection and the
+    time spent running them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+def start_template_timer() -> contextvars.Token:
+    """
+    Start accumulating template render time for the current request.
+    """
+    return _template_time.set([0.0])
+
+
+def stop_template_timer(token: contextvars.Token) -> float:
+    """
+    Stop accumulating template render time and return the total.
+    """
+    seconds = _template_time.get()[0]
+    _template_time.reset(token)
+    return seconds
+
+
+def add_template_time(seconds: float) -> None:
+    """
+    Add render time to the current request, if it is being timed.
+    """
+    total = _template_time.get()
+    if total is not None:
+        total[0] += seconds
+
+
+def observe(
+    view: str,
+    table: str,
+    seconds: float,
+    queries: QueryTimer,
+    template_seconds: float,
+) -> None:
+    """
+    Record the measurements of a single request. Tables that are not
+    part of the application are grouped together to keep the number of
+    series bounded.
+    """
+    if table and table not in objects:
+        table = "other"
+    with _lock:
+        series = _series.setdefault((view, table), Series())
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                series.buckets[index] += 1
+        series.count += 1
+        series.seconds += seconds
+        series.queries += queries.count
+        series.query_seconds += queries.seconds
+        series.template_seconds += template_seconds
+
+
+def reset() -> None:
+    """
+    Discard every recorded measurement.
+    """
+    with _lock:
+        _series.clear()
+
+
+def render() -> str:
+    """
+    Return the recorded measurements in the Prometheus text exposition
+    format.
+    """
+    with _lock:
+        series = sorted(_series.items())
+        lines = [
+            "# HELP cantina_request_seconds Request latency.",
+            "# TYPE cantina_request_seconds histogram",
+        ]
+        for (view, table), values in series:
+            labels = f'view="{view}",table="{table}"'
+            for bound, count in zip(BUCKETS, values.buckets):
+                lines.append(
+                    f'cantina_request_seconds_bucket{{{labels},le="{bound}"}} {count}'
+                )
+            lines.append(
+                f'cantina_request_seconds_bucket{{{labels},le="+Inf"}} {values.count}'
+            )
+            lines.append(f"cantina_request_seconds_sum{{{labels}}} {values.seconds}")
+            lines.append(f"cantina_request_seconds_count{{{labels}}} {values.count}")
+
+        for name, attribute, description in [
+            ("db_queries", "queries", "Database queries run."),
+            ("db_seconds", "query_seconds", "Time spent running queries."),
+            ("template_seconds", "template_seconds", "Time spent rendering."),
+        ]:
+            lines.append(f"# HELP cantina_{name}_total {description}")
+            lines.append(f"# TYPE cantina_{name}_total counter")
+            for (view, table), values in series:
+                labels = f'view="{view}",table="{table}"'
+                lines.append(
+                    f"cantina_{name}_total{{{labels}}} {getattr(values, attribute)}"
+                )
+
+    return "\n".join(lines) + "\n"
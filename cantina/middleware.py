@@ -0,0 +1,231 @@
+import cProfile
+import mimetypes
+import pathlib
+import pstats
+import re
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connection
+from django.http import FileResponse
+from django.utils import timezone
+from django.utils._os import safe_join
+
+from . import audit, metrics, querylog
+
+
+class MetricsMiddleware:
+    """
+    Record the latency, database queries and template render time of
+    every request, labelled by URL name and table.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = metrics.QueryTimer()
+        token = metrics.start_template_timer()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(queries):
+                response = self.get_response(request)
+        finally:
+            seconds = time.perf_counter() - start
+            template_seconds = metrics.stop_template_timer(token)
+
+        match = request.resolver_match
+        view = match.url_name if match else None
+        table = match.kwargs.get("table") if match else None
+        metrics.observe(
+            view or "",
+            table or "",
+            seconds,
+            queries,
+            template_seconds,
+        )
+        return response
+
+
+class QueryLogMiddleware:
+    """
+    Fingerprint every query run while handling a request and attribute
+    it to the view and table the request resolved to.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with connection.execute_wrapper(querylog.QueryRecorder(request)):
+            response = self.get_response(request)
+        querylog.dump_if_due()
+        return response
+
+
+class AuditMiddleware:
+    """
+    Buffer the audit entries recorded while handling a request and write
+    them with a single query once the request succeeds, attributed to
+    the authenticated user.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = audit.start()
+        try:
+            response = self.get_response(request)
+            if response.status_code < 500:
+                user = request.user if request.user.is_authenticated else None
+                audit.flush(user)
+        finally:
+            audit.stop(token)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile a single request with cProfile and tracemalloc when a staff
+    member adds ?profile to the URL or the request carries a valid
+    signed X-Cantina-Profile header. The profile and the top allocation
+    sites are written to PROFILE_DIR.
+    """
+
+    header = "X-Cantina-Profile"
+    salt = "cantina.profile"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.is_requested(request):
+            return self.get_response(request)
+
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start(settings.PROFILE_TRACEBACK_LIMIT)
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            response = profiler.runcall(self.get_response, request)
+        finally:
+            seconds = time.perf_counter() - start
+            snapshot = tracemalloc.take_snapshot()
+            if not tracing:
+                tracemalloc.stop()
+
+        self.save(request, profiler, snapshot, seconds)
+        return response
+
+    def is_requested(self, request) -> bool:
+        """
+        Return whether the request asked to be profiled and is allowed
+        to be.
+        """
+        if "profile" in request.GET and request.user.is_staff:
+            return True
+
+        token = request.headers.get(self.header)
+        if not token:
+            return False
+        try:
+            signing.TimestampSigner(salt=self.salt).unsign(
+                token, max_age=settings.PROFILE_TOKEN_MAX_AGE
+            )
+        except signing.BadSignature:
+            return False
+        return True
+
+    def save(self, request, profiler, snapshot, seconds: float) -> None:
+        """
+        Write the cProfile stats and a report of the slowest functions
+        and top allocation sites of the request to PROFILE_DIR.
+        """
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        table = match.kwargs.get("table", "") if match else ""
+        name = "-".join(
+            part
+            for part in [timezone.now().strftime("%Y%m%dT%H%M%S%f"), view, table]
+            if part
+        ).replace(":", "_")
+
+        directory = pathlib.Path(settings.PROFILE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(directory / f"{name}.prof")
+
+        with open(directory / f"{name}.txt", "w") as report:
+            report.write(f"{request.method} {request.get_full_path()}\n")
+            report.write(f"View: {view}\nTable: {table}\n")
+            report.write(f"Kwargs: {match.kwargs if match else {}}\n")
+            report.write(f"Time: {seconds:.4f} seconds\n\n")
+            stats = pstats.Stats(profiler, stream=report)
+            stats.sort_stats("cumulative").print_stats(40)
+            report.write("Top allocation sites:\n")
+            for statistic in snapshot.statistics("lineno")[:25]:
+                report.write(f"{statistic}\n")
+
+
+class StaticFilesMiddleware:
+    """
+    Serve files collected into STATIC_ROOT without going through the
+    URL resolver. Precompressed variants are preferred when the client
+    accepts them, and content-hashed names are cached for a year.
+    """
+
+    encodings = [("br", ".br"), ("gzip", ".gz")]
+    hashed = re.compile(r"\.[0-9a-f]{12}\.\w+$")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        prefix = settings.STATIC_URL
+        if (
+            settings.STATIC_ROOT
+            and request.method in ("GET", "HEAD")
+            and request.path.startswith(prefix)
+        ):
+            response = self.serve(request, request.path.removeprefix(prefix))
+            if response:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name: str) -> FileResponse:
+        """
+        Return a response for the named static file, or None if it has
+        not been collected.
+        """
+        try:
+            path = pathlib.Path(safe_join(settings.STATIC_ROOT, name))
+        except SuspiciousFileOperation:
+            return None
+        if not path.is_file():
+            return None
+
+        accepted = request.headers.get("Accept-Encoding", "")
+        encoding = None
+        for coding, suffix in self.encodings:
+            variant = path.with_name(path.name + suffix)
+            if coding in accepted and variant.is_file():
+                encoding = coding
+                break
+
+        response = FileResponse(
+            open(variant if encoding else path, "rb"),
+            content_type=mimetypes.guess_type(path.name)[0],
+            filename=path.name,
+        )
+        if encoding:
+            response["Content-Encoding"] = encoding
+        response["Vary"] = "Accept-Encoding"
+        if self.hashed.search(path.name):
+            response["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response["Cache-Control"] = "public, max-age=60"
+        return response
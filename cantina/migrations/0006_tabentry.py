@@ -0,0 +1,68 @@
+# Generated by Django 5.0 on 2026-10-19 00:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cantina", "0005_alter_customer_unique_together"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TabEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("charge", "Charge"),
+                            ("adjustment", "Adjustment"),
+                            ("comp", "Comp"),
+                            ("void", "Void"),
+                            ("payment", "Payment"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=40)),
+                ("balance", models.DecimalField(decimal_places=2, max_digits=40)),
+                ("time", models.DateTimeField(auto_now_add=True)),
+                (
+                    "purchase",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="cantina.purchase",
+                    ),
+                ),
+                (
+                    "tab",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="cantina.tab"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Tab entries",
+                "ordering": ["-id"],
+                "indexes": [
+                    models.Index(
+                        fields=["tab", "-id"], name="cantina_tab_tab_id_2abb61_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0 on 2026-10-19 00:16
+
+from django.db import migrations
+
+
+def seed_tab_entries(apps, schema_editor):
+    """
+    Open the ledger of every existing tab with one charge per purchase,
+    carrying the running balance forward in chronological order.
+    """
+    Purchase = apps.get_model("cantina", "Purchase")
+    TabEntry = apps.get_model("cantina", "TabEntry")
+
+    entries = []
+    balances = {}
+    for purchase in Purchase.objects.order_by("tab", "time", "id").iterator():
+        balance = balances.get(purchase.tab_id, 0) + purchase.amount
+        balances[purchase.tab_id] = balance
+        entries.append(
+            TabEntry(
+                tab_id=purchase.tab_id,
+                purchase_id=purchase.id,
+                kind="charge",
+                amount=purchase.amount,
+                balance=balance,
+            )
+        )
+    TabEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cantina", "0006_tabentry"),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_tab_entries, migrations.RunPython.noop),
+    ]
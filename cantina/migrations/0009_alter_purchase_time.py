@@ -0,0 +1,21 @@
+# Generated by Django 5.0 on 2026-10-19 00:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cantina", "0008_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="purchase",
+            name="time",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0 on 2026-10-19 00:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cantina", "0009_alter_purchase_time"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MenuSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("document", models.JSONField()),
+                ("created", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "get_latest_by": "id",
+            },
+        ),
+    ]
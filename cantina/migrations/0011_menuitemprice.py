@@ -0,0 +1,47 @@
+# Generated by Django 5.0 on 2026-10-19 00:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cantina", "0010_menusnapshot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MenuItemPrice",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("price", models.DecimalField(decimal_places=2, max_digits=7)),
+                ("effective", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="cantina.menuitem",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["item", "-effective"],
+                "indexes": [
+                    models.Index(
+                        fields=["item", "-effective"],
+                        name="cantina_men_item_id_c8d9d3_idx",
+                    )
+                ],
+            },
+        ),
+    ]
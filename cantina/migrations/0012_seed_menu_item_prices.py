@@ -0,0 +1,30 @@
+# Generated by Django 5.0 on 2026-10-19 00:26
+
+from django.db import migrations
+
+
+def seed_menu_item_prices(apps, schema_editor):
+    """
+    Start the price history of every existing menu item with its
+    current price.
+    """
+    MenuItem = apps.get_model("cantina", "MenuItem")
+    MenuItemPrice = apps.get_model("cantina", "MenuItemPrice")
+
+    MenuItemPrice.objects.bulk_create(
+        (
+            MenuItemPrice(item_id=id, price=price)
+            for id, price in MenuItem.objects.values_list("id", "price")
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cantina", "0011_menuitemprice"),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_menu_item_prices, migrations.RunPython.noop),
+    ]
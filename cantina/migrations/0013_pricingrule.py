@@ -0,0 +1,88 @@
+# Generated by Django 5.0 on 2026-10-19 00:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cantina", "0012_seed_menu_item_prices"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PricingRule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                (
+                    "planet",
+                    models.CharField(
+                        blank=True,
+                        help_text="Leave blank to apply to all customers.",
+                        max_length=100,
+                    ),
+                ),
+                (
+                    "percent_off",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=5),
+                ),
+                (
+                    "amount_off",
+                    models.DecimalField(
+                        decimal_places=2, default=0, help_text="per item", max_digits=7
+                    ),
+                ),
+                (
+                    "weekdays",
+                    models.CharField(
+                        default="0123456",
+                        help_text="0 is Monday, 6 is Sunday.",
+                        max_length=7,
+                    ),
+                ),
+                ("start_time", models.TimeField(blank=True, null=True)),
+                (
+                    "end_time",
+                    models.TimeField(
+                        blank=True,
+                        help_text="May be earlier than the start time.",
+                        null=True,
+                    ),
+                ),
+                ("starts", models.DateTimeField(blank=True, null=True)),
+                ("ends", models.DateTimeField(blank=True, null=True)),
+                ("active", models.BooleanField(default=True)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="cantina.menuitemcategory",
+                    ),
+                ),
+                (
+                    "item",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="cantina.menuitem",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["name"],
+            },
+        ),
+    ]
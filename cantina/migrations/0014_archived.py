@@ -0,0 +1,22 @@
+# Generated by Django 5.0 on 2026-10-19 00:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cantina", "0013_pricingrule"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customer",
+            name="archived",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="tab",
+            name="archived",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
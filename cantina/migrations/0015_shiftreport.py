@@ -0,0 +1,35 @@
+# Generated by Django 5.0 on 2026-10-19 00:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cantina", "0014_archived"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ShiftReport",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("tab_count", models.PositiveIntegerField()),
+                ("revenue", models.DecimalField(decimal_places=2, max_digits=40)),
+                ("comps", models.DecimalField(decimal_places=2, max_digits=40)),
+                ("summary", models.JSONField()),
+            ],
+            options={
+                "ordering": ["-created"],
+                "get_latest_by": "created",
+            },
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.0 on 2026-10-19 00:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cantina", "0015_shiftreport"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InventoryCount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="cantina.inventoryitemcategory",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created"],
+                "get_latest_by": "created",
+            },
+        ),
+        migrations.CreateModel(
+            name="InventoryCountLine",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "expected",
+                    models.DecimalField(
+                        decimal_places=2, help_text="bottles", max_digits=10
+                    ),
+                ),
+                (
+                    "counted",
+                    models.DecimalField(
+                        decimal_places=2, help_text="bottles", max_digits=10
+                    ),
+                ),
+                (
+                    "variance",
+                    models.DecimalField(
+                        decimal_places=2, help_text="bottles", max_digits=10
+                    ),
+                ),
+                (
+                    "count",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="cantina.inventorycount",
+                    ),
+                ),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="cantina.inventoryitem",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["count", "item__name"],
+                "indexes": [
+                    models.Index(
+                        fields=["item", "count"], name="cantina_inv_item_id_27a4a5_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.0 on 2026-10-19 00:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cantina", "0017_purchaseorder"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockSeries",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "opening",
+                    models.DecimalField(
+                        decimal_places=2, help_text="bottles", max_digits=10
+                    ),
+                ),
+                (
+                    "times",
+                    models.BinaryField(
+                        default=bytes, help_text="seconds since midnight"
+                    ),
+                ),
+                (
+                    "deltas",
+                    models.BinaryField(
+                        default=bytes, help_text="hundredths of a bottle"
+                    ),
+                ),
+                (
+                    "item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="cantina.inventoryitem",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Stock series",
+                "ordering": ["item", "day"],
+                "unique_together": {("item", "day")},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0 on 2026-10-19 01:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cantina", "0019_auditentry"),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name="customer",
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name="customer",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("archived__isnull", True)),
+                fields=("last_name", "first_name", "uba"),
+                name="unique_active_customer",
+                violation_error_message="Customer with this Last name, First name and UBA Number already exists.",
+            ),
+        ),
+    ]
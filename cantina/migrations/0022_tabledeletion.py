@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-19 01:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("cantina", "0021_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TableDeletion",
+            fields=[
+                (
+                    "table",
+                    models.CharField(max_length=100, primary_key=True, serialize=False),
+                ),
+                ("time", models.DateTimeField()),
+                ("version", models.CharField(max_length=32)),
+            ],
+        ),
+    ]
@@ -1,7 +1,13 @@
-from django.db import models
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from django.utils import timezone
 import datetime
 import decimal
+import hashlib
+import uuid
 
 
 def a_week_from_now() -> datetime.datetime:
@@ -9,7 +15,117 @@ def a_week_from_now() -> datetime.datetime:
     return timezone.now() + timezone.timedelta(days=7)
 
 
-class Customer(models.Model):
+class TimestampedQuerySet(models.QuerySet):
+    """
+    QuerySet stamping the rows it updates with the time of the update.
+    """
+
+    def update(self, **kwargs):
+        kwargs.setdefault("updated_at", timezone.now())
+        return super().update(**kwargs)
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        now = timezone.now()
+        for obj in objs:
+            obj.updated_at = now
+        return super().bulk_update(objs, [*fields, "updated_at"], batch_size)
+
+    def delete(self):
+        deleted, rows = super().delete()
+        record_deletions(rows)
+        return deleted, rows
+
+
+class ActiveManager(models.Manager.from_queryset(TimestampedQuerySet)):
+    """
+    Manager excluding archived rows.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(archived__isnull=True)
+
+
+class TimestampedModel(models.Model):
+    """
+    Model recording when each of its rows last changed, so pages built
+    from the rows can be revalidated without being rendered again.
+    """
+
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = TimestampedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if kwargs.get("update_fields"):
+            kwargs["update_fields"] = {*kwargs["update_fields"], "updated_at"}
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        deleted, rows = super().delete(*args, **kwargs)
+        record_deletions(rows)
+        return deleted, rows
+
+
+class TableDeletion(models.Model):
+    """
+    The last deletion from a table, which leaves no updated_at behind.
+    """
+
+    table = models.CharField(max_length=100, primary_key=True)
+    time = models.DateTimeField()
+    version = models.CharField(max_length=32)
+
+    def __str__(self):
+        return f"{self.table} [{self.time.strftime('%Y-%m-%d %H:%M')}]"
+
+
+def record_deletions(rows: dict) -> None:
+    """
+    Record a deletion from every table with rows deleted, given the
+    number of rows deleted by model label, with a single upsert.
+    """
+    now = timezone.now()
+    TableDeletion.objects.bulk_create(
+        [
+            TableDeletion(table=label, time=now, version=uuid.uuid4().hex)
+            for label, count in rows.items()
+            if count
+        ],
+        update_conflicts=True,
+        unique_fields=["table"],
+        update_fields=["time", "version"],
+    )
+
+
+def get_version(tables: list) -> tuple:
+    """
+    Return the time the rows of the given timestamped models last
+    changed, or None if there are no rows, and a version that changes
+    whenever any of the rows are added, changed or deleted. The latest
+    update of each model is read from its updated_at index and its last
+    deletion from TableDeletion, all in a single query.
+    """
+    labels = [model._meta.label for model in tables]
+    queries = [
+        model._base_manager.order_by()
+        .values(label=models.Value(label), token=models.Value(""))
+        .annotate(latest=models.Max("updated_at"))
+        .values_list("label", "token", "latest")
+        for label, model in zip(labels, tables)
+    ]
+    deletions = TableDeletion.objects.filter(table__in=labels).order_by()
+    queries.append(deletions.values_list("table", "version", "time"))
+    state = sorted(queries[0].union(*queries[1:], all=True))
+    latest = max((time for _, _, time in state if time), default=None)
+    digest = hashlib.md5(repr(state).encode(), usedforsecurity=False)
+    return latest, digest.hexdigest()
+
+
+class Customer(TimestampedModel):
     last_name = models.CharField(max_length=100)
     first_name = models.CharField(
         max_length=100,
@@ -18,9 +134,24 @@ class Customer(models.Model):
     )
     planet = models.CharField(max_length=100)
     uba = models.CharField("UBA Number", max_length=24, blank=True)
+    archived = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ActiveManager()
+    all_objects = TimestampedQuerySet.as_manager()
 
     class Meta:
-        unique_together = ["last_name", "first_name", "uba"]
+        constraints = [
+            # Archived customers may be added again.
+            models.UniqueConstraint(
+                fields=["last_name", "first_name", "uba"],
+                condition=models.Q(archived__isnull=True),
+                name="unique_active_customer",
+                violation_error_message=(
+                    "Customer with this Last name, First name and UBA Number "
+                    "already exists."
+                ),
+            )
+        ]
         ordering = ["last_name", "first_name"]
 
     def __str__(self):
@@ -37,8 +168,36 @@ class Customer(models.Model):
         else:
             return f"{self.last_name}"
 
+    def archive(self) -> None:
+        """
+        Archive the customer along with all of their tabs. Archived
+        rows are hidden from the application and deleted later by the
+        purge_archived command.
+        """
+        self.archived = timezone.now()
+        with transaction.atomic():
+            self.save(update_fields=["archived"])
+            self.tab_set.update(archived=self.archived)
 
-class MenuItemCategory(models.Model):
+    def restore(self) -> None:
+        """
+        Restore an archived customer along with the tabs archived with
+        them.
+        """
+        with transaction.atomic():
+            Tab.all_objects.filter(customer=self, archived=self.archived).update(
+                archived=None
+            )
+            self.archived = None
+            self.save(update_fields=["archived"])
+
+    def validate_constraints(self, exclude=None):
+        # Forms leave out archived, which decides whether a customer must
+        # be unique.
+        super().validate_constraints(exclude=set(exclude or ()) - {"archived"})
+
+
+class MenuItemCategory(TimestampedModel):
     name = models.CharField(max_length=100, unique=True)
 
     class Meta:
@@ -49,7 +208,7 @@ class MenuItemCategory(models.Model):
         return self.name
 
 
-class MenuItem(models.Model):
+class MenuItem(TimestampedModel):
     name = models.CharField(max_length=100, unique=True)
     category = models.ForeignKey(MenuItemCategory, on_delete=models.CASCADE)
     price = models.DecimalField(max_digits=7, decimal_places=2)
@@ -60,8 +219,85 @@ class MenuItem(models.Model):
     def __str__(self):
         return self.name
 
+    def get_makeable(self) -> int:
+        """
+        Return how many more servings of the menu item can be made from
+        the current stock, or None if it has no ingredients.
+        """
+        from .inventory import get_makeable
+
+        return get_makeable().get(self.id)
+
+    def price_at(self, when: datetime.datetime) -> decimal.Decimal:
+        """
+        Return the price of the item in effect at a point in time. Times
+        before the first recorded price get the first recorded price,
+        and items without any history get their current price. Uses
+        prefetched price history if available.
+        """
+        if "menuitemprice_set" in getattr(self, "_prefetched_objects_cache", {}):
+            prices = sorted(self.menuitemprice_set.all(), key=lambda p: p.effective)
+            valid = [price for price in prices if price.effective <= when]
+            price = valid[-1] if valid else next(iter(prices), None)
+        else:
+            price = self.menuitemprice_set.filter(effective__lte=when).first()
+            price = price or self.menuitemprice_set.order_by("effective").first()
+        return price.price if price else self.price
+
+
+class MenuItemPrice(models.Model):
+    item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    price = models.DecimalField(max_digits=7, decimal_places=2)
+    effective = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["item", "-effective"]
+        indexes = [models.Index(fields=["item", "-effective"])]
+
+    def __str__(self):
+        return f"{self.item.name}: {self.price} [{self.effective.strftime('%Y-%m-%d %H:%M')}]"
+
+
+class PricingRule(TimestampedModel):
+    name = models.CharField(max_length=100)
+    item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, null=True, blank=True)
+    category = models.ForeignKey(
+        MenuItemCategory, on_delete=models.CASCADE, null=True, blank=True
+    )
+    planet = models.CharField(
+        max_length=100, blank=True, help_text="Leave blank to apply to all customers."
+    )
+    percent_off = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    amount_off = models.DecimalField(
+        max_digits=7, decimal_places=2, default=0, help_text="per item"
+    )
+    weekdays = models.CharField(
+        max_length=7, default="0123456", help_text="0 is Monday, 6 is Sunday."
+    )
+    start_time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(
+        null=True, blank=True, help_text="May be earlier than the start time."
+    )
+    starts = models.DateTimeField(null=True, blank=True)
+    ends = models.DateTimeField(null=True, blank=True)
+    active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        if not self.percent_off and not self.amount_off:
+            raise ValidationError("A rule must take a percentage or an amount off.")
+        if self.item and self.category:
+            raise ValidationError("A rule applies to either an item or a category.")
+        if (self.start_time is None) != (self.end_time is None):
+            raise ValidationError("A time window needs both a start and an end.")
+
 
-class InventoryItemCategory(models.Model):
+class InventoryItemCategory(TimestampedModel):
     name = models.CharField(max_length=100, unique=True)
 
     class Meta:
@@ -72,7 +308,7 @@ class InventoryItemCategory(models.Model):
         return self.name
 
 
-class InventoryItem(models.Model):
+class InventoryItem(TimestampedModel):
     name = models.CharField(max_length=100, unique=True)
     category = models.ForeignKey(InventoryItemCategory, on_delete=models.CASCADE)
     stock = models.DecimalField(max_digits=10, decimal_places=2, help_text="bottles")
@@ -87,7 +323,7 @@ class InventoryItem(models.Model):
         return self.name
 
 
-class Component(models.Model):
+class Component(TimestampedModel):
     item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
     ingredient = models.ForeignKey(InventoryItem, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=4, decimal_places=2, help_text="ounces")
@@ -100,11 +336,15 @@ class Component(models.Model):
         return f"{self.item.name} - {self.ingredient.name}"
 
 
-class Tab(models.Model):
+class Tab(TimestampedModel):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
     due = models.DateTimeField(default=a_week_from_now)
     closed = models.DateTimeField(null=True, blank=True)
     opened = models.DateTimeField(auto_now_add=True)
+    archived = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ActiveManager()
+    all_objects = TimestampedQuerySet.as_manager()
 
     class Meta:
         ordering = ["-closed", "customer__last_name"]
@@ -115,12 +355,27 @@ class Tab(models.Model):
         else:
             return f"{self.customer.first_name} {self.customer.last_name} [{self.closed.strftime('%Y-%m-%d %H:%M')}]"
 
+    def archive(self) -> None:
+        """
+        Archive the tab. Archived tabs are hidden from the application
+        and deleted later by the purge_archived command.
+        """
+        self.archived = timezone.now()
+        self.save(update_fields=["archived"])
+
+    def restore(self) -> None:
+        """
+        Restore an archived tab.
+        """
+        self.archived = None
+        self.save(update_fields=["archived"])
+
     def get_purchases(self) -> models.query.QuerySet:
         """
         Return all purchases associated with the tab in chronological
-        order.
+        order, along with their menu items.
         """
-        return self.purchase_set.all().order_by("time")
+        return self.purchase_set.select_related("item").order_by("time")
 
     def get_amount(self) -> decimal.Decimal:
         """
@@ -132,12 +387,54 @@ class Tab(models.Model):
         else:
             return decimal.Decimal(0)
 
+    def get_balance(self) -> decimal.Decimal:
+        """
+        Return the running balance of the tab as recorded on its latest
+        ledger entry. If nothing has been recorded, a balance of 0 is
+        returned.
+        """
+        entry = self.tabentry_set.only("balance").first()
+        return entry.balance if entry else decimal.Decimal(0)
+
+    def record_entry(
+        self, kind: str, amount: decimal.Decimal, purchase: "Purchase" = None
+    ) -> "TabEntry":
+        """
+        Append an entry to the tab's ledger and carry the running
+        balance forward.
+        """
+        return self.record_entries([(kind, amount, purchase)])[0]
 
-class Purchase(models.Model):
+    def record_entries(self, entries: list[tuple]) -> list["TabEntry"]:
+        """
+        Append several (kind, amount, purchase) entries to the tab's
+        ledger in one insert, carrying the running balance forward. The
+        tab row is locked while the entries are written so concurrent
+        entries cannot read the same balance.
+        """
+        with transaction.atomic():
+            Tab.objects.select_for_update().only("id").get(pk=self.pk)
+            balance = self.get_balance()
+            rows = []
+            for kind, amount, purchase in entries:
+                balance += decimal.Decimal(amount)
+                rows.append(
+                    TabEntry(
+                        tab=self,
+                        kind=kind,
+                        amount=amount,
+                        balance=balance,
+                        purchase=purchase,
+                    )
+                )
+            return TabEntry.objects.bulk_create(rows)
+
+
+class Purchase(TimestampedModel):
     tab = models.ForeignKey(Tab, on_delete=models.CASCADE)
     item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
     quantity = models.IntegerField()
-    time = models.DateTimeField(auto_now_add=True)
+    time = models.DateTimeField(default=timezone.now, editable=False)
     amount = models.DecimalField(max_digits=40, decimal_places=2, default=0)
 
     class Meta:
@@ -146,15 +443,205 @@ class Purchase(models.Model):
     def __str__(self):
         return f"{self.tab.customer.last_name}: {self.item.name} x {self.quantity}"
 
-    def update_amount(self) -> None:
+    def update_amount(self, rules=None) -> None:
         """
-        Update amount of purchase according to the cost of the menu
-        item and the quantity of the item purchased.
+        Update amount of purchase according to the price of the menu
+        item at the time of the purchase, any pricing rules in effect
+        for the customer at that time and the quantity of the item
+        purchased. Callers pricing many purchases can pass the rules
+        table to look it up once.
         """
-        self.amount = self.item.price * self.quantity
+        from .pricing import get_rules
+
+        rules = rules or get_rules()
+        price = self.item.price_at(self.time)
+        price = rules.apply(price, self.item, self.tab.customer, self.time)
+        self.amount = price * self.quantity
 
     def comp(self) -> None:
         """
         Set amount of purchase to 0.
         """
         self.amount = 0
+
+
+class IdempotencyKey(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    purchases = models.JSONField(default=list)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.key
+
+    @classmethod
+    def expire(cls, before: datetime.datetime, batch_size: int = 1000) -> int:
+        """
+        Delete keys created before the given point in time, at most
+        batch_size rows per statement so the table is never locked for
+        long. Return the number of keys deleted.
+        """
+        deleted = 0
+        while True:
+            batch = cls.objects.filter(created__lt=before).values_list("pk", flat=True)[
+                :batch_size
+            ]
+            count, _ = cls.objects.filter(pk__in=list(batch)).delete()
+            deleted += count
+            if count < batch_size:
+                return deleted
+
+
+class TabEntry(TimestampedModel):
+    CHARGE = "charge"
+    ADJUSTMENT = "adjustment"
+    COMP = "comp"
+    VOID = "void"
+    PAYMENT = "payment"
+    KINDS = [
+        (CHARGE, "Charge"),
+        (ADJUSTMENT, "Adjustment"),
+        (COMP, "Comp"),
+        (VOID, "Void"),
+        (PAYMENT, "Payment"),
+    ]
+
+    tab = models.ForeignKey(Tab, on_delete=models.CASCADE)
+    purchase = models.ForeignKey(
+        Purchase, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    kind = models.CharField(max_length=10, choices=KINDS)
+    amount = models.DecimalField(max_digits=40, decimal_places=2)
+    balance = models.DecimalField(max_digits=40, decimal_places=2)
+    time = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-id"]
+        indexes = [models.Index(fields=["tab", "-id"])]
+        verbose_name_plural = "Tab entries"
+
+    def __str__(self):
+        return f"Tab {self.tab_id}: {self.kind} {self.amount} [{self.balance}]"
+
+
+class MenuSnapshot(models.Model):
+    document = models.JSONField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        get_latest_by = "id"
+
+    def __str__(self):
+        return f"Menu version {self.id}"
+
+
+class ShiftReport(models.Model):
+    created = models.DateTimeField(auto_now_add=True)
+    tab_count = models.PositiveIntegerField()
+    revenue = models.DecimalField(max_digits=40, decimal_places=2)
+    comps = models.DecimalField(max_digits=40, decimal_places=2)
+    summary = models.JSONField()
+
+    class Meta:
+        ordering = ["-created"]
+        get_latest_by = "created"
+
+    def __str__(self):
+        return f"Shift report {self.created.strftime('%Y-%m-%d %H:%M')}"
+
+
+class InventoryCount(models.Model):
+    category = models.ForeignKey(InventoryItemCategory, on_delete=models.CASCADE)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created"]
+        get_latest_by = "created"
+
+    def __str__(self):
+        return f"{self.category.name} count [{self.created.strftime('%Y-%m-%d %H:%M')}]"
+
+
+class InventoryCountLine(models.Model):
+    count = models.ForeignKey(InventoryCount, on_delete=models.CASCADE)
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE)
+    expected = models.DecimalField(max_digits=10, decimal_places=2, help_text="bottles")
+    counted = models.DecimalField(max_digits=10, decimal_places=2, help_text="bottles")
+    variance = models.DecimalField(max_digits=10, decimal_places=2, help_text="bottles")
+
+    class Meta:
+        ordering = ["count", "item__name"]
+        indexes = [models.Index(fields=["item", "count"])]
+
+    def __str__(self):
+        return f"{self.item.name}: {self.counted} [{self.variance}]"
+
+
+class PurchaseOrder(models.Model):
+    supplier = models.CharField(max_length=100)
+    created = models.DateTimeField(auto_now_add=True)
+    received = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        ordering = ["-created"]
+
+    def __str__(self):
+        return f"{self.supplier} [{self.created.strftime('%Y-%m-%d %H:%M')}]"
+
+
+class PurchaseOrderLine(models.Model):
+    order = models.ForeignKey(PurchaseOrder, on_delete=models.CASCADE)
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=10, decimal_places=2, help_text="bottles")
+    cost = models.DecimalField(max_digits=6, decimal_places=2, help_text="per bottle")
+
+    class Meta:
+        ordering = ["order", "item__name"]
+
+    def __str__(self):
+        return f"{self.item.name} x {self.quantity}"
+
+
+class StockSeries(models.Model):
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE)
+    day = models.DateField()
+    opening = models.DecimalField(max_digits=10, decimal_places=2, help_text="bottles")
+    times = models.BinaryField(default=bytes, help_text="seconds since midnight")
+    deltas = models.BinaryField(default=bytes, help_text="hundredths of a bottle")
+
+    class Meta:
+        ordering = ["item", "day"]
+        unique_together = ["item", "day"]
+        verbose_name_plural = "Stock series"
+
+    def __str__(self):
+        return f"{self.item.name} [{self.day}]"
+
+
+class AuditEntry(models.Model):
+    CREATE = "create"
+    CHANGE = "change"
+    DELETE = "delete"
+    COMP = "comp"
+    ACTIONS = [
+        (CREATE, "Create"),
+        (CHANGE, "Change"),
+        (DELETE, "Delete"),
+        (COMP, "Comp"),
+    ]
+
+    time = models.DateTimeField(default=timezone.now)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    changes = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        ordering = ["-time", "-id"]
+        indexes = [models.Index(fields=["content_type", "object_id", "-time"])]
+        verbose_name_plural = "Audit entries"
+
+    def __str__(self):
+        return f"{self.content_type.model} {self.object_id}: {self.action}"
@@ -0,0 +1,220 @@
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import prefetch_related_objects
+from django.utils import dateparse, timezone
+
+from . import audit, events
+from .pricing import get_rules
+from .models import (
+    AuditEntry,
+    Customer,
+    IdempotencyKey,
+    MenuItem,
+    Purchase,
+    Tab,
+    TabEntry,
+)
+
+KEY_LENGTH = IdempotencyKey._meta.get_field("key").max_length
+
+
+def get_tab(customer: int) -> Tab:
+    """
+    Return customer's open tab or, if the customer does not currently
+    have an open tab, create one and return. If a tab has been split,
+    the customer's earliest open tab is returned.
+    """
+    customer = Customer.objects.get(pk=customer)
+    tab = customer.tab_set.filter(closed__isnull=True).order_by("opened", "id").first()
+    if tab is None:
+        tab = Tab.objects.create(customer=customer)
+
+    return tab
+
+
+def place_order(
+    customer: int, lines: list[tuple[MenuItem, int]], key: str = None
+) -> list[Purchase]:
+    """
+    Charge each (item, quantity) line to the customer's open tab, record
+    the purchases in the audit log and return them. If an idempotency
+    key is given and has been used before, the purchases recorded under
+    it are returned and nothing is written. Raise ValueError if the key
+    is longer than the stored keys can be.
+    """
+    if key and len(key) > KEY_LENGTH:
+        raise ValueError(f"Idempotency keys are at most {KEY_LENGTH} characters.")
+
+    with transaction.atomic(), audit.batch():
+        if key:
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(key=key)
+            except IntegrityError:
+                record = IdempotencyKey.objects.get(key=key)
+                return list(Purchase.objects.filter(pk__in=record.purchases))
+
+        tab = get_tab(customer)
+        prefetch_related_objects([item for item, _ in lines], "menuitemprice_set")
+        purchases = [
+            Purchase(tab=tab, item=item, quantity=quantity) for item, quantity in lines
+        ]
+        rules = get_rules()
+        for purchase in purchases:
+            purchase.update_amount(rules)
+        purchases = Purchase.objects.bulk_create(purchases)
+        tab.record_entries(
+            [(TabEntry.CHARGE, purchase.amount, purchase) for purchase in purchases]
+        )
+        for purchase in purchases:
+            audit.record(purchase, AuditEntry.CREATE)
+        events.publish("purchase", [tab.id])
+
+        if key:
+            record.purchases = [purchase.id for purchase in purchases]
+            record.save(update_fields=["purchases"])
+
+    return purchases
+
+
+def sync_orders(orders: list[dict]) -> dict:
+    """
+    Apply a batch of orders recorded offline by a terminal in a single
+    transaction. Each order carries an idempotency key, a customer, an
+    item, a quantity and optionally the time it was taken. Return a map
+    of applied, duplicate and rejected keys.
+    """
+    results = {"applied": {}, "duplicates": {}, "errors": {}}
+    orders = _validate_orders(orders, results["errors"])
+    used = IdempotencyKey.objects.filter(key__in=[order["key"] for order in orders])
+    for record in used:
+        results["duplicates"][record.key] = record.purchases
+    orders = [order for order in orders if order["key"] not in results["duplicates"]]
+    if not orders:
+        return results
+
+    items = MenuItem.objects.prefetch_related("menuitemprice_set").in_bulk(
+        {order["item"] for order in orders}
+    )
+    with transaction.atomic(), audit.batch():
+        tabs = _get_tabs({order["customer"] for order in orders})
+        rules = get_rules()
+        purchases = []
+        for order in orders:
+            purchase = Purchase(
+                tab=tabs[order["customer"]],
+                item=items[order["item"]],
+                quantity=order["quantity"],
+                time=order["time"],
+            )
+            purchase.update_amount(rules)
+            purchases.append(purchase)
+        purchases = Purchase.objects.bulk_create(purchases)
+        for purchase in purchases:
+            audit.record(purchase, AuditEntry.CREATE)
+
+        for tab in tabs.values():
+            tab.record_entries(
+                [
+                    (TabEntry.CHARGE, purchase.amount, purchase)
+                    for purchase in sorted(purchases, key=lambda p: p.time)
+                    if purchase.tab_id == tab.id
+                ]
+            )
+        IdempotencyKey.objects.bulk_create(
+            IdempotencyKey(key=order["key"], purchases=[purchase.id])
+            for order, purchase in zip(orders, purchases)
+        )
+        events.publish("purchase", [tab.id for tab in tabs.values()])
+
+    for order, purchase in zip(orders, purchases):
+        results["applied"][order["key"]] = purchase.id
+    return results
+
+
+def _validate_orders(orders: list[dict], errors: dict) -> list[dict]:
+    """
+    Return the well-formed orders of a sync batch with their times
+    parsed, recording the reason each rejected order was dropped.
+    Orders without a string key are ignored since they cannot be
+    reported back, and only the first order with a given key is kept.
+    """
+    customers = set(
+        Customer.objects.filter(
+            pk__in=[
+                order["customer"] for order in orders if _is_id(order.get("customer"))
+            ]
+        ).values_list("pk", flat=True)
+    )
+    items = set(
+        MenuItem.objects.filter(
+            pk__in=[order["item"] for order in orders if _is_id(order.get("item"))]
+        ).values_list("pk", flat=True)
+    )
+    valid = {}
+    for order in orders:
+        key = order.get("key")
+        if not isinstance(key, str) or not key or key in valid or key in errors:
+            continue
+        time = _parse_time(order.get("time"))
+
+        if len(key) > KEY_LENGTH:
+            errors[key] = "Key is too long."
+        elif not _is_id(order.get("customer")) or order["customer"] not in customers:
+            errors[key] = "Unknown customer."
+        elif not _is_id(order.get("item")) or order["item"] not in items:
+            errors[key] = "Unknown item."
+        elif not _is_id(order.get("quantity")) or order["quantity"] < 1:
+            errors[key] = "Quantity must be a positive integer."
+        elif time is None:
+            errors[key] = "Invalid time."
+        else:
+            valid[key] = dict(order, time=time)
+
+    return list(valid.values())
+
+
+def _is_id(value) -> bool:
+    """
+    Return whether a value decoded from JSON is an integer, rejecting
+    booleans, which Python treats as integers.
+    """
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _parse_time(value: str) -> datetime.datetime:
+    """
+    Return the aware datetime of an ISO 8601 string, the current time
+    if no value is given, or None if the value cannot be parsed.
+    """
+    if not value:
+        return timezone.now()
+    try:
+        time = dateparse.parse_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if time and timezone.is_naive(time):
+        time = timezone.make_aware(time)
+    return time
+
+
+def _get_tabs(customers: set[int]) -> dict[int, Tab]:
+    """
+    Return the earliest open tab of each customer, keyed by customer,
+    opening tabs in one insert for customers who do not have one.
+    """
+    tabs = {
+        tab.customer_id: tab
+        for tab in Tab.objects.select_related("customer")
+        .filter(customer__in=customers, closed__isnull=True)
+        .order_by("-opened", "-id")
+    }
+    missing = Customer.objects.in_bulk(customers - tabs.keys())
+    tabs.update(
+        (tab.customer_id, tab)
+        for tab in Tab.objects.bulk_create(
+            Tab(customer=customer) for customer in missing.values()
+        )
+    )
+    return tabs
@@ -0,0 +1,170 @@
+import datetime
+import decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Greatest, Round
+from django.utils import timezone
+
+from . import menu
+from .models import (
+    Customer,
+    MenuItem,
+    MenuItemCategory,
+    MenuItemPrice,
+    PricingRule,
+    get_version,
+)
+
+_rules = None
+
+
+def record_price(sender, instance: MenuItem, **kwargs) -> None:
+    """
+    Signal receiver adding a menu item's price to its history if it
+    differs from the latest recorded price.
+    """
+    latest = instance.menuitemprice_set.first()
+    if latest is None or latest.price != instance.price:
+        instance.menuitemprice_set.create(price=instance.price)
+
+
+def reprice(
+    category: MenuItemCategory,
+    percent: decimal.Decimal = None,
+    amount: decimal.Decimal = None,
+) -> int:
+    """
+    Change the price of every item in a category by a percentage or by
+    an absolute amount with a single UPDATE, never going below zero,
+    and record the new prices in the price history. Return the number
+    of items repriced.
+    """
+    if (percent is None) == (amount is None):
+        raise ValueError("Exactly one of percent or amount must be given.")
+
+    if percent is not None:
+        change = F("price") * Value(1 + decimal.Decimal(percent) / 100)
+    else:
+        change = F("price") + Value(decimal.Decimal(amount))
+    price = Greatest(
+        Round(change, 2, output_field=DecimalField(max_digits=7, decimal_places=2)),
+        Value(decimal.Decimal(0)),
+    )
+
+    items = MenuItem.objects.filter(category=category)
+    with transaction.atomic():
+        count = items.update(price=price)
+        effective = timezone.now()
+        MenuItemPrice.objects.bulk_create(
+            MenuItemPrice(item_id=id, price=price, effective=effective)
+            for id, price in items.values_list("id", "price")
+        )
+        transaction.on_commit(menu.publish)
+    return count
+
+
+class CompiledRule:
+    """
+    Pricing rule reduced to the values needed to test and apply it.
+    """
+
+    def __init__(self, rule: PricingRule):
+        self.planet = rule.planet.casefold()
+        self.weekdays = frozenset(int(day) for day in rule.weekdays if day.isdigit())
+        self.start_time = rule.start_time
+        self.end_time = rule.end_time
+        self.starts = rule.starts
+        self.ends = rule.ends
+        self.factor = 1 - rule.percent_off / 100
+        self.amount_off = rule.amount_off
+
+    def matches(self, planet: str, when: datetime.datetime) -> bool:
+        """
+        Return whether the rule applies to a customer from the planet at
+        the given local time.
+        """
+        if self.planet and self.planet != planet:
+            return False
+        if (self.starts and when < self.starts) or (self.ends and when >= self.ends):
+            return False
+        if when.weekday() not in self.weekdays:
+            return False
+        if self.start_time is None:
+            return True
+
+        time = when.time()
+        if self.start_time <= self.end_time:
+            return self.start_time <= time < self.end_time
+        return time >= self.start_time or time < self.end_time
+
+    def apply(self, price: decimal.Decimal) -> decimal.Decimal:
+        """
+        Return the price after the rule's discount, never below zero.
+        """
+        price = (price * self.factor - self.amount_off).quantize(
+            decimal.Decimal("0.01")
+        )
+        return max(price, decimal.Decimal(0))
+
+
+class RuleTable:
+    """
+    Active pricing rules indexed by the item, category or planet they
+    are scoped to, so only the handful of rules that could apply to a
+    purchase are tested.
+    """
+
+    def __init__(self, rules: list[PricingRule], version: str = None):
+        self.version = version
+        self.rules = {}
+        for rule in rules:
+            if rule.item_id:
+                key = ("item", rule.item_id)
+            elif rule.category_id:
+                key = ("category", rule.category_id)
+            elif rule.planet:
+                key = ("planet", rule.planet.casefold())
+            else:
+                key = ("all", None)
+            self.rules.setdefault(key, []).append(CompiledRule(rule))
+
+    def apply(
+        self,
+        price: decimal.Decimal,
+        item: MenuItem,
+        customer: Customer,
+        when: datetime.datetime,
+    ) -> decimal.Decimal:
+        """
+        Return the lowest price of an item given the rules that apply to
+        the customer at the time of purchase.
+        """
+        if not self.rules:
+            return price
+
+        planet = customer.planet.casefold()
+        when = timezone.localtime(when)
+        candidates = [
+            *self.rules.get(("item", item.id), []),
+            *self.rules.get(("category", item.category_id), []),
+            *self.rules.get(("planet", planet), []),
+            *self.rules.get(("all", None), []),
+        ]
+        return min(
+            (rule.apply(price) for rule in candidates if rule.matches(planet, when)),
+            default=price,
+        )
+
+
+def get_rules() -> RuleTable:
+    """
+    Return the compiled table of active pricing rules. The table is
+    only rebuilt when the version of the pricing rules in the database
+    changes, so a rule edited by any process is picked up by all.
+    """
+    global _rules
+    _, version = get_version([PricingRule])
+    if _rules is None or _rules.version != version:
+        _rules = RuleTable(PricingRule.objects.filter(active=True), version)
+    return _rules
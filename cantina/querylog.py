@@ -0,0 +1,138 @@
+import json
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_entries = {}
+_last_dump = time.monotonic()
+
+_patterns = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+class Entry:
+    """
+    Running totals of a single SQL fingerprint issued by a view.
+    """
+
+    def __init__(self, fingerprint: str, view: str, table: str):
+        self.fingerprint = fingerprint
+        self.view = view
+        self.table = table
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "fingerprint": self.fingerprint,
+            "view": self.view,
+            "table": self.table,
+            "count": self.count,
+            "seconds": self.seconds,
+            "max_seconds": self.max_seconds,
+        }
+
+
+class QueryRecorder:
+    """
+    Execute wrapper attributing every query run while handling a
+    request to the view the request resolved to.
+    """
+
+    def __init__(self, request):
+        self.request = request
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            match = self.request.resolver_match
+            record(
+                sql,
+                time.perf_counter() - start,
+                match.view_name if match else "",
+                match.kwargs.get("table", "") if match else "",
+            )
+
+
+def fingerprint(sql: str) -> str:
+    """
+    Return the SQL statement with literals, placeholders and lists of
+    values replaced so that statements differing only in their values
+    share a fingerprint.
+    """
+    for pattern, replacement in _patterns:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def record(sql: str, seconds: float, view: str, table: str) -> None:
+    """
+    Add a query to the totals of its fingerprint and log it if it was
+    slow. When the log is full, the fingerprint with the least total
+    time is dropped to make room.
+    """
+    key = (fingerprint(sql), view, table)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            if len(_entries) >= settings.QUERYLOG_MAX_FINGERPRINTS:
+                del _entries[min(_entries, key=lambda k: _entries[k].seconds)]
+            entry = _entries[key] = Entry(*key)
+        entry.count += 1
+        entry.seconds += seconds
+        entry.max_seconds = max(entry.max_seconds, seconds)
+
+    if seconds >= settings.QUERYLOG_SLOW_SECONDS:
+        logger.warning(
+            "Slow query (%.3fs) in %s [%s]: %s", seconds, view, table, key[0]
+        )
+
+
+def top(limit: int = 50) -> list[Entry]:
+    """
+    Return the fingerprints with the most total time.
+    """
+    with _lock:
+        entries = list(_entries.values())
+    return sorted(entries, key=lambda entry: entry.seconds, reverse=True)[:limit]
+
+
+def reset() -> None:
+    """
+    Discard every recorded fingerprint.
+    """
+    with _lock:
+        _entries.clear()
+
+
+def dump(path=None) -> None:
+    """
+    Write the top fingerprints to QUERYLOG_FILE as JSON.
+    """
+    global _last_dump
+    _last_dump = time.monotonic()
+    with open(path or settings.QUERYLOG_FILE, "w") as file:
+        json.dump([entry.as_dict() for entry in top()], file, indent=2)
+
+
+def dump_if_due() -> None:
+    """
+    Dump the top fingerprints if QUERYLOG_DUMP_INTERVAL seconds have
+    passed since the last dump.
+    """
+    if time.monotonic() - _last_dump >= settings.QUERYLOG_DUMP_INTERVAL:
+        dump()
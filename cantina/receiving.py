@@ -0,0 +1,72 @@
+import decimal
+
+from django.db import models, transaction
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .counts import stock_changed
+from .models import InventoryItem, PurchaseOrder
+
+CENTS = decimal.Decimal("0.01")
+
+
+def receive(order: PurchaseOrder) -> int:
+    """
+    Receive a purchase order, adding the bottles of every line to stock
+    and averaging their cost into the cost of the stock on hand, with a
+    single UPDATE. Return the number of inventory items updated. Raise
+    PurchaseOrder.DoesNotExist if the order was already received.
+    """
+    with transaction.atomic():
+        order = PurchaseOrder.objects.select_for_update().get(
+            pk=order.pk, received__isnull=True
+        )
+
+        lines = {}
+        for item, quantity, cost in order.purchaseorderline_set.filter(
+            quantity__gt=0
+        ).values_list("item", "quantity", "cost"):
+            total = lines.get(item, (0, 0))
+            lines[item] = (total[0] + quantity, total[1] + quantity * cost)
+
+        if lines:
+            InventoryItem.objects.filter(id__in=lines).update(
+                stock=models.F("stock")
+                + models.Case(
+                    *[
+                        models.When(id=item, then=models.Value(quantity))
+                        for item, (quantity, value) in lines.items()
+                    ],
+                    output_field=models.DecimalField(),
+                ),
+                cost=models.Case(
+                    *[
+                        models.When(id=item, then=average_cost(quantity, value))
+                        for item, (quantity, value) in lines.items()
+                    ],
+                    output_field=models.DecimalField(),
+                ),
+            )
+            stock_changed(list(lines))
+
+        order.received = timezone.now()
+        order.save(update_fields=["received"])
+    return len(lines)
+
+
+def average_cost(quantity: decimal.Decimal, value: decimal.Decimal):
+    """
+    Return the cost of an inventory item weighted by the bottles on hand
+    and the bottles received. Stock on hand that is not positive does
+    not weigh in.
+    """
+    return models.Case(
+        models.When(
+            stock__lte=0, then=models.Value((value / quantity).quantize(CENTS))
+        ),
+        default=Round(
+            (models.F("stock") * models.F("cost") + models.Value(value))
+            / (models.F("stock") + models.Value(quantity)),
+            2,
+        ),
+    )
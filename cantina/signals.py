@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+
+from . import menu, pricing, stocklevels
+from .models import Component, InventoryItem, MenuItem, MenuItemCategory
+
+for model in [MenuItemCategory, MenuItem, Component, InventoryItem]:
+    post_save.connect(menu.schedule_publish, sender=model)
+    post_delete.connect(menu.schedule_publish, sender=model)
+
+post_save.connect(pricing.record_price, sender=MenuItem)
+post_save.connect(stocklevels.record_stock, sender=InventoryItem)
@@ -0,0 +1,99 @@
+"use strict";
+
+// Pages that opt in with a data-events attribute on the content section
+// listen for purchases, comps, tab changes and closed tabs. The tabs page
+// fetches the rows of the tabs an event is about from its data-rows URL
+// and patches just those rows; a tab page fetches its purchases from its
+// data-fragment URL, and only redraws the whole section when the tab
+// itself changes. A page showing one tab ignores events about other tabs.
+const content = document.getElementById("content");
+
+const parse = async (response) => {
+  const template = document.createElement("template");
+  template.innerHTML = await response.text();
+  return template.content;
+};
+
+if (content && content.dataset.events) {
+  const tab = content.dataset.tab ? Number(content.dataset.tab) : null;
+  const source = new EventSource(content.dataset.events);
+  const changed = new Set();
+  let redrawAll = false;
+  let pending = null;
+
+  const redraw = async () => {
+    const response = await fetch(window.location.href);
+    if (!response.ok) {
+      return;
+    }
+    const page = new DOMParser().parseFromString(await response.text(), "text/html");
+    const section = page.getElementById("content");
+    if (section) {
+      content.replaceChildren(...section.childNodes);
+    }
+  };
+
+  const patchRows = async (rows, ids) => {
+    const url = new URL(rows.dataset.rows, window.location.href);
+    for (const id of ids) {
+      url.searchParams.append("tab", id);
+    }
+    const response = await fetch(url);
+    if (!response.ok) {
+      return;
+    }
+    const fresh = await parse(response);
+    for (const id of ids) {
+      const row = rows.querySelector(`tr[data-tab="${id}"]`);
+      const replacement = fresh.querySelector(`tr[data-tab="${id}"]`);
+      if (row && replacement) {
+        row.replaceWith(replacement);
+      } else if (row) {
+        row.remove();
+      } else if (replacement) {
+        // Open tabs are listed first.
+        rows.prepend(replacement);
+      }
+    }
+  };
+
+  const patchFragment = async (fragment) => {
+    const response = await fetch(fragment.dataset.fragment);
+    if (response.ok) {
+      fragment.replaceWith(...(await parse(response)).childNodes);
+    }
+  };
+
+  const update = () => {
+    const rows = content.querySelector("[data-rows]");
+    const fragment = content.querySelector("[data-fragment]");
+    if (redrawAll || !(rows || fragment)) {
+      redraw();
+    } else if (rows) {
+      patchRows(rows, [...changed]);
+    } else {
+      patchFragment(fragment);
+    }
+    pending = null;
+    redrawAll = false;
+    changed.clear();
+  };
+
+  const receive = (event) => {
+    const tabs = JSON.parse(event.data).tabs;
+    if (tab !== null && tabs !== null && !tabs.includes(tab)) {
+      return;
+    }
+    if (tabs === null || (tab !== null && !["purchase", "comp"].includes(event.type))) {
+      redrawAll = true;
+    } else {
+      tabs.forEach((id) => changed.add(id));
+    }
+    // Bursts of events, such as a round of orders, update once.
+    pending = pending || setTimeout(update, 250);
+  };
+
+  for (const type of ["purchase", "comp", "tab", "close"]) {
+    source.addEventListener(type, receive);
+  }
+}
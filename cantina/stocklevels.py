@@ -0,0 +1,124 @@
+import datetime
+import decimal
+
+import numpy as np
+from django.db import models, transaction
+from django.utils import timezone
+
+from .models import InventoryItem, StockSeries
+
+TIMES = np.dtype("<u4")
+DELTAS = np.dtype("<i4")
+
+
+def unpack(row: StockSeries) -> tuple:
+    """
+    Return the times of the changes recorded in a day of stock series,
+    as seconds since midnight, and the level after each change, in
+    hundredths of a bottle.
+    """
+    times = np.frombuffer(row.times, dtype=TIMES)
+    levels = int(row.opening * 100) + np.cumsum(np.frombuffer(row.deltas, dtype=DELTAS))
+    return times, levels
+
+
+def closing(row: StockSeries) -> decimal.Decimal:
+    """
+    Return the last level recorded in a day of stock series.
+    """
+    deltas = np.frombuffer(row.deltas, dtype=DELTAS)
+    return row.opening + decimal.Decimal(int(deltas.sum())).scaleb(-2)
+
+
+def record_levels(levels: dict, when: datetime.datetime = None) -> None:
+    """
+    Record the stock levels of inventory items, given by inventory item
+    id, at a point in time. Each day of every item is stored as a single
+    row holding its opening level and packed arrays of the time and
+    size of every change since.
+    """
+    when = timezone.localtime(when)
+    day, offset = when.date(), when.hour * 3600 + when.minute * 60 + when.second
+
+    with transaction.atomic():
+        rows = StockSeries.objects.select_for_update().filter(item__in=levels, day=day)
+        missing = set(levels) - {row.item_id for row in rows}
+        if missing:
+            previous = StockSeries.objects.filter(
+                item__in=missing,
+                day=models.Subquery(
+                    StockSeries.objects.filter(
+                        item=models.OuterRef("item"), day__lt=day
+                    )
+                    .order_by("-day")
+                    .values("day")[:1]
+                ),
+            )
+            openings = {row.item_id: closing(row) for row in previous}
+            StockSeries.objects.bulk_create(
+                [
+                    StockSeries(
+                        item_id=item, day=day, opening=openings.get(item, levels[item])
+                    )
+                    for item in missing
+                ],
+                ignore_conflicts=True,
+            )
+
+        changed = []
+        for row in rows.all():
+            delta = int((decimal.Decimal(levels[row.item_id]) - closing(row)) * 100)
+            if delta:
+                row.times = bytes(row.times) + np.array([offset], TIMES).tobytes()
+                row.deltas = bytes(row.deltas) + np.array([delta], DELTAS).tobytes()
+                changed.append(row)
+        StockSeries.objects.bulk_update(changed, ["times", "deltas"])
+
+
+def record_stock(sender, instance: InventoryItem, **kwargs) -> None:
+    """
+    Signal receiver recording the stock level of a saved inventory item.
+    """
+    record_levels({instance.id: instance.stock})
+
+
+def level_at(item: int, when: datetime.datetime) -> decimal.Decimal:
+    """
+    Return the stock level of an inventory item at a point in time, or
+    None if nothing was recorded before then.
+    """
+    when = timezone.localtime(when)
+    day, offset = when.date(), when.hour * 3600 + when.minute * 60 + when.second
+    row = StockSeries.objects.filter(item=item, day__lte=day).order_by("-day").first()
+    if row is None:
+        return None
+    if row.day < day:
+        return closing(row)
+
+    times, levels = unpack(row)
+    index = np.searchsorted(times, offset, side="right")
+    level = int(levels[index - 1]) if index else int(row.opening * 100)
+    return decimal.Decimal(level).scaleb(-2)
+
+
+def series(item: int, start: datetime.datetime, end: datetime.datetime) -> list:
+    """
+    Return the stock level of an inventory item at the start of a time
+    range followed by every change of level within it, as pairs of
+    times and levels.
+    """
+    points = [(start, level_at(item, start))]
+    start, end = timezone.localtime(start), timezone.localtime(end)
+    rows = StockSeries.objects.filter(
+        item=item, day__gte=start.date(), day__lte=end.date()
+    ).order_by("day")
+    for row in rows:
+        midnight = timezone.make_aware(
+            datetime.datetime.combine(row.day, datetime.time())
+        )
+        times, levels = unpack(row)
+        for seconds, level in zip(times.tolist(), levels.tolist()):
+            time = midnight + datetime.timedelta(seconds=seconds)
+            if start < time <= end:
+                points.append((time, decimal.Decimal(level).scaleb(-2)))
+    return points
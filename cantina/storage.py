@@ -0,0 +1,43 @@
+import gzip
+import pathlib
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = {".css", ".js", ".json", ".map", ".svg", ".txt", ".html", ".xml"}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage that also writes gzip and, when the brotli package
+    is installed, brotli variants of every compressible hashed file so
+    they can be served without compressing on each request.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        for name in set(self.hashed_files.values()):
+            path = pathlib.Path(self.path(name))
+            if path.suffix in COMPRESSIBLE and path.is_file():
+                self.compress(path)
+
+    def compress(self, path: pathlib.Path) -> None:
+        """
+        Write the compressed variants of a file next to it, skipping any
+        variant that would not be smaller than the original.
+        """
+        content = path.read_bytes()
+        variants = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli:
+            variants[".br"] = brotli.compress(content)
+
+        for suffix, compressed in variants.items():
+            if len(compressed) < len(content):
+                path.with_name(path.name + suffix).write_bytes(compressed)
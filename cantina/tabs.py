@@ -0,0 +1,225 @@
+import decimal
+
+from django.db import models, transaction
+from django.db.models import functions
+from django.utils import timezone
+
+from . import audit, events
+from .models import AuditEntry, Customer, Purchase, ShiftReport, Tab, TabEntry
+
+TOP_ITEMS = 5
+
+
+def comp_all(tab: Tab) -> int:
+    """
+    Comp every purchase on a tab with a single UPDATE and record each
+    comp on the ledger and in the audit log. Return the number of
+    purchases comped.
+    """
+    with transaction.atomic(), audit.batch():
+        tab = Tab.objects.select_for_update().get(pk=tab.pk)
+        purchases = list(tab.purchase_set.exclude(amount=0))
+        tab.purchase_set.filter(id__in=[p.id for p in purchases]).update(amount=0)
+        entries = [
+            (TabEntry.COMP, -purchase.amount, purchase) for purchase in purchases
+        ]
+        for purchase in purchases:
+            before = audit.snapshot(purchase)
+            purchase.comp()
+            audit.record(purchase, AuditEntry.COMP, before)
+        tab.record_entries(entries)
+        if purchases:
+            events.publish("comp", [tab.id])
+    return len(purchases)
+
+
+def move_purchases(purchases: list[Purchase], source: Tab, target: Tab) -> None:
+    """
+    Move purchases from one tab to another with a single UPDATE,
+    voiding them on the ledger of the source tab, charging them on the
+    ledger of the target tab and recording each move in the audit log.
+    """
+    Purchase.objects.filter(id__in=[p.id for p in purchases], tab=source).update(
+        tab=target
+    )
+    source.record_entries(
+        [(TabEntry.VOID, -purchase.amount, purchase) for purchase in purchases]
+    )
+    target.record_entries(
+        [(TabEntry.CHARGE, purchase.amount, purchase) for purchase in purchases]
+    )
+    for purchase in purchases:
+        before = audit.snapshot(purchase)
+        purchase.tab = target
+        audit.record(purchase, AuditEntry.CHANGE, before)
+
+
+def record_purchase_change(
+    purchase: Purchase, previous_tab: Tab, previous_amount: decimal.Decimal
+) -> None:
+    """
+    Record an edited purchase on the tab ledger. A purchase moved to
+    another tab is voided on its previous tab and charged on the new
+    one; otherwise any change in amount is recorded as an adjustment.
+    """
+    if purchase.tab_id != previous_tab.id:
+        previous_tab.record_entry(TabEntry.VOID, -previous_amount, purchase)
+        purchase.tab.record_entry(TabEntry.CHARGE, purchase.amount, purchase)
+    elif purchase.amount != previous_amount:
+        purchase.tab.record_entry(
+            TabEntry.ADJUSTMENT, purchase.amount - previous_amount, purchase
+        )
+
+
+def void_purchases(purchases: models.QuerySet) -> None:
+    """
+    Void purchases about to be deleted on the ledgers of their tabs,
+    with one insert per tab.
+    """
+    voided = {}
+    for purchase in purchases.select_related("tab"):
+        voided.setdefault(purchase.tab, []).append(
+            (TabEntry.VOID, -purchase.amount, purchase)
+        )
+    for tab, entries in voided.items():
+        tab.record_entries(entries)
+    if voided:
+        events.publish("purchase", [tab.id for tab in voided])
+
+
+def with_balances(tabs: models.QuerySet) -> models.QuerySet:
+    """
+    Annotate tabs with the running balance of their latest ledger
+    entry, or 0 if nothing has been recorded, in the same query.
+    """
+    latest = TabEntry.objects.filter(tab=models.OuterRef("pk")).order_by("-id")
+    return tabs.annotate(
+        balance=functions.Coalesce(
+            models.Subquery(latest.values("balance")[:1]),
+            models.Value(decimal.Decimal(0)),
+            output_field=models.DecimalField(max_digits=40, decimal_places=2),
+        )
+    )
+
+
+def split(tab: Tab, purchases: list[Purchase], customer: Customer = None) -> Tab:
+    """
+    Move the selected purchases of a tab onto a new tab, opened for the
+    given customer or the customer of the original tab. Return the new
+    tab.
+    """
+    with transaction.atomic(), audit.batch():
+        new_tab = Tab.objects.create(customer=customer or tab.customer, due=tab.due)
+        audit.record(new_tab, AuditEntry.CREATE)
+        move_purchases(list(purchases), tab, new_tab)
+        events.publish("tab", [tab.id, new_tab.id])
+    return new_tab
+
+
+def merge(tab: Tab, target: Tab) -> Tab:
+    """
+    Move every purchase of a tab onto another open tab and close the
+    emptied tab. Return the target tab.
+    """
+    with transaction.atomic(), audit.batch():
+        move_purchases(list(tab.purchase_set.all()), tab, target)
+        before = audit.snapshot(tab)
+        tab.closed = timezone.now()
+        tab.save(update_fields=["closed"])
+        audit.record(tab, AuditEntry.CHANGE, before)
+        events.publish("close", [tab.id, target.id])
+    return target
+
+
+def transfer(tab: Tab, customer: Customer) -> Tab:
+    """
+    Make another customer responsible for a tab. Return the tab.
+    """
+    before = audit.snapshot(tab)
+    Tab.objects.filter(pk=tab.pk).update(customer=customer)
+    events.publish("tab", [tab.id])
+    tab.customer = customer
+    audit.record(tab, AuditEntry.CHANGE, before)
+    return tab
+
+
+def close_out(tabs: list[Tab] = None) -> ShiftReport:
+    """
+    Close the given open tabs, or every open tab, with a single UPDATE,
+    record each closing in the audit log and store a shift report
+    summarizing their purchases. Return the report.
+    """
+    with transaction.atomic(), audit.batch():
+        open_tabs = Tab.objects.select_for_update().filter(closed__isnull=True)
+        if tabs is not None:
+            open_tabs = open_tabs.filter(id__in=[tab.id for tab in tabs])
+        closing = list(open_tabs.order_by())
+        ids = [tab.id for tab in closing]
+        closed = timezone.now()
+        Tab.objects.filter(id__in=ids).update(closed=closed)
+        for tab in closing:
+            before = audit.snapshot(tab)
+            tab.closed = closed
+            audit.record(tab, AuditEntry.CHANGE, before)
+        events.publish("close", ids)
+        return ShiftReport.objects.create(
+            tab_count=len(ids), **summarize(Purchase.objects.filter(tab__in=ids))
+        )
+
+
+def summarize(purchases: models.query.QuerySet) -> dict:
+    """
+    Summarize purchases with one grouped query. Return the revenue and
+    the value of comps, which is the amount comped on the tab ledgers,
+    along with a per-category breakdown and the best-selling items.
+    """
+    comped = (
+        TabEntry.objects.filter(purchase=models.OuterRef("pk"), kind=TabEntry.COMP)
+        .order_by()
+        .values("purchase")
+        .annotate(total=models.Sum("amount"))
+        .values("total")
+    )
+    rows = list(
+        purchases.order_by()
+        .values("item__name", "item__category__name")
+        .annotate(
+            sold=models.Sum("quantity"),
+            revenue=models.Sum("amount"),
+            comps=-models.Sum(models.Subquery(comped)),
+        )
+        .order_by("-sold", "item__name")
+    )
+
+    categories = {}
+    for row in rows:
+        category = categories.setdefault(
+            row["item__category__name"], {"revenue": 0, "comps": 0, "quantity": 0}
+        )
+        category["revenue"] += row["revenue"]
+        category["comps"] += row["comps"] or 0
+        category["quantity"] += row["sold"]
+
+    return {
+        "revenue": sum(row["revenue"] for row in rows),
+        "comps": sum(row["comps"] or 0 for row in rows),
+        "summary": {
+            "categories": [
+                {
+                    "name": name,
+                    "revenue": str(totals["revenue"]),
+                    "comps": str(totals["comps"]),
+                    "quantity": totals["quantity"],
+                }
+                for name, totals in sorted(categories.items())
+            ],
+            "top_items": [
+                {
+                    "name": row["item__name"],
+                    "quantity": row["sold"],
+                    "revenue": str(row["revenue"]),
+                }
+                for row in rows[:TOP_ITEMS]
+            ],
+        },
+    }
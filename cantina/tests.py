@@ -1,7 +1,40 @@
-from django.test import TestCase
+import decimal
+import gzip
+import io
+import json
+import pathlib
+import tempfile
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.template import engines
+from django.templatetags.static import static
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from datetime import datetime
-
+from django.utils import timezone
+from datetime import datetime, time
+
+from . import (
+    audit,
+    counts,
+    events,
+    forecasting,
+    inventory,
+    metrics,
+    orders,
+    querylog,
+    receiving,
+    stocklevels,
+    tabs,
+)
+from . import urls as cantina_urls
 from .models import (
     Customer,
     Tab,
@@ -11,8 +44,24 @@ from .models import (
     InventoryItemCategory,
     InventoryItem,
     Component,
+    TabEntry,
+    IdempotencyKey,
+    PricingRule,
+    ShiftReport,
+    InventoryCount,
+    InventoryCountLine,
+    PurchaseOrder,
+    PurchaseOrderLine,
+    StockSeries,
+    AuditEntry,
+    get_version,
 )
+from .archive import purge
+from .middleware import ProfilingMiddleware
+from .orders import place_order
+from .pricing import get_rules, reprice
 from .views import get_tab
+from .warmup import warm_up
 
 
 class CustomerTestCase(TestCase):
@@ -120,6 +169,30 @@ class TabTestCase(TestCase):
 
         self.assertEqual(self.tab.get_amount(), 40)
 
+    def test_tab_get_balance_with_no_entries(self):
+        """
+        The get_balance method of the Tab model should return the
+        balance of the latest ledger entry. A tab with no entries
+        should return 0.
+        """
+        self.assertEqual(self.tab.get_balance(), 0)
+
+    def test_tab_record_entry_carries_balance(self):
+        """
+        The record_entry method of the Tab model should append an entry
+        to the ledger with the running balance of the tab.
+        """
+        purchase = Purchase.objects.create(
+            tab=self.tab, item=self.item, quantity=2, amount=10
+        )
+        self.tab.record_entry(TabEntry.CHARGE, 10, purchase)
+        self.tab.record_entry(TabEntry.COMP, -10, purchase)
+        entry = self.tab.record_entry(TabEntry.CHARGE, 5)
+
+        self.assertEqual(entry.balance, 5)
+        self.assertEqual(self.tab.get_balance(), 5)
+        self.assertEqual(self.tab.tabentry_set.count(), 3)
+
 
 class PurchaseTestCase(TestCase):
     def setUp(self):
@@ -168,6 +241,20 @@ class PurchaseTestCase(TestCase):
 
         self.assertEqual(self.purchase.amount, 0)
 
+    def test_purchase_update_amount_after_price_change(self):
+        """
+        The update_amount method of the Purchase model should price the
+        purchase at the price of the menu item when it was purchased,
+        not its current price.
+        """
+        item = self.purchase.item
+        item.price = 9
+        item.save()
+        self.purchase.quantity = 3
+        self.purchase.update_amount()
+
+        self.assertEqual(self.purchase.amount, 21)
+
 
 class AllCustomersViewTestCase(TestCase):
     def test_no_customers(self):
@@ -277,6 +364,55 @@ class AllTabsViewTestCase(TestCase):
 
         self.assertQuerySetEqual(response.context["instances"], [tab2, tab1])
 
+    def test_balances_read_with_tabs(self):
+        """
+        The tabs page should display the ledger balance of every tab,
+        read along with the tabs in a single query.
+        """
+        category = MenuItemCategory.objects.create(name="Beer")
+        item = MenuItem.objects.create(name="Groot Root", category=category, price=3)
+        for customer in Customer.objects.all():
+            place_order(customer.id, [(item, customer.id)])
+
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse("cantina:view_all", kwargs={"table": "tabs"})
+            )
+            balances = {
+                tab.customer.last_name: tab.balance
+                for tab in response.context["instances"]
+            }
+
+        self.assertEqual(
+            balances,
+            {
+                customer.last_name: 3 * customer.id
+                for customer in Customer.objects.all()
+            },
+        )
+
+    def test_rows_fragment(self):
+        """
+        The tab rows view should render the rows of the requested tabs
+        only, with their balances, in a single query.
+        """
+        rocket_racoon = Customer.objects.get(last_name="Raccoon")
+        groot = Customer.objects.get(last_name="Groot")
+        category = MenuItemCategory.objects.create(name="Beer")
+        item = MenuItem.objects.create(name="Groot Root", category=category, price=3)
+        tab = place_order(rocket_racoon.id, [(item, 2)])[0].tab
+        other = place_order(groot.id, [(item, 1)])[0].tab
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("cantina:tab_rows"), {"tab": [tab.id, "x"]}
+            )
+
+        self.assertContains(response, f'<tr data-tab="{tab.id}">')
+        self.assertEqual([tab.balance for tab in response.context["instances"]], [6])
+        self.assertNotContains(response, f'data-tab="{other.id}"')
+        self.assertNotContains(response, "<html")
+
 
 class AllPurchasesViewTestCase(TestCase):
     def setUp(self):
@@ -335,6 +471,28 @@ class AllPurchasesViewTestCase(TestCase):
         self.assertQuerySetEqual(response.context["instances"], [purchase2, purchase1])
 
 
+class TabPurchasesViewTestCase(TestCase):
+    def test_purchases_fragment(self):
+        """
+        The tab purchases view should render only the purchases and the
+        balance of the tab.
+        """
+        customer = Customer.objects.create(
+            last_name="Raccoon", first_name="Rocket", planet="Halfworld", uba=""
+        )
+        category = MenuItemCategory.objects.create(name="Beer")
+        item = MenuItem.objects.create(name="Groot Root", category=category, price=3)
+        tab = place_order(customer.id, [(item, 2)])[0].tab
+
+        response = self.client.get(
+            reverse("cantina:tab_purchases", kwargs={"id": tab.id})
+        )
+
+        self.assertContains(response, 'id="purchases"')
+        self.assertContains(response, "Total: 6.00 credits")
+        self.assertNotContains(response, "<html")
+
+
 class CustomerDetailsViewTestCase(TestCase):
     def test_customer_does_not_exist(self):
         """
@@ -484,6 +642,12 @@ class TabDetailsViewTestCase(TestCase):
         purchase3 = Purchase.objects.create(
             tab=tab, item=self.item, quantity=5, amount=30
         )
+        tab.record_entries(
+            [
+                (TabEntry.CHARGE, purchase.amount, purchase)
+                for purchase in [purchase1, purchase2, purchase3]
+            ]
+        )
         response = self.client.get(
             reverse("cantina:view", kwargs={"table": "tabs", "id": tab.id})
         )
@@ -1340,6 +1504,47 @@ class AddPurchaseViewTestCase(TestCase):
         with self.assertRaises(Purchase.DoesNotExist):
             Purchase.objects.get(item=self.item)
 
+    def test_replayed_post_request(self):
+        """
+        The add purchase view should not add a second purchase if a
+        POST request is replayed with the same idempotency key.
+        """
+        url = reverse(
+            "cantina:menu_options",
+            kwargs={"item": self.item.id, "table": "purchases"},
+        )
+        data = {
+            "item": self.item.id,
+            "customer": self.customer.id,
+            "quantity": 2,
+            "idempotency_key": "5b0b7e0a9d4f4c0c9a1d",
+        }
+        self.client.post(url, data)
+        response = self.client.post(url, data)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Purchase.objects.filter(item=self.item).count(), 1)
+        self.assertEqual(Tab.objects.get(customer=self.customer).get_balance(), 8)
+
+    def test_idempotency_key_header(self):
+        """
+        The add purchase view should accept the idempotency key in a
+        header, rejecting keys longer than the form field allows.
+        """
+        url = reverse(
+            "cantina:menu_options",
+            kwargs={"item": self.item.id, "table": "purchases"},
+        )
+        data = {"item": self.item.id, "customer": self.customer.id, "quantity": 1}
+
+        for _ in range(2):
+            self.client.post(url, data, headers={"Idempotency-Key": "k" * 64})
+        response = self.client.post(url, data, headers={"Idempotency-Key": "k" * 65})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["form"].has_error("idempotency_key"))
+        self.assertEqual(Purchase.objects.filter(item=self.item).count(), 1)
+
 
 class EditCustomerViewTestCase(TestCase):
     def setUp(self):
@@ -1902,6 +2107,27 @@ class EditPurchaseViewTestCase(TestCase):
         self.assertEqual(purchase.quantity, 2)
         self.assertEqual(purchase.amount, self.purchase.item.price * 2)
 
+    def test_valid_post_request_records_adjustment(self):
+        """
+        The edit purchase view should record a change to the amount of
+        a purchase as an adjustment on the tab ledger.
+        """
+        self.purchase.tab.record_entry(TabEntry.CHARGE, 10, self.purchase)
+
+        self.client.post(
+            reverse("cantina:edit_purchase", kwargs={"id": self.purchase.id}),
+            {
+                "customer": f"{self.purchase.tab.customer.id}",
+                "item": f"{self.purchase.item.id}",
+                "quantity": "3",
+            },
+        )
+        entry = self.purchase.tab.tabentry_set.first()
+
+        self.assertEqual(entry.kind, TabEntry.ADJUSTMENT)
+        self.assertEqual(entry.amount, 20)
+        self.assertEqual(self.purchase.tab.get_balance(), 30)
+
     def test_invalid_post_request(self):
         """
         The edit purchase view should not edit a purchase's information
@@ -1970,6 +2196,24 @@ class DeleteCustomerViewTestCase(TestCase):
         with self.assertRaises(Customer.DoesNotExist):
             Customer.objects.get(id=self.customer.id)
 
+    def test_get_request_archives_tabs(self):
+        """
+        The delete customer view should archive the customer and their
+        tabs rather than deleting them, hiding both from the
+        application.
+        """
+        tab = Tab.objects.create(customer=self.customer)
+
+        self.client.get(
+            reverse(
+                "cantina:delete", kwargs={"table": "customers", "id": self.customer.id}
+            )
+        )
+
+        self.assertIsNotNone(Customer.all_objects.get(id=self.customer.id).archived)
+        self.assertIsNotNone(Tab.all_objects.get(id=tab.id).archived)
+        self.assertQuerySetEqual(Tab.objects.all(), [])
+
 
 class DeleteTabViewTestCase(TestCase):
     def setUp(self):
@@ -2047,6 +2291,26 @@ class DeleteMenuItemViewTestCase(TestCase):
         with self.assertRaises(MenuItem.DoesNotExist):
             MenuItem.objects.get(id=self.item.id)
 
+    def test_purchases_voided(self):
+        """
+        The delete menu item view should void the purchases of the item
+        on the ledgers of their tabs.
+        """
+        customer = Customer.objects.create(
+            last_name="Nebula", first_name="", planet="Luphomoid", uba=""
+        )
+        other = MenuItem.objects.create(
+            name="Orloni Sour", category=self.item.category, price=7
+        )
+        tab = place_order(customer.id, [(self.item, 1), (other, 1)])[0].tab
+
+        self.client.get(
+            reverse("cantina:delete", kwargs={"table": "menu", "id": self.item.id})
+        )
+
+        self.assertEqual(tab.get_balance(), 7)
+        self.assertEqual(tab.get_balance(), tab.get_amount())
+
 
 class DeleteInventoryItemViewTestCase(TestCase):
     def setUp(self):
@@ -2230,6 +2494,2342 @@ class CompPurchaseViewTestCase(TestCase):
         self.assertEqual(response.templates[0].name, "cantina/tab.html")
         self.assertEqual(purchase.amount, 0)
 
+    def test_get_request_records_comp(self):
+        """
+        The comp purchase view should record the comp on the tab ledger
+        and reduce the balance of the tab by the amount of the purchase.
+        """
+        self.purchase.tab.record_entry(TabEntry.CHARGE, 28, self.purchase)
+
+        self.client.get(
+            reverse("cantina:comp_purchase", kwargs={"id": self.purchase.id})
+        )
+        entry = self.purchase.tab.tabentry_set.first()
+
+        self.assertEqual(entry.kind, TabEntry.COMP)
+        self.assertEqual(entry.amount, -28)
+        self.assertEqual(self.purchase.tab.get_balance(), 0)
+
+
+class SyncPurchasesViewTestCase(TestCase):
+    def setUp(self):
+        self.drax = Customer.objects.create(
+            last_name="Destroyer", first_name="Drax", planet="Kylos", uba=""
+        )
+        self.mantis = Customer.objects.create(
+            last_name="Mantis", first_name="", planet="Vietnam", uba=""
+        )
+        category = MenuItemCategory.objects.create(name="Beer")
+        self.item = MenuItem.objects.create(
+            name="Knowhere Stout", category=category, price=6
+        )
+        self.url = reverse("cantina:sync_purchases")
+
+    def sync(self, orders):
+        return self.client.post(
+            self.url, {"orders": orders}, content_type="application/json"
+        )
+
+    def test_valid_batch(self):
+        """
+        The sync purchases view should apply every order of a batch to
+        the open tab of its customer, keeping the time the order was
+        taken on the terminal.
+        """
+        response = self.sync(
+            [
+                {
+                    "key": "t1-1",
+                    "customer": self.drax.id,
+                    "item": self.item.id,
+                    "quantity": 2,
+                    "time": "2024-01-05T21:30:00+00:00",
+                },
+                {
+                    "key": "t1-2",
+                    "customer": self.mantis.id,
+                    "item": self.item.id,
+                    "quantity": 1,
+                },
+            ]
+        )
+        purchase = Purchase.objects.get(id=response.json()["applied"]["t1-1"])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["applied"]), 2)
+        self.assertEqual(purchase.time.strftime("%Y-%m-%d %H:%M"), "2024-01-05 21:30")
+        self.assertEqual(purchase.amount, 12)
+        self.assertEqual(get_tab(self.drax.id).get_balance(), 12)
+        self.assertEqual(get_tab(self.mantis.id).get_balance(), 6)
+
+    def test_replayed_batch(self):
+        """
+        The sync purchases view should report orders whose keys were
+        already applied as duplicates without adding them again.
+        """
+        order = {"key": "t1-1", "customer": self.drax.id, "item": self.item.id}
+        self.sync([dict(order, quantity=2)])
+        response = self.sync([dict(order, quantity=2)])
+
+        self.assertEqual(response.json()["applied"], {})
+        self.assertEqual(list(response.json()["duplicates"]), ["t1-1"])
+        self.assertEqual(Purchase.objects.count(), 1)
+
+    def test_invalid_orders(self):
+        """
+        The sync purchases view should reject malformed orders with a
+        reason while still applying the rest of the batch.
+        """
+        response = self.sync(
+            [
+                {"key": "t1-1", "customer": self.drax.id, "item": 0, "quantity": 1},
+                {
+                    "key": "t1-2",
+                    "customer": self.drax.id,
+                    "item": self.item.id,
+                    "quantity": 1,
+                },
+            ]
+        )
+
+        self.assertEqual(response.json()["errors"], {"t1-1": "Unknown item."})
+        self.assertEqual(list(response.json()["applied"]), ["t1-2"])
+
+    def test_mistyped_orders(self):
+        """
+        The sync purchases view should reject orders whose customer,
+        item or quantity is not an integer or whose key is too long to
+        store, and ignore orders whose key is not a string.
+        """
+        order = {"customer": self.drax.id, "item": self.item.id, "quantity": 1}
+
+        response = self.sync(
+            [
+                dict(order, key=["t1-1"]),
+                dict(order, key="t1-2", customer={"id": self.drax.id}),
+                dict(order, key="t1-3", item=[self.item.id]),
+                dict(order, key="t1-4", quantity=True),
+                dict(order, key="t1-5", customer=str(self.drax.id)),
+                dict(order, key="t" * 65),
+            ]
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["errors"],
+            {
+                "t1-2": "Unknown customer.",
+                "t1-3": "Unknown item.",
+                "t1-4": "Quantity must be a positive integer.",
+                "t1-5": "Unknown customer.",
+                "t" * 65: "Key is too long.",
+            },
+        )
+        self.assertFalse(Purchase.objects.exists())
+
+    def test_malformed_request(self):
+        """
+        The sync purchases view should return a 400 status code if the
+        request body is not a batch of orders.
+        """
+        response = self.client.post(
+            self.url, "not json", content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderTestCase(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            last_name="Kree", first_name="Ronan", planet="Hala", uba=""
+        )
+        category = MenuItemCategory.objects.create(name="Beer")
+        self.ale = MenuItem.objects.create(name="Kree Ale", category=category, price=5)
+        self.lager = MenuItem.objects.create(
+            name="Skrull Lager", category=category, price=3
+        )
+
+    def test_place_order_with_multiple_lines(self):
+        """
+        The place_order function should charge every line of an order
+        to the customer's open tab.
+        """
+        purchases = place_order(self.customer.id, [(self.ale, 2), (self.lager, 1)])
+        tab = get_tab(self.customer.id)
+
+        self.assertEqual(len(purchases), 2)
+        self.assertEqual(tab.get_amount(), 13)
+        self.assertEqual(tab.get_balance(), 13)
+
+    def test_place_order_with_used_key(self):
+        """
+        The place_order function should return the original purchases
+        without writing anything if the idempotency key was used before.
+        """
+        lines = [(self.ale, 2), (self.lager, 1)]
+        purchases = place_order(self.customer.id, lines, key="order-1")
+        replayed = place_order(self.customer.id, lines, key="order-1")
+
+        self.assertEqual(sorted(p.id for p in replayed), [p.id for p in purchases])
+        self.assertEqual(Purchase.objects.count(), 2)
+
+    def test_place_order_with_long_key(self):
+        """
+        The place_order function should reject an idempotency key longer
+        than the stored keys without writing anything.
+        """
+        with self.assertRaises(ValueError):
+            place_order(self.customer.id, [(self.ale, 1)], key="k" * 65)
+
+        self.assertFalse(Purchase.objects.exists())
+
+    def test_idempotency_key_expire(self):
+        """
+        The expire method of the IdempotencyKey model should delete
+        every key created before the given time, in batches.
+        """
+        for number in range(5):
+            IdempotencyKey.objects.create(key=f"order-{number}")
+
+        deleted = IdempotencyKey.expire(
+            timezone.now() + timezone.timedelta(seconds=1), batch_size=2
+        )
+
+        self.assertEqual(deleted, 5)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class MetricsViewTestCase(TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_no_requests(self):
+        """
+        The metrics view should only list the metrics view itself if no
+        other requests have been made.
+        """
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'view="view_all"')
+
+    def test_request_is_recorded(self):
+        """
+        The metrics view should report the latency, query count and
+        template render time of earlier requests by view and table.
+        """
+        self.client.get(reverse("cantina:view_all", kwargs={"table": "tabs"}))
+        response = self.client.get(reverse("metrics"))
+        labels = 'view="view_all",table="tabs"'
+
+        self.assertEqual(response["Content-Type"].split(";")[0], "text/plain")
+        self.assertContains(response, f"cantina_request_seconds_count{{{labels}}} 1")
+        # One query for the conditional GET validators and one for the tabs.
+        self.assertContains(response, f"cantina_db_queries_total{{{labels}}} 2")
+        self.assertContains(response, f"cantina_template_seconds_total{{{labels}}}")
+
+
+class ProfilingMiddlewareTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = pathlib.Path(directory.name)
+        self.enterContext(self.settings(PROFILE_DIR=self.directory))
+        self.url = reverse("cantina:view_all", kwargs={"table": "customers"})
+
+    def test_signed_header(self):
+        """
+        A request with a valid signed profiling header should have its
+        profile and allocation report written to the profile directory.
+        """
+        token = signing.TimestampSigner(salt=ProfilingMiddleware.salt).sign("profile")
+        response = self.client.get(self.url, headers={"X-Cantina-Profile": token})
+        report = next(self.directory.glob("*.txt")).read_text()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(list(self.directory.glob("*.prof"))), 1)
+        self.assertIn("View: cantina:view_all", report)
+        self.assertIn("Table: customers", report)
+        self.assertIn("Top allocation sites:", report)
+
+    def test_forged_header(self):
+        """
+        A request with an invalid profiling header should not be
+        profiled.
+        """
+        self.client.get(self.url, headers={"X-Cantina-Profile": "profile:forged"})
+
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    def test_query_parameter_without_staff(self):
+        """
+        A request adding ?profile to the URL should not be profiled
+        unless it was made by a staff member.
+        """
+        self.client.get(self.url, {"profile": ""})
+
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+
+class QueryLogTestCase(TestCase):
+    def setUp(self):
+        querylog.reset()
+
+    def test_fingerprint(self):
+        """
+        The fingerprint function should replace literals, placeholders
+        and lists of values so that similar statements match.
+        """
+        self.assertEqual(
+            querylog.fingerprint(
+                "SELECT * FROM cantina_tab WHERE id IN (%s, %s, %s) AND x = 'a''b'"
+            ),
+            querylog.fingerprint(
+                "SELECT *  FROM cantina_tab WHERE id IN (7) AND x = 3"
+            ),
+        )
+
+    def test_queries_are_attributed_to_view(self):
+        """
+        Queries run while handling a request should be recorded under
+        the view and table the request resolved to.
+        """
+        self.client.get(reverse("cantina:view_all", kwargs={"table": "tabs"}))
+        entries = [
+            entry
+            for entry in querylog.top()
+            if entry.view == "cantina:view_all" and entry.table == "tabs"
+        ]
+
+        # One query for the conditional GET validators and one for the tabs.
+        self.assertEqual(len(entries), 2)
+        self.assertEqual([entry.count for entry in entries], [1, 1])
+        for entry in entries:
+            self.assertIn('FROM "cantina_tab"', entry.fingerprint)
+
+    def test_querylog_view_requires_staff(self):
+        """
+        The query log page should only be shown to staff members.
+        """
+        response = self.client.get(reverse("querylog"))
+
+        self.assertEqual(response.status_code, 302)
+
+
+class StaticFilesTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(
+            self.settings(
+                STATIC_ROOT=directory.name,
+                STORAGES={
+                    "staticfiles": {
+                        "BACKEND": "cantina.storage.CompressedManifestStaticFilesStorage"
+                    }
+                },
+            )
+        )
+        call_command("collectstatic", interactive=False, verbosity=0)
+        self.url = static("cantina/stylesheet.css")
+
+    def test_pages_use_hashed_names(self):
+        """
+        Pages should reference static files by their content-hashed
+        names under the static URL.
+        """
+        response = self.client.get(
+            reverse("cantina:view_all", kwargs={"table": "customers"})
+        )
+
+        self.assertRegex(self.url, r"^/static/cantina/stylesheet\.[0-9a-f]{12}\.css$")
+        self.assertContains(response, f'href="{self.url}"')
+
+    def test_compressed_file_is_served(self):
+        """
+        A hashed static file should be served precompressed with
+        far-future cache headers if the client accepts gzip.
+        """
+        response = self.client.get(self.url, headers={"Accept-Encoding": "gzip"})
+        content = gzip.decompress(b"".join(response.streaming_content))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn(b"border-collapse", content)
+
+    def test_missing_file(self):
+        """
+        A static file that has not been collected should not be served.
+        """
+        response = self.client.get("/static/cantina/missing.css")
+
+        self.assertEqual(response.status_code, 404)
+
+
+class WarmupTestCase(TestCase):
+    def test_warm_up(self):
+        """
+        The warm_up function should resolve every URL name, compile
+        every template into the cached loader and open connections.
+        """
+        counts = warm_up()
+        loader = engines.all()[0].engine.template_loaders[0]
+
+        self.assertGreaterEqual(counts["urls"], len(cantina_urls.urlpatterns))
+        self.assertGreater(counts["templates"], 0)
+        self.assertGreater(counts["connections"], 0)
+        self.assertIn("cantina/base.html", loader.get_template_cache)
+
+    def test_warmup_command(self):
+        """
+        The warmup management command should report what was warmed.
+        """
+        output = io.StringIO()
+        call_command("warmup", stdout=output)
+
+        self.assertIn("Warmed", output.getvalue())
+
+
+class MenuSnapshotViewTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.beer = MenuItemCategory.objects.create(name="Beer")
+        self.stout = MenuItem.objects.create(
+            name="Knowhere Stout", category=self.beer, price=6
+        )
+        self.lager = MenuItem.objects.create(
+            name="Skrull Lager", category=self.beer, price=3
+        )
+        self.url = reverse("cantina:menu_snapshot")
+
+    def test_full_menu(self):
+        """
+        The menu snapshot view should return every category and item of
+        the menu along with its version as the ETag.
+        """
+        response = self.client.get(self.url)
+        document = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], f'"{document["version"]}"')
+        self.assertEqual(document["categories"][0]["name"], "Beer")
+        self.assertEqual(
+            document["categories"][0]["items"][0],
+            {
+                "id": self.stout.id,
+                "name": "Knowhere Stout",
+                "price": "6.00",
+                "available": True,
+            },
+        )
+
+    def test_unchanged_menu(self):
+        """
+        The menu snapshot view should return a 304 status code if the
+        client already has the latest version.
+        """
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_delta(self):
+        """
+        The menu snapshot view should only return the items changed
+        since an earlier version if one is requested.
+        """
+        version = self.client.get(self.url).json()["version"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lager.price = 4
+            self.lager.save()
+        response = self.client.get(self.url, {"since": version})
+        delta = response.json()
+
+        self.assertGreater(delta["version"], version)
+        self.assertEqual(delta["categories"], [])
+        self.assertEqual([item["name"] for item in delta["items"]], ["Skrull Lager"])
+        self.assertEqual(delta["items"][0]["price"], "4.00")
+
+    def test_unavailable_item(self):
+        """
+        An item should be marked unavailable if any of its ingredients
+        is out of stock.
+        """
+        category = InventoryItemCategory.objects.create(name="Beer")
+        keg = InventoryItem.objects.create(
+            name="Stout Keg",
+            category=category,
+            stock=0,
+            cost=90,
+            reorder_point=1,
+            reorder_amount=2,
+        )
+        Component.objects.create(item=self.stout, ingredient=keg, amount=16)
+        items = self.client.get(self.url).json()["categories"][0]["items"]
+
+        self.assertEqual([item["available"] for item in items], [False, True])
+
+
+class MakeableTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = MenuItemCategory.objects.create(name="Cocktail")
+        self.mule = MenuItem.objects.create(
+            name="Moscow Mule", category=category, price=8
+        )
+        self.shot = MenuItem.objects.create(
+            name="Vodka Shot", category=category, price=4
+        )
+        self.water = MenuItem.objects.create(name="Water", category=category, price=0)
+        spirits = InventoryItemCategory.objects.create(name="Spirits")
+        self.vodka = InventoryItem.objects.create(
+            name="Vodka",
+            category=spirits,
+            stock=1,
+            cost=20,
+            reorder_point=1,
+            reorder_amount=5,
+        )
+        self.ginger_beer = InventoryItem.objects.create(
+            name="Ginger Beer",
+            category=spirits,
+            stock=0,
+            cost=3,
+            reorder_point=1,
+            reorder_amount=5,
+        )
+        Component.objects.create(item=self.mule, ingredient=self.vodka, amount=2)
+        Component.objects.create(item=self.mule, ingredient=self.ginger_beer, amount=4)
+        Component.objects.create(item=self.shot, ingredient=self.vodka, amount="1.5")
+        self.customer = Customer.objects.create(
+            last_name="Drax", first_name="", planet="Kylos", uba=""
+        )
+
+    def test_count_makeable(self):
+        """
+        The makeable count of every menu item should be computed in one
+        query from the scarcest of its ingredients.
+        """
+        with self.assertNumQueries(1):
+            counts = inventory.count_makeable()
+
+        self.assertEqual(counts, {self.mule.id: 0, self.shot.id: 16})
+
+    def test_menu_marks_unavailable_items(self):
+        """
+        The menu view should display makeable counts and mark items that
+        cannot be made as unavailable.
+        """
+        response = self.client.get(
+            reverse(
+                "cantina:view_category",
+                kwargs={"table": "menu", "id": self.mule.category.id},
+            )
+        )
+
+        self.assertContains(response, "Unavailable", count=1)
+        self.assertContains(response, "<td>16</td>")
+        self.assertNotContains(
+            response,
+            reverse(
+                "cantina:menu_options",
+                kwargs={"table": "purchases", "item": self.mule.id},
+            ),
+        )
+
+    def test_order_unavailable_item(self):
+        """
+        The add purchase view should not place an order for an item that
+        cannot be made or for more servings than can be made.
+        """
+        url = reverse(
+            "cantina:menu_options", kwargs={"table": "purchases", "item": self.mule.id}
+        )
+
+        unavailable = self.client.post(
+            url, {"item": self.mule.id, "customer": self.customer.id, "quantity": 1}
+        )
+        too_many = self.client.post(
+            url, {"item": self.shot.id, "customer": self.customer.id, "quantity": 17}
+        )
+
+        self.assertContains(unavailable, "Moscow Mule is unavailable.")
+        self.assertContains(too_many, "Only 16 Vodka Shot can be made.")
+        self.assertFalse(Purchase.objects.exists())
+
+    def test_menu_counts_looked_up_once(self):
+        """
+        The menu view should look the makeable counts up once rather
+        than once per item.
+        """
+        url = reverse(
+            "cantina:view_category",
+            kwargs={"table": "menu", "id": self.mule.category.id},
+        )
+        self.client.get(url)
+
+        # Validators, category, menu items and the makeable counts version.
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+    def test_refresh_on_change(self):
+        """
+        The cached makeable counts should be refreshed when stock or
+        recipes change, including changes made without signals.
+        """
+        inventory.get_makeable()
+        InventoryItem.objects.filter(pk=self.ginger_beer.pk).update(stock=2)
+
+        self.assertEqual(self.mule.get_makeable(), 12)
+
+        Component.objects.get(item=self.shot).delete()
+
+        self.assertIsNone(self.shot.get_makeable())
+        self.assertIsNone(self.water.get_makeable())
+
+
+class ForecastingTestCase(TestCase):
+    def setUp(self):
+        category = MenuItemCategory.objects.create(name="Cocktail")
+        self.martini = MenuItem.objects.create(
+            name="Martini", category=category, price=9
+        )
+        spirits = InventoryItemCategory.objects.create(name="Spirits")
+        self.gin = InventoryItem.objects.create(
+            name="Gin",
+            category=spirits,
+            stock=10,
+            cost=30,
+            reorder_point=1,
+            reorder_amount=1,
+        )
+        Component.objects.create(
+            item=self.martini, ingredient=self.gin, amount=settings.OUNCES_PER_BOTTLE
+        )
+        customer = Customer.objects.create(
+            last_name="Kraglin", first_name="", planet="Xandar", uba=""
+        )
+        self.tab = Tab.objects.create(customer=customer)
+        self.start = timezone.localdate() - timezone.timedelta(days=56)
+
+    def buy(self, quantities):
+        """
+        Record a purchase of martinis on each of the consecutive days
+        starting 56 days ago, in the given quantities.
+        """
+        Purchase.objects.bulk_create(
+            Purchase(
+                tab=self.tab,
+                item=self.martini,
+                quantity=quantity,
+                amount=9 * quantity,
+                time=timezone.make_aware(
+                    datetime.combine(
+                        self.start + timezone.timedelta(days=day), time(20)
+                    )
+                ),
+            )
+            for day, quantity in enumerate(quantities)
+            if quantity
+        )
+
+    def test_daily_usage(self):
+        """
+        Daily usage should convert the servings sold every day into
+        bottles of each ingredient, including days without sales.
+        """
+        self.buy([2, 0, 1])
+
+        first, ingredients, usage = forecasting.daily_usage()
+
+        self.assertEqual(first, self.start)
+        self.assertEqual(ingredients, [self.gin.id])
+        self.assertEqual(usage.tolist(), [[2], [0], [1]])
+
+    def test_steady_demand(self):
+        """
+        Steady demand should yield reorder points and amounts covering
+        the lead time and the ordering cycle without safety stock.
+        """
+        self.buy([1] * 56)
+
+        self.assertEqual(forecasting.suggest_reorders(), {self.gin.id: (3, 7)})
+
+    def test_weekday_seasonality(self):
+        """
+        Forecasts should follow the weekday pattern of past demand.
+        """
+        self.buy([7 if day % 7 == 0 else 0 for day in range(56)])
+        first, ingredients, usage = forecasting.daily_usage()
+
+        level, seasons, deviation = forecasting.fit(usage, first.weekday())
+        forecast = forecasting.project(level, seasons, first.weekday(), 7)
+
+        self.assertAlmostEqual(forecast[0][0], 7)
+        self.assertAlmostEqual(forecast[1:].sum(), 0)
+
+    def test_command(self):
+        """
+        The forecast_reorders command should save the suggestions when
+        asked to apply them.
+        """
+        self.buy([1] * 56)
+
+        call_command("forecast_reorders", "--apply", stdout=io.StringIO())
+        self.gin.refresh_from_db()
+
+        self.assertEqual((self.gin.reorder_point, self.gin.reorder_amount), (3, 7))
+
+
+class EventPlanViewTestCase(TestCase):
+    def setUp(self):
+        category = MenuItemCategory.objects.create(name="Cocktail")
+        self.mule = MenuItem.objects.create(
+            name="Moscow Mule", category=category, price=8
+        )
+        self.shot = MenuItem.objects.create(
+            name="Vodka Shot", category=category, price=4
+        )
+        spirits = InventoryItemCategory.objects.create(name="Spirits")
+        self.vodka = InventoryItem.objects.create(
+            name="Vodka",
+            category=spirits,
+            stock=1,
+            cost=20,
+            reorder_point=1,
+            reorder_amount=5,
+        )
+        self.ginger_beer = InventoryItem.objects.create(
+            name="Ginger Beer",
+            category=spirits,
+            stock=10,
+            cost=3,
+            reorder_point=1,
+            reorder_amount=5,
+        )
+        ounces = decimal.Decimal(settings.OUNCES_PER_BOTTLE)
+        Component.objects.create(
+            item=self.mule, ingredient=self.vodka, amount=ounces / 2
+        )
+        Component.objects.create(
+            item=self.mule, ingredient=self.ginger_beer, amount=ounces / 4
+        )
+        Component.objects.create(
+            item=self.shot, ingredient=self.vodka, amount=ounces / 4
+        )
+
+    def test_plan(self):
+        """
+        The plan event view should compare the ingredients needed for the
+        expected orders with current stock and list the cost of any
+        shortfall in whole bottles.
+        """
+        response = self.client.post(
+            reverse("cantina:plan_event"),
+            {f"item_{self.mule.id}": 4, f"item_{self.shot.id}": 2},
+        )
+        plan = response.context["plan"]
+        ingredients = {
+            ingredient["name"]: ingredient for ingredient in plan["ingredients"]
+        }
+
+        self.assertEqual(ingredients["Vodka"]["need"], decimal.Decimal("2.5"))
+        self.assertEqual(ingredients["Vodka"]["shortfall"], decimal.Decimal("1.5"))
+        self.assertEqual(ingredients["Vodka"]["cost"], 40)
+        self.assertEqual(ingredients["Ginger Beer"]["need"], 1)
+        self.assertEqual(ingredients["Ginger Beer"]["shortfall"], 0)
+        self.assertEqual([item["name"] for item in plan["shortfalls"]], ["Vodka"])
+        self.assertContains(response, "Total cost of shortfalls: 40")
+
+    def test_recipe_matrix_cached(self):
+        """
+        The recipe matrix should be reused until a recipe changes.
+        """
+        recipes = inventory.get_recipes()
+
+        self.assertIs(inventory.get_recipes(), recipes)
+
+        Component.objects.filter(item=self.shot).get().delete()
+
+        self.assertIsNot(inventory.get_recipes(), recipes)
+        self.assertEqual(inventory.get_recipes().items, [self.mule.id])
+
+    def test_recipe_matrix_refreshed_without_signals(self):
+        """
+        The recipe matrix should be rebuilt after a change made without
+        signals, as by another process.
+        """
+        recipes = inventory.get_recipes()
+
+        Component.objects.filter(item=self.shot).update(amount=3)
+
+        self.assertIsNot(inventory.get_recipes(), recipes)
+
+    def test_get_request(self):
+        """
+        The plan event view should return a quantity field for every
+        menu item with a recipe upon receiving a GET request.
+        """
+        response = self.client.get(reverse("cantina:plan_event"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Moscow Mule:")
+        self.assertIsNone(response.context["plan"])
+
+
+class CountInventoryViewTestCase(TestCase):
+    def setUp(self):
+        self.spirits = InventoryItemCategory.objects.create(name="Spirits")
+        self.vodka = InventoryItem.objects.create(
+            name="Vodka",
+            category=self.spirits,
+            stock=10,
+            cost=20,
+            reorder_point=1,
+            reorder_amount=5,
+        )
+        self.rum = InventoryItem.objects.create(
+            name="Rum",
+            category=self.spirits,
+            stock=5,
+            cost=25,
+            reorder_point=1,
+            reorder_amount=5,
+        )
+        category = MenuItemCategory.objects.create(name="Shots")
+        self.shot = MenuItem.objects.create(
+            name="Vodka Shot", category=category, price=4
+        )
+        Component.objects.create(
+            item=self.shot,
+            ingredient=self.vodka,
+            amount=decimal.Decimal(settings.OUNCES_PER_BOTTLE) / 4,
+        )
+        self.customer = Customer.objects.create(
+            last_name="Nebula", first_name="", planet="Luphomoid", uba=""
+        )
+        self.url = reverse("cantina:count_inventory", kwargs={"id": self.spirits.id})
+
+    def post_count(self, vodka, rum):
+        """
+        Submit a count sheet for the spirits category.
+        """
+        return self.client.post(
+            self.url,
+            {
+                "form-TOTAL_FORMS": 2,
+                "form-INITIAL_FORMS": 2,
+                "form-0-id": self.rum.id,
+                "form-0-stock": rum,
+                "form-1-id": self.vodka.id,
+                "form-1-stock": vodka,
+            },
+        )
+
+    def test_get_request(self):
+        """
+        The count inventory view should return a count sheet with a form
+        for every item of the category.
+        """
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["formset"]), 2)
+        self.assertContains(response, "<td>Vodka</td>")
+
+    def test_first_count(self):
+        """
+        The count inventory view should apply the counted stock and
+        store the count, measuring variance from recorded stock for
+        items never counted before.
+        """
+        response = self.post_count(vodka=9, rum=5)
+        count = InventoryCount.objects.get()
+        self.vodka.refresh_from_db()
+
+        self.assertRedirects(response, f"/inventory/counts/{count.id}/")
+        self.assertEqual(self.vodka.stock, 9)
+        self.assertEqual(
+            list(count.inventorycountline_set.values_list("item__name", "variance")),
+            [("Rum", 0), ("Vodka", -1)],
+        )
+
+    def test_count_after_sales(self):
+        """
+        Expected stock should be the previous count minus the recipe
+        usage of purchases made since then.
+        """
+        self.post_count(vodka=9, rum=5)
+        place_order(self.customer.id, [(self.shot, 8)])
+
+        items = {
+            item.name: item
+            for item in counts.expected_stock(InventoryItem.objects.all())
+        }
+        self.post_count(vodka="6.50", rum=5)
+        line = InventoryCountLine.objects.filter(item=self.vodka).order_by("-count_id")[
+            0
+        ]
+
+        self.assertEqual(items["Vodka"].expected, 7)
+        self.assertEqual(items["Rum"].expected, 5)
+        self.assertEqual(line.expected, 7)
+        self.assertEqual(line.variance, decimal.Decimal("-0.5"))
+
+    def test_expected_stock_query_count(self):
+        """
+        Expected stock should be computed for a whole category with a
+        single query.
+        """
+        with self.assertNumQueries(1):
+            list(counts.expected_stock(self.spirits.inventoryitem_set.all()))
+
+
+class ShrinkageViewTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.spirits = InventoryItemCategory.objects.create(name="Spirits")
+        self.vodka = InventoryItem.objects.create(
+            name="Vodka",
+            category=self.spirits,
+            stock=10,
+            cost=20,
+            reorder_point=1,
+            reorder_amount=5,
+        )
+        category = MenuItemCategory.objects.create(name="Shots")
+        self.shot = MenuItem.objects.create(
+            name="Vodka Shot", category=category, price=4
+        )
+        Component.objects.create(
+            item=self.shot,
+            ingredient=self.vodka,
+            amount=decimal.Decimal(settings.OUNCES_PER_BOTTLE) / 4,
+        )
+        customer = Customer.objects.create(
+            last_name="Mantis", first_name="", planet="Unknown", uba=""
+        )
+
+        counts.record_count(self.spirits, {self.vodka.id: 10})
+        place_order(customer.id, [(self.shot, 8)])
+        counts.record_count(self.spirits, {self.vodka.id: 7})
+        place_order(customer.id, [(self.shot, 4)])
+        counts.record_count(self.spirits, {self.vodka.id: 6})
+
+    def test_shrinkage(self):
+        """
+        The shrinkage view should compare theoretical and actual usage
+        between consecutive counts and flag excessive usage.
+        """
+        response = self.client.get(
+            reverse("cantina:view_shrinkage", kwargs={"id": self.spirits.id})
+        )
+        periods = response.context["periods"]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(periods), 2)
+        self.assertEqual(periods[0]["items"][0]["theoretical"], 2)
+        self.assertEqual(periods[0]["items"][0]["actual"], 3)
+        self.assertEqual(periods[0]["items"][0]["variance"], 1)
+        self.assertEqual(
+            [period["items"][0]["flag"] for period in periods], ["over", ""]
+        )
+        self.assertContains(response, "Over")
+
+    def test_window_out_of_range(self):
+        """
+        The shrinkage view should fall back to every count if the
+        requested window reaches past the earliest representable date.
+        """
+        url = reverse("cantina:view_shrinkage", kwargs={"id": self.spirits.id})
+
+        for days in ["1000000", "1" * 20]:
+            response = self.client.get(url, {"days": days})
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context["periods"]), 2)
+
+    def test_shrinkage_cached(self):
+        """
+        Measured periods should be served from the cache, and usage and
+        deliveries for all new periods should each be read with one
+        grouped query, after one grouped query for the versions of the
+        periods.
+        """
+        with self.assertNumQueries(5):
+            counts.shrinkage(self.spirits)
+        with self.assertNumQueries(2):
+            counts.shrinkage(self.spirits)
+
+    def test_backdated_purchase_measured(self):
+        """
+        A measured period should be measured again once a purchase made
+        during it is added late, as by an offline terminal, or deleted.
+        """
+        first, second = counts.shrinkage(self.spirits)
+        customer = Customer.objects.get()
+        time = first["start"] + (first["end"] - first["start"]) / 2
+        response = self.client.post(
+            reverse("cantina:sync_purchases"),
+            {
+                "orders": [
+                    {
+                        "key": "t1-1",
+                        "customer": customer.id,
+                        "item": self.shot.id,
+                        "quantity": 4,
+                        "time": time.isoformat(),
+                    }
+                ]
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(len(response.json()["applied"]), 1)
+
+        self.assertEqual(
+            counts.shrinkage(self.spirits)[0]["items"][0]["theoretical"],
+            first["items"][0]["theoretical"] + 1,
+        )
+        Purchase.objects.get(id=response.json()["applied"]["t1-1"]).delete()
+        self.assertEqual(counts.shrinkage(self.spirits), [first, second])
+
+    def test_single_count(self):
+        """
+        The shrinkage view should display an appropriate message if
+        fewer than two counts were made.
+        """
+        InventoryCount.objects.filter(
+            id__lt=InventoryCount.objects.latest().id
+        ).delete()
+
+        response = self.client.get(
+            reverse("cantina:view_shrinkage", kwargs={"id": self.spirits.id})
+        )
+
+        self.assertContains(response, "At least two counts of spirits are needed.")
+
+
+class ReceivingTestCase(TestCase):
+    def setUp(self):
+        self.spirits = InventoryItemCategory.objects.create(name="Spirits")
+        self.vodka = InventoryItem.objects.create(
+            name="Vodka",
+            category=self.spirits,
+            stock=10,
+            cost=20,
+            reorder_point=1,
+            reorder_amount=5,
+        )
+        self.rum = InventoryItem.objects.create(
+            name="Rum",
+            category=self.spirits,
+            stock=0,
+            cost=25,
+            reorder_point=1,
+            reorder_amount=5,
+        )
+        self.order = PurchaseOrder.objects.create(supplier="Xandar Wholesale")
+        PurchaseOrderLine.objects.create(
+            order=self.order, item=self.vodka, quantity=10, cost=30
+        )
+        PurchaseOrderLine.objects.create(
+            order=self.order, item=self.rum, quantity=4, cost="22.50"
+        )
+
+    def test_receive(self):
+        """
+        Receiving a purchase order should add every line to stock and
+        average the cost of the delivery into the cost of stock on hand.
+        """
+        receiving.receive(self.order)
+        self.vodka.refresh_from_db()
+        self.rum.refresh_from_db()
+        self.order.refresh_from_db()
+
+        self.assertEqual(self.vodka.stock, 20)
+        self.assertEqual(self.vodka.cost, 25)
+        self.assertEqual(self.rum.stock, 4)
+        self.assertEqual(self.rum.cost, decimal.Decimal("22.50"))
+        self.assertIsNotNone(self.order.received)
+
+    def test_receive_with_concurrent_depletion(self):
+        """
+        Receiving a purchase order should add to the stock in the
+        database rather than the stock last read.
+        """
+        InventoryItem.objects.filter(id=self.vodka.id).update(stock=40)
+
+        receiving.receive(self.order)
+        self.vodka.refresh_from_db()
+
+        self.assertEqual(self.vodka.stock, 50)
+        self.assertEqual(self.vodka.cost, 22)
+
+    def test_receive_twice(self):
+        """
+        A purchase order should only be received once.
+        """
+        receiving.receive(self.order)
+
+        with self.assertRaises(PurchaseOrder.DoesNotExist):
+            receiving.receive(self.order)
+
+    def test_expected_stock_after_delivery(self):
+        """
+        Expected stock should include deliveries received since the
+        latest count.
+        """
+        counts.record_count(self.spirits, {self.vodka.id: 10, self.rum.id: 0})
+        receiving.receive(self.order)
+
+        vodka = counts.expected_stock(InventoryItem.objects.filter(id=self.vodka.id))
+
+        self.assertEqual(vodka.get().expected, 20)
+
+
+class StockLevelsTestCase(TestCase):
+    def setUp(self):
+        category = InventoryItemCategory.objects.create(name="Spirits")
+        self.day = timezone.localdate() - timezone.timedelta(days=2)
+        self.vodka = InventoryItem.objects.create(
+            name="Vodka",
+            category=category,
+            stock=10,
+            cost=20,
+            reorder_point=1,
+            reorder_amount=5,
+        )
+        StockSeries.objects.all().delete()
+        stocklevels.record_levels({self.vodka.id: 10}, self.at(0, 8))
+        stocklevels.record_levels({self.vodka.id: "9.50"}, self.at(0, 12))
+        stocklevels.record_levels({self.vodka.id: 7}, self.at(0, 20))
+        stocklevels.record_levels({self.vodka.id: 12}, self.at(1, 10))
+
+    def at(self, days, hour):
+        """
+        Return the given hour of a day relative to the first day of the
+        series.
+        """
+        day = self.day + timezone.timedelta(days=days)
+        return timezone.make_aware(datetime.combine(day, time(hour)))
+
+    def test_packed_rows(self):
+        """
+        Stock levels should be stored as one row per item per day with
+        the opening level and the packed changes since.
+        """
+        rows = list(StockSeries.objects.filter(item=self.vodka))
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0].opening, 10)
+        self.assertEqual(len(bytes(rows[0].deltas)), 8)
+        self.assertEqual(rows[1].opening, 7)
+
+    def test_level_at(self):
+        """
+        The level at any instant should be reconstructed from the
+        opening level and the changes made before then.
+        """
+        self.assertIsNone(stocklevels.level_at(self.vodka.id, self.at(-1, 12)))
+        self.assertEqual(stocklevels.level_at(self.vodka.id, self.at(0, 9)), 10)
+        self.assertEqual(stocklevels.level_at(self.vodka.id, self.at(0, 12)), 9.5)
+        self.assertEqual(stocklevels.level_at(self.vodka.id, self.at(1, 9)), 7)
+        self.assertEqual(stocklevels.level_at(self.vodka.id, self.at(3, 0)), 12)
+
+    def test_series(self):
+        """
+        A range series should start with the level at the start of the
+        range followed by every change within it.
+        """
+        points = stocklevels.series(self.vodka.id, self.at(0, 10), self.at(1, 10))
+
+        self.assertEqual(
+            points,
+            [
+                (self.at(0, 10), 10),
+                (self.at(0, 12), decimal.Decimal("9.5")),
+                (self.at(0, 20), 7),
+                (self.at(1, 10), 12),
+            ],
+        )
+
+    def test_record_on_save(self):
+        """
+        Saving an inventory item should record its stock level.
+        """
+        self.vodka.stock = 4
+        self.vodka.save()
+
+        self.assertEqual(stocklevels.level_at(self.vodka.id, timezone.now()), 4)
+
+    def test_stock_levels_view(self):
+        """
+        The stock levels view should return the series of a time range
+        and a 400 status code for invalid times.
+        """
+        url = reverse("cantina:view_stock_levels", kwargs={"id": self.vodka.id})
+
+        response = self.client.get(
+            url,
+            {"start": self.at(0, 10).isoformat(), "end": self.at(0, 23).isoformat()},
+        )
+        invalid = self.client.get(url, {"start": "2024-13-01T00:00:00+00:00"})
+
+        self.assertEqual(
+            [level for _, level in response.json()["levels"]], ["10.00", "9.50", "7.00"]
+        )
+        self.assertEqual(invalid.status_code, 400)
+
+
+class AuditTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser("cosmo", password="space-dog")
+        self.client.force_login(self.user)
+        self.customer = Customer.objects.create(
+            last_name="Quill", first_name="Peter", planet="Earth", uba=""
+        )
+        category = MenuItemCategory.objects.create(name="Cocktail")
+        self.item = MenuItem.objects.create(
+            name="Awesome Mix", category=category, price=5
+        )
+        self.purchases = place_order(self.customer.id, [(self.item, 1), (self.item, 2)])
+
+    def test_edit_recorded(self):
+        """
+        Editing an instance should record the user and the fields that
+        changed.
+        """
+        self.client.post(
+            reverse(
+                "cantina:edit", kwargs={"table": "customers", "id": self.customer.id}
+            ),
+            {
+                "last_name": "Quill",
+                "first_name": "Star-Lord",
+                "planet": "Earth",
+                "uba": "",
+            },
+        )
+        entry = audit.history(self.customer).get()
+
+        self.assertEqual(entry.user, self.user)
+        self.assertEqual(entry.action, AuditEntry.CHANGE)
+        self.assertEqual(entry.changes, {"first_name": ["Peter", "Star-Lord"]})
+
+    def test_comp_recorded(self):
+        """
+        Comping a purchase should record the amount it was comped from.
+        """
+        self.client.get(reverse("cantina:comp_purchase", args=[self.purchases[0].id]))
+        entry = audit.history(self.purchases[0]).get(action=AuditEntry.COMP)
+
+        self.assertEqual(entry.action, AuditEntry.COMP)
+        self.assertEqual(entry.changes, {"amount": ["5.00", "0"]})
+
+    def test_delete_recorded(self):
+        """
+        Deleting an instance should record the values it held.
+        """
+        purchase = self.purchases[1]
+
+        self.client.get(
+            reverse("cantina:delete", kwargs={"table": "purchases", "id": purchase.id})
+        )
+        entry = AuditEntry.objects.get(action=AuditEntry.DELETE)
+
+        self.assertEqual(entry.object_id, purchase.id)
+        self.assertEqual(entry.changes["quantity"], [2, None])
+
+    def test_entries_written_once_per_request(self):
+        """
+        Audit entries recorded while handling a request should be
+        written with a single query.
+        """
+        tab = self.purchases[0].tab
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse("cantina:comp_tab", kwargs={"id": tab.id}))
+        inserts = [
+            query
+            for query in context.captured_queries
+            if query["sql"].startswith('INSERT INTO "cantina_auditentry"')
+        ]
+
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(AuditEntry.objects.filter(action=AuditEntry.COMP).count(), 2)
+
+    def test_admin_change_recorded(self):
+        """
+        Changes made through the admin should be recorded.
+        """
+        self.client.post(
+            reverse("admin:cantina_menuitem_change", args=[self.item.id]),
+            {"name": "Awesome Mix", "category": self.item.category.id, "price": 6},
+        )
+        entry = audit.history(self.item).get()
+
+        self.assertEqual(entry.user, self.user)
+        self.assertEqual(entry.changes, {"price": ["5.00", "6"]})
+
+    def test_replayed_order_recorded_once(self):
+        """
+        Replaying an order with the same idempotency key should not
+        record its purchases again.
+        """
+        url = reverse(
+            "cantina:menu_options",
+            kwargs={"item": self.item.id, "table": "purchases"},
+        )
+        data = {
+            "customer": self.customer.id,
+            "item": self.item.id,
+            "quantity": 1,
+            "idempotency_key": "t1-1",
+        }
+        self.client.post(url, data)
+        self.client.post(url, data)
+
+        self.assertEqual(AuditEntry.objects.filter(action=AuditEntry.CREATE).count(), 3)
+
+    def test_tab_operations_recorded(self):
+        """
+        Splitting, transferring, merging and closing out tabs should
+        record the purchases moved and the tabs changed.
+        """
+        tab = self.purchases[0].tab
+        gamora = Customer.objects.create(
+            last_name="Titan", first_name="Gamora", planet="Zen-Whoberi", uba=""
+        )
+
+        new_tab = tabs.split(tab, [self.purchases[0]])
+        tabs.transfer(new_tab, gamora)
+        tabs.merge(new_tab, tab)
+        tabs.close_out()
+
+        self.assertEqual(
+            audit.history(new_tab).values_list("action", flat=True)[::1],
+            [AuditEntry.CHANGE, AuditEntry.CHANGE, AuditEntry.CREATE],
+        )
+        self.assertEqual(
+            audit.history(self.purchases[0]).filter(action=AuditEntry.CHANGE).count(),
+            2,
+        )
+        self.assertIn("closed", audit.history(tab).get().changes)
+
+    def test_sync_recorded(self):
+        """
+        Orders applied by a terminal sync should record their purchases.
+        """
+        response = self.client.post(
+            reverse("cantina:sync_purchases"),
+            {
+                "orders": [
+                    {
+                        "key": "t1-1",
+                        "customer": self.customer.id,
+                        "item": self.item.id,
+                        "quantity": 1,
+                    }
+                ]
+            },
+            content_type="application/json",
+        )
+        purchase = Purchase.objects.get(id=response.json()["applied"]["t1-1"])
+
+        self.assertEqual(audit.history(purchase).get().action, AuditEntry.CREATE)
+
+    def test_conflicting_sync_not_recorded(self):
+        """
+        Purchases of a sync rolled back by a conflicting sync should not
+        be recorded.
+        """
+
+        get_tabs = orders._get_tabs
+
+        def conflict(customers):
+            IdempotencyKey.objects.create(key="t1-1")
+            return get_tabs(customers)
+
+        with mock.patch.object(orders, "_get_tabs", side_effect=conflict):
+            response = self.client.post(
+                reverse("cantina:sync_purchases"),
+                {
+                    "orders": [
+                        {
+                            "key": "t1-1",
+                            "customer": self.customer.id,
+                            "item": self.item.id,
+                            "quantity": 1,
+                        }
+                    ]
+                },
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Purchase.objects.count(), 2)
+        self.assertEqual(AuditEntry.objects.filter(action=AuditEntry.CREATE).count(), 2)
+
+    def test_count_recorded(self):
+        """
+        Recording an inventory count should record the count and the
+        stock it set.
+        """
+        spirits = InventoryItemCategory.objects.create(name="Spirits")
+        vodka = InventoryItem.objects.create(
+            name="Vodka",
+            category=spirits,
+            stock=10,
+            cost=20,
+            reorder_point=1,
+            reorder_amount=5,
+        )
+
+        count = counts.record_count(spirits, {vodka.id: 7})
+
+        self.assertEqual(audit.history(count).get().action, AuditEntry.CREATE)
+        self.assertEqual(audit.history(vodka).get().changes, {"stock": ["10.00", "7"]})
+
+    def test_admin_inline_recorded(self):
+        """
+        Lines added, changed and deleted through an admin inline should
+        be recorded.
+        """
+        spirits = InventoryItemCategory.objects.create(name="Spirits")
+        vodka = InventoryItem.objects.create(
+            name="Vodka",
+            category=spirits,
+            stock=10,
+            cost=20,
+            reorder_point=1,
+            reorder_amount=5,
+        )
+        order = PurchaseOrder.objects.create(supplier="Knowhere")
+        line = PurchaseOrderLine.objects.create(
+            order=order, item=vodka, quantity=5, cost=20
+        )
+        prefix = "purchaseorderline_set"
+
+        self.client.post(
+            reverse("admin:cantina_purchaseorder_change", args=[order.id]),
+            {
+                "supplier": "Knowhere",
+                f"{prefix}-TOTAL_FORMS": 2,
+                f"{prefix}-INITIAL_FORMS": 1,
+                f"{prefix}-0-id": line.id,
+                f"{prefix}-0-order": order.id,
+                f"{prefix}-0-item": vodka.id,
+                f"{prefix}-0-quantity": 6,
+                f"{prefix}-0-cost": 20,
+                f"{prefix}-1-order": order.id,
+                f"{prefix}-1-item": vodka.id,
+                f"{prefix}-1-quantity": 1,
+                f"{prefix}-1-cost": 18,
+            },
+        )
+
+        self.assertEqual(audit.history(line).get().changes, {"quantity": ["5.00", "6"]})
+        self.assertEqual(AuditEntry.objects.filter(action=AuditEntry.CREATE).count(), 3)
+
+
+class EventsTestCase(TestCase):
+    def setUp(self):
+        self.star_lord = Customer.objects.create(
+            last_name="Quill", first_name="Peter", planet="Earth", uba=""
+        )
+        self.gamora = Customer.objects.create(
+            last_name="Titan", first_name="Gamora", planet="Zen-Whoberi", uba=""
+        )
+        category = MenuItemCategory.objects.create(name="Cocktail")
+        self.item = MenuItem.objects.create(
+            name="Awesome Mix", category=category, price=5
+        )
+        self.purchases = place_order(self.star_lord.id, [(self.item, 1)])
+        self.tab = self.purchases[0].tab
+
+    def published(self, function, *args, **kwargs) -> list[dict]:
+        """
+        Call a function and return the events it published.
+        """
+        with self.captureOnCommitCallbacks() as callbacks:
+            function(*args, **kwargs)
+        return [
+            json.loads(callback.args[0])
+            for callback in callbacks
+            if getattr(callback, "func", None) is events._relay
+        ]
+
+    def test_order_published(self):
+        """
+        Placing an order should publish a purchase event for the tab.
+        """
+        published = self.published(place_order, self.star_lord.id, [(self.item, 2)])
+
+        self.assertEqual(len(published), 1)
+        self.assertEqual(published[0]["type"], "purchase")
+        self.assertEqual(published[0]["tabs"], [self.tab.id])
+
+    def test_comp_published(self):
+        """
+        Comping a purchase should publish a comp event for its tab.
+        """
+        published = self.published(
+            self.client.get,
+            reverse("cantina:comp_purchase", args=[self.purchases[0].id]),
+        )
+
+        self.assertEqual(
+            [(event["type"], event["tabs"]) for event in published],
+            [("comp", [self.tab.id])],
+        )
+
+    def test_close_out_published(self):
+        """
+        Closing out should publish one close event for every tab closed.
+        """
+        place_order(self.gamora.id, [(self.item, 1)])
+        gamora_tab = get_tab(self.gamora.id)
+
+        published = self.published(tabs.close_out)
+
+        self.assertEqual(published[0]["type"], "close")
+        self.assertCountEqual(published[0]["tabs"], [self.tab.id, gamora_tab.id])
+
+    def test_edit_close_published(self):
+        """
+        Closing a tab through the edit view should publish a close event.
+        """
+        published = self.published(
+            self.client.post,
+            reverse("cantina:edit", kwargs={"table": "tabs", "id": self.tab.id}),
+            {
+                "customer": self.star_lord.id,
+                "due": "2024-03-01T12:00",
+                "closed": "2024-02-01T12:00",
+            },
+        )
+
+        self.assertEqual(
+            [(event["type"], event["tabs"]) for event in published],
+            [("close", [self.tab.id])],
+        )
+
+    def test_purchase_changes_published(self):
+        """
+        Moving a purchase to another tab should publish a purchase event
+        for both tabs and deleting it one for its tab.
+        """
+        purchase = self.purchases[0]
+        published = self.published(
+            self.client.post,
+            reverse("cantina:edit_purchase", args=[purchase.id]),
+            {"customer": self.gamora.id, "item": self.item.id, "quantity": 1},
+        )
+        gamora_tab = get_tab(self.gamora.id)
+
+        self.assertEqual(
+            [(event["type"], event["tabs"]) for event in published],
+            [("purchase", sorted([self.tab.id, gamora_tab.id]))],
+        )
+        published = self.published(
+            self.client.get,
+            reverse("cantina:delete", kwargs={"table": "purchases", "id": purchase.id}),
+        )
+        self.assertEqual(
+            [(event["type"], event["tabs"]) for event in published],
+            [("purchase", [gamora_tab.id])],
+        )
+
+    def test_tab_operations_published(self):
+        """
+        Splitting a tab should publish a tab event for both tabs and
+        transferring it one for the tab.
+        """
+        published = self.published(tabs.split, self.tab, self.purchases)
+        new_tab = Tab.objects.latest("id")
+
+        self.assertEqual(
+            [(event["type"], event["tabs"]) for event in published],
+            [("tab", [self.tab.id, new_tab.id])],
+        )
+        published = self.published(tabs.transfer, new_tab, self.gamora)
+        self.assertEqual(
+            [(event["type"], event["tabs"]) for event in published],
+            [("tab", [new_tab.id])],
+        )
+
+    def test_large_event_published_for_every_tab(self):
+        """
+        An event naming too many tabs for a notification should be
+        published about every tab instead.
+        """
+        published = self.published(events.publish, "close", list(range(10000)))
+
+        self.assertIsNone(published[0]["tabs"])
+
+    def publish_comp(self):
+        """
+        Publish a comp event for the tab and relay it to open streams.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            events.publish("comp", [self.tab.id])
+
+    async def test_stream(self):
+        """
+        A stream should yield the events published while it is open and
+        stop receiving them once closed.
+        """
+        stream = events.stream()
+
+        self.assertEqual(await anext(stream), "retry: 3000\n\n")
+        await sync_to_async(self.publish_comp)()
+        event, data = (await anext(stream)).rstrip("\n").split("\n")
+        await stream.aclose()
+
+        self.assertEqual(event, "event: comp")
+        self.assertEqual(json.loads(data.removeprefix("data: "))["tabs"], [self.tab.id])
+        self.assertFalse(events._subscribers)
+
+    @override_settings(EVENTS_KEEPALIVE=0.01)
+    async def test_stream_keepalive(self):
+        """
+        A quiet stream should yield a comment to keep the connection open.
+        """
+        stream = events.stream()
+
+        await anext(stream)
+        self.assertEqual(await anext(stream), ": keepalive\n\n")
+        await stream.aclose()
+
+    def test_stream_view_not_served_under_wsgi(self):
+        """
+        The events view should answer 204 No Content when served by a
+        WSGI worker, which cannot hold the stream open.
+        """
+        response = self.client.get(reverse("cantina:events"))
+
+        self.assertEqual(response.status_code, 204)
+
+    async def test_stream_view(self):
+        """
+        The events view should open an uncached event stream.
+        """
+        response = await self.async_client.get(reverse("cantina:events"))
+        content = aiter(response.streaming_content)
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertEqual(await anext(content), b"retry: 3000\n\n")
+        await content.aclose()
+
+
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            last_name="Quill", first_name="Peter", planet="Earth", uba=""
+        )
+        category = MenuItemCategory.objects.create(name="Cocktail")
+        self.item = MenuItem.objects.create(
+            name="Awesome Mix", category=category, price=5
+        )
+        self.purchases = place_order(self.customer.id, [(self.item, 1)])
+        self.tab = self.purchases[0].tab
+        self.url = reverse("cantina:view", kwargs={"table": "tabs", "id": self.tab.id})
+
+    def test_validators_sent(self):
+        """
+        List, detail and category pages should be sent with an ETag, a
+        Last-Modified time and a requirement to revalidate.
+        """
+        for url in [
+            reverse("cantina:view_all", kwargs={"table": "tabs"}),
+            self.url,
+            reverse("cantina:view_categories", kwargs={"table": "menu"}),
+        ]:
+            response = self.client.get(url)
+
+            self.assertTrue(response.has_header("ETag"))
+            self.assertTrue(response.has_header("Last-Modified"))
+            self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_not_modified(self):
+        """
+        A page should not be rendered again for a client holding its
+        current ETag or modification time.
+        """
+        response = self.client.get(self.url)
+
+        # One query for the tab and one for the validators.
+        with self.assertNumQueries(2):
+            cached = self.client.get(
+                self.url, headers={"If-None-Match": response["ETag"]}
+            )
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached["ETag"], response["ETag"])
+        cached = self.client.get(
+            self.url, headers={"If-Modified-Since": response["Last-Modified"]}
+        )
+        self.assertEqual(cached.status_code, 304)
+
+    def test_modified_by_related_rows(self):
+        """
+        A page should be rendered again once a row it is built from is
+        added, changed, updated in bulk or deleted.
+        """
+        for change in [
+            lambda: place_order(self.customer.id, [(self.item, 2)]),
+            lambda: MenuItem.objects.filter(pk=self.item.pk).update(name="Mix Vol. 2"),
+            lambda: tabs.comp_all(self.tab),
+            lambda: self.purchases[0].delete(),
+            lambda: Purchase.objects.filter(tab=self.tab).delete(),
+            lambda: self.item.category.delete(),
+        ]:
+            etag = self.client.get(self.url)["ETag"]
+            change()
+
+            response = self.client.get(self.url, headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 200)
+
+    def test_modified_by_deploy(self):
+        """
+        A page should be rendered again once a new build is deployed,
+        since its templates may have changed.
+        """
+        response = self.client.get(self.url)
+
+        with override_settings(
+            BUILD_ID="next", BUILD_TIME=timezone.now().timestamp() + 60
+        ):
+            for headers in [
+                {"If-None-Match": response["ETag"]},
+                {"If-Modified-Since": response["Last-Modified"]},
+            ]:
+                cached = self.client.get(self.url, headers=headers)
+                self.assertEqual(cached.status_code, 200)
+
+    def test_version_reads_no_rows(self):
+        """
+        The version of a page should be read from the updated_at indexes
+        and the recorded deletions without counting the rows of its
+        tables.
+        """
+        with CaptureQueriesContext(connection) as context:
+            get_version([Purchase, TabEntry])
+
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn("COUNT", context.captured_queries[0]["sql"].upper())
+
+    def test_updated_at_saved_with_update_fields(self):
+        """
+        Saving selected fields or updating rows in bulk should stamp the
+        rows with the time of the change.
+        """
+        before = self.tab.updated_at
+
+        self.tab.archive()
+        self.assertGreater(Tab.all_objects.get(pk=self.tab.pk).updated_at, before)
+        Purchase.objects.bulk_update(self.purchases, ["quantity"])
+        self.purchases[0].refresh_from_db()
+        self.assertGreater(self.purchases[0].updated_at, before)
+
+    def test_audit_ignores_updated_at(self):
+        """
+        Audit entries should not record the update time as a change.
+        """
+        before = audit.snapshot(self.customer)
+        self.customer.save()
+
+        self.assertNotIn("updated_at", before)
+        self.assertEqual(audit.snapshot(self.customer), before)
+
+
+class PurchaseAdminTestCase(TestCase):
+    def setUp(self):
+        self.client.force_login(
+            User.objects.create_superuser("cosmo", password="space-dog")
+        )
+        self.customer = Customer.objects.create(
+            last_name="Quill", first_name="Peter", planet="Earth", uba=""
+        )
+        category = MenuItemCategory.objects.create(name="Cocktail")
+        self.item = MenuItem.objects.create(
+            name="Awesome Mix", category=category, price=5
+        )
+        self.purchase = place_order(self.customer.id, [(self.item, 1)])[0]
+        self.tab = self.purchase.tab
+
+    def test_change_recorded_on_ledger(self):
+        """
+        Changing the amount of a purchase through the admin should
+        record an adjustment on the ledger of its tab.
+        """
+        self.client.post(
+            reverse("admin:cantina_purchase_change", args=[self.purchase.id]),
+            {
+                "tab": self.tab.id,
+                "item": self.item.id,
+                "quantity": 2,
+                "amount": 10,
+            },
+        )
+
+        self.assertEqual(self.tab.tabentry_set.first().kind, TabEntry.ADJUSTMENT)
+        self.assertEqual(self.tab.get_balance(), 10)
+
+    def test_delete_voided_on_ledger(self):
+        """
+        Deleting purchases or menu items through the admin should void
+        the purchases deleted on the ledgers of their tabs.
+        """
+        place_order(self.customer.id, [(self.item, 2)])
+
+        self.client.post(
+            reverse("admin:cantina_purchase_delete", args=[self.purchase.id]),
+            {"post": "yes"},
+        )
+        self.assertEqual(self.tab.get_balance(), 10)
+        self.client.post(
+            reverse("admin:cantina_menuitem_changelist"),
+            {
+                "action": "delete_selected",
+                "_selected_action": [self.item.id],
+                "post": "yes",
+            },
+        )
+
+        self.assertFalse(Purchase.objects.exists())
+        self.assertEqual(self.tab.get_balance(), 0)
+
+
+class PricingTestCase(TestCase):
+    def setUp(self):
+        self.wine = MenuItemCategory.objects.create(name="Wine")
+        self.red = MenuItem.objects.create(
+            name="Skrull Vineyards Pinot Noir", category=self.wine, price=10
+        )
+        self.white = MenuItem.objects.create(
+            name="Kree Chardonnay", category=self.wine, price="7.50"
+        )
+        beer = MenuItemCategory.objects.create(name="Beer")
+        self.beer = MenuItem.objects.create(name="Duff Beer", category=beer, price=5)
+
+    def test_price_history_is_recorded(self):
+        """
+        Saving a menu item with a new price should add the price to the
+        item's history, and saving it unchanged should not.
+        """
+        self.red.save()
+        self.red.price = 12
+        self.red.save()
+
+        self.assertEqual(
+            [price.price for price in self.red.menuitemprice_set.all()], [12, 10]
+        )
+
+    def test_reprice_by_percent(self):
+        """
+        The reprice function should change the price of every item in
+        the category by a percentage and record the new prices.
+        """
+        count = reprice(self.wine, percent=10)
+        self.red.refresh_from_db()
+        self.white.refresh_from_db()
+        self.beer.refresh_from_db()
+
+        self.assertEqual(count, 2)
+        self.assertEqual(self.red.price, decimal.Decimal("11.00"))
+        self.assertEqual(self.white.price, decimal.Decimal("8.25"))
+        self.assertEqual(self.beer.price, 5)
+        self.assertEqual(self.white.menuitemprice_set.first().price, self.white.price)
+
+    def test_reprice_by_amount(self):
+        """
+        The reprice function should change the price of every item in
+        the category by an absolute amount without going below zero.
+        """
+        reprice(self.wine, amount=-8)
+        self.red.refresh_from_db()
+        self.white.refresh_from_db()
+
+        self.assertEqual(self.red.price, 2)
+        self.assertEqual(self.white.price, 0)
+
+
+class PricingRuleTestCase(TestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.customer = Customer.objects.create(
+            last_name="Nova", first_name="Richard", planet="Xandar", uba=""
+        )
+        self.beer = MenuItemCategory.objects.create(name="Beer")
+        self.ale = MenuItem.objects.create(name="Nova Ale", category=self.beer, price=8)
+        self.tab = Tab.objects.create(customer=self.customer)
+        # 2024-01-05 was a Friday.
+        self.friday_evening = timezone.make_aware(datetime(2024, 1, 5, 18, 0))
+
+    def price(self, when):
+        purchase = Purchase(tab=self.tab, item=self.ale, quantity=1, time=when)
+        purchase.update_amount()
+        return purchase.amount
+
+    def test_happy_hour(self):
+        """
+        A category rule with a time window should only discount
+        purchases made during the window on the given weekdays.
+        """
+        PricingRule.objects.create(
+            name="Happy hour",
+            category=self.beer,
+            percent_off=25,
+            weekdays="4",
+            start_time=time(17),
+            end_time=time(19),
+        )
+
+        self.assertEqual(self.price(self.friday_evening), 6)
+        self.assertEqual(self.price(self.friday_evening.replace(hour=19)), 8)
+        self.assertEqual(self.price(self.friday_evening.replace(day=4)), 8)
+
+    def test_planet_discount(self):
+        """
+        A planet rule should only discount purchases made by customers
+        from that planet.
+        """
+        PricingRule.objects.create(name="Xandarians", planet="xandar", amount_off=1)
+        self.assertEqual(self.price(self.friday_evening), 7)
+
+        self.customer.planet = "Hala"
+        self.assertEqual(self.price(self.friday_evening), 8)
+
+    def test_best_rule_applies(self):
+        """
+        If several rules apply to a purchase, the lowest price should be
+        charged.
+        """
+        PricingRule.objects.create(name="Beer", category=self.beer, percent_off=10)
+        PricingRule.objects.create(name="Ale", item=self.ale, amount_off=3)
+
+        self.assertEqual(self.price(self.friday_evening), 5)
+
+    def test_rules_are_refreshed(self):
+        """
+        The compiled rules should be rebuilt when a rule changes and
+        reused otherwise.
+        """
+        rule = PricingRule.objects.create(name="Ale", item=self.ale, amount_off=3)
+        rules = get_rules()
+        self.assertIs(get_rules(), rules)
+
+        rule.active = False
+        rule.save()
+
+        self.assertIsNot(get_rules(), rules)
+        self.assertEqual(self.price(self.friday_evening), 8)
+
+    def test_rules_refreshed_without_signals(self):
+        """
+        The compiled rules should be rebuilt after a change made without
+        signals, as by another process, since their version is read from
+        the database.
+        """
+        rule = PricingRule.objects.create(name="Ale", item=self.ale, amount_off=3)
+        self.assertEqual(self.price(self.friday_evening), 5)
+
+        PricingRule.objects.filter(pk=rule.pk).update(amount_off=1)
+
+        self.assertEqual(self.price(self.friday_evening), 7)
+
+
+class PurgeArchivedTestCase(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            last_name="Knull", first_name="", planet="The Abyss", uba=""
+        )
+        category = MenuItemCategory.objects.create(name="Beer")
+        item = MenuItem.objects.create(name="Void Porter", category=category, price=4)
+        self.tab = Tab.objects.create(customer=self.customer)
+        for _ in range(5):
+            purchase = Purchase.objects.create(
+                tab=self.tab, item=item, quantity=1, amount=4
+            )
+            self.tab.record_entry(TabEntry.CHARGE, 4, purchase)
+
+    def test_purge(self):
+        """
+        The purge function should delete archived customers along with
+        their tabs, purchases and ledger entries in batches.
+        """
+        self.customer.archive()
+
+        counts = purge(timezone.now(), batch_size=2)
+
+        self.assertEqual(counts, {"purchases": 5, "tabs": 1, "customers": 1})
+        self.assertFalse(Customer.all_objects.exists())
+        self.assertFalse(Purchase.objects.exists())
+        self.assertFalse(TabEntry.objects.exists())
+
+    def test_purge_keeps_moved_purchase_entries(self):
+        """
+        The purge function should keep the ledger entries of active tabs
+        for purchases moved onto a purged tab, so their balances do not
+        change.
+        """
+        other = Customer.objects.create(
+            last_name="Brock", first_name="Eddie", planet="Earth", uba=""
+        )
+        item = MenuItem.objects.get()
+        purchases = place_order(other.id, [(item, 1), (item, 2)])
+        tab = purchases[0].tab
+        tabs.split(tab, [purchases[0]], self.customer)
+        balance = tab.get_balance()
+        self.customer.archive()
+
+        purge(timezone.now())
+
+        self.assertEqual(tab.get_balance(), balance)
+        self.assertEqual(tab.get_balance(), 8)
+        self.assertEqual(TabEntry.objects.filter(tab=tab).count(), 3)
+
+    def test_purge_keeps_recent_archives(self):
+        """
+        The purge function should not delete rows archived after the
+        given time, or rows that were never archived.
+        """
+        other = Customer.objects.create(
+            last_name="Gorr", first_name="", planet="Unknown", uba=""
+        )
+        self.tab.archive()
+
+        counts = purge(timezone.now() - timezone.timedelta(days=1))
+
+        self.assertEqual(counts, {"purchases": 0, "tabs": 0, "customers": 0})
+        self.assertEqual(Purchase.objects.count(), 5)
+        self.assertQuerySetEqual(Customer.objects.all(), [other, self.customer])
+
+    def test_archived_customer_added_again(self):
+        """
+        The add customer view should add a customer with the same name
+        and UBA number as an archived customer.
+        """
+        self.customer.archive()
+
+        response = self.client.post(
+            reverse("cantina:add", kwargs={"table": "customers"}),
+            {"last_name": "Knull", "first_name": "", "planet": "Klyntar", "uba": ""},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Customer.objects.get().planet, "Klyntar")
+
+    def test_admin_restores_archived_rows(self):
+        """
+        The admin should list archived customers and restore them along
+        with the tabs archived with them.
+        """
+        self.client.force_login(
+            User.objects.create_superuser("cosmo", password="space-dog")
+        )
+        self.customer.archive()
+
+        response = self.client.get(reverse("admin:cantina_customer_changelist"))
+        self.assertContains(response, "Knull")
+        self.client.post(
+            reverse("admin:cantina_customer_changelist"),
+            {"action": "restore", "_selected_action": [self.customer.id]},
+        )
+
+        self.assertTrue(Customer.objects.filter(pk=self.customer.pk).exists())
+        self.assertTrue(Tab.objects.filter(pk=self.tab.pk).exists())
+
+
+class TabOperationsViewTestCase(TestCase):
+    def setUp(self):
+        self.star_lord = Customer.objects.create(
+            last_name="Quill", first_name="Peter", planet="Earth", uba=""
+        )
+        self.gamora = Customer.objects.create(
+            last_name="Titan", first_name="Gamora", planet="Zen-Whoberi", uba=""
+        )
+        category = MenuItemCategory.objects.create(name="Cocktail")
+        item = MenuItem.objects.create(name="Awesome Mix", category=category, price=5)
+        self.purchases = place_order(
+            self.star_lord.id, [(item, 1), (item, 2), (item, 3)]
+        )
+        self.tab = self.purchases[0].tab
+
+    def test_comp_tab(self):
+        """
+        The comp tab view should comp every purchase on the tab.
+        """
+        response = self.client.get(
+            reverse("cantina:comp_tab", kwargs={"id": self.tab.id})
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.tab.get_amount(), 0)
+        self.assertEqual(self.tab.get_balance(), 0)
+        self.assertEqual(self.tab.tabentry_set.filter(kind=TabEntry.COMP).count(), 3)
+
+    def test_split_tab(self):
+        """
+        The split tab view should move the selected purchases onto a new
+        tab for the chosen customer.
+        """
+        response = self.client.post(
+            reverse(
+                "cantina:operate_tab", kwargs={"id": self.tab.id, "operation": "split"}
+            ),
+            {"purchases": [self.purchases[2].id], "customer": self.gamora.id},
+        )
+        new_tab = Tab.objects.get(customer=self.gamora)
+
+        self.assertRedirects(response, f"/tabs/{new_tab.id}/")
+        self.assertEqual(self.tab.get_balance(), 15)
+        self.assertEqual(new_tab.get_balance(), 15)
+        self.assertQuerySetEqual(new_tab.get_purchases(), [self.purchases[2]])
+
+    def test_merge_tab(self):
+        """
+        The merge tab view should move every purchase onto the chosen
+        open tab and close the merged tab.
+        """
+        gamora_tab = get_tab(self.gamora.id)
+
+        self.client.post(
+            reverse(
+                "cantina:operate_tab", kwargs={"id": self.tab.id, "operation": "merge"}
+            ),
+            {"target": gamora_tab.id},
+        )
+        self.tab.refresh_from_db()
+
+        self.assertIsNotNone(self.tab.closed)
+        self.assertEqual(self.tab.get_balance(), 0)
+        self.assertEqual(gamora_tab.get_amount(), 30)
+        self.assertEqual(gamora_tab.get_balance(), 30)
+
+    def test_transfer_tab(self):
+        """
+        The transfer tab view should make the chosen customer
+        responsible for the tab.
+        """
+        self.client.post(
+            reverse(
+                "cantina:operate_tab",
+                kwargs={"id": self.tab.id, "operation": "transfer"},
+            ),
+            {"customer": self.gamora.id},
+        )
+        self.tab.refresh_from_db()
+
+        self.assertEqual(self.tab.customer, self.gamora)
+        self.assertEqual(self.tab.get_balance(), 30)
+
+    def test_unknown_operation(self):
+        """
+        The tab operation view should return a 404 status code for an
+        unknown operation.
+        """
+        response = self.client.get(
+            reverse("cantina:operate_tab", kwargs={"id": self.tab.id, "operation": "x"})
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+
+class CloseOutViewTestCase(TestCase):
+    def setUp(self):
+        self.star_lord = Customer.objects.create(
+            last_name="Quill", first_name="Peter", planet="Earth", uba=""
+        )
+        self.gamora = Customer.objects.create(
+            last_name="Titan", first_name="Gamora", planet="Zen-Whoberi", uba=""
+        )
+        cocktail = MenuItemCategory.objects.create(name="Cocktail")
+        entree = MenuItemCategory.objects.create(name="Entree")
+        mix = MenuItem.objects.create(name="Awesome Mix", category=cocktail, price=5)
+        wings = MenuItem.objects.create(name="Rocket Wings", category=entree, price=8)
+        self.purchases = place_order(self.star_lord.id, [(mix, 3), (wings, 1)])
+        place_order(self.gamora.id, [(mix, 1), (wings, 2)])
+        self.star_lord_tab = self.purchases[0].tab
+        self.gamora_tab = get_tab(self.gamora.id)
+
+    def test_close_all_tabs(self):
+        """
+        The close out view should close every open tab and store a
+        report of their purchases when no tabs are selected.
+        """
+        self.client.get(reverse("cantina:comp_purchase", args=[self.purchases[1].id]))
+
+        response = self.client.post(reverse("cantina:close_tabs"), {})
+        report = ShiftReport.objects.get()
+
+        self.assertRedirects(response, f"/shifts/{report.id}/")
+        self.assertFalse(Tab.objects.filter(closed__isnull=True).exists())
+        self.assertEqual(report.tab_count, 2)
+        self.assertEqual(report.revenue, 36)
+        self.assertEqual(report.comps, 8)
+        self.assertEqual(
+            [category["name"] for category in report.summary["categories"]],
+            ["Cocktail", "Entree"],
+        )
+        self.assertEqual(
+            [item["name"] for item in report.summary["top_items"]],
+            ["Awesome Mix", "Rocket Wings"],
+        )
+        self.assertEqual(report.summary["top_items"][0]["quantity"], 4)
+
+    def test_close_selected_tabs(self):
+        """
+        The close out view should only close the selected tabs and only
+        report their purchases.
+        """
+        self.client.post(reverse("cantina:close_tabs"), {"tabs": [self.gamora_tab.id]})
+        report = ShiftReport.objects.get()
+        self.star_lord_tab.refresh_from_db()
+        self.gamora_tab.refresh_from_db()
+
+        self.assertIsNone(self.star_lord_tab.closed)
+        self.assertIsNotNone(self.gamora_tab.closed)
+        self.assertEqual(report.tab_count, 1)
+        self.assertEqual(report.revenue, 21)
+
+    def test_comps_valued_from_ledger(self):
+        """
+        Comps should be valued at the amounts charged, as recorded on the
+        tab ledgers, and purchases free under a pricing rule should not
+        count as comps.
+        """
+        water = MenuItem.objects.create(
+            name="Water", category=self.purchases[0].item.category, price=2
+        )
+        PricingRule.objects.create(name="Free water", item=water, percent_off=100)
+        place_order(self.star_lord.id, [(water, 3)])
+        MenuItem.objects.filter(pk=self.purchases[1].item_id).update(price=20)
+        self.client.get(reverse("cantina:comp_purchase", args=[self.purchases[1].id]))
+
+        report = tabs.close_out()
+
+        self.assertEqual(report.comps, 8)
+
+    def test_close_out_query_count(self):
+        """
+        The close out function should use a fixed number of queries
+        regardless of the number of tabs.
+        """
+        # PostgreSQL also sends the close event with NOTIFY.
+        with self.assertNumQueries(7 + (connection.vendor == "postgresql")):
+            tabs.close_out()
+
+    def test_shift_report(self):
+        """
+        The shift report view should display the report summary.
+        """
+        report = tabs.close_out()
+
+        response = self.client.get(
+            reverse("cantina:view_shift_report", kwargs={"id": report.id})
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Tabs closed: 2")
+        self.assertContains(response, "Rocket Wings")
+
+
+class InventoryValuationViewTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        spirits = InventoryItemCategory.objects.create(name="Spirits")
+        mixers = InventoryItemCategory.objects.create(name="Mixers")
+        self.rum = InventoryItem.objects.create(
+            name="Rum",
+            category=spirits,
+            stock=4,
+            cost="12.50",
+            reorder_point=1,
+            reorder_amount=5,
+        )
+        InventoryItem.objects.create(
+            name="Vodka",
+            category=spirits,
+            stock=2,
+            cost=20,
+            reorder_point=1,
+            reorder_amount=5,
+        )
+        InventoryItem.objects.create(
+            name="Tonic",
+            category=mixers,
+            stock="1.50",
+            cost=4,
+            reorder_point=1,
+            reorder_amount=5,
+        )
+
+    def test_valuation(self):
+        """
+        The inventory valuation view should display the value of every
+        item, a subtotal per category and the grand total.
+        """
+        response = self.client.get(reverse("cantina:inventory_valuation"))
+        valuation = response.context["valuation"]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [category["name"] for category in valuation["categories"]],
+            ["Mixers", "Spirits"],
+        )
+        self.assertEqual(valuation["categories"][0]["subtotal"], 6)
+        self.assertEqual(valuation["categories"][1]["subtotal"], 90)
+        self.assertEqual(valuation["categories"][1]["items"][0]["value"], 50)
+        self.assertEqual(valuation["total"], 96)
+        self.assertContains(response, "Total: 96")
+
+    def test_valuation_cached(self):
+        """
+        The inventory valuation should be computed with one query and
+        then served from the cache, checking only its version.
+        """
+        with self.assertNumQueries(2):
+            inventory.get_valuation()
+        with self.assertNumQueries(1):
+            inventory.get_valuation()
+
+    def test_valuation_invalidated(self):
+        """
+        The inventory valuation should be recomputed once an inventory
+        item changes.
+        """
+        inventory.get_valuation()
+        self.rum.stock = 0
+        self.rum.save()
+
+        self.assertEqual(inventory.get_valuation()["total"], 46)
+
+    def test_valuation_invalidated_without_signals(self):
+        """
+        The inventory valuation should be recomputed after a change made
+        without signals, as by another process.
+        """
+        inventory.get_valuation()
+        InventoryItem.objects.filter(pk=self.rum.pk).update(stock=0)
+
+        self.assertEqual(inventory.get_valuation()["total"], 46)
+
+    def test_empty_valuation(self):
+        """
+        The inventory valuation view should display an appropriate
+        message if no inventory is available.
+        """
+        InventoryItem.objects.all().delete()
+
+        response = self.client.get(reverse("cantina:inventory_valuation"))
+
+        self.assertContains(response, "No inventory is available.")
+
 
 class HelperFunctionsTestCase(TestCase):
     def setUp(self):
@@ -4,9 +4,40 @@ from . import views
 
 app_name = "cantina"
 urlpatterns = [
+    path("tabs/close/", views.close_tabs, name="close_tabs"),
+    path("tabs/rows/", views.view_tab_rows, name="tab_rows"),
+    path("tabs/<int:id>/purchases/", views.view_tab_purchases, name="tab_purchases"),
+    path("shifts/<int:id>/", views.view_shift_report, name="view_shift_report"),
+    path("events/", views.stream_events, name="events"),
     path("<str:table>/", views.view_all_instances, name="view_all"),
     path("<str:table>/add/", views.add_instance, name="add"),
     path("<str:table>/<int:id>/", views.view_instance, name="view"),
+    path(
+        "inventory/valuation/",
+        views.view_inventory_valuation,
+        name="inventory_valuation",
+    ),
+    path("inventory/plan/", views.plan_event, name="plan_event"),
+    path(
+        "inventory/<int:id>/levels/", views.view_stock_levels, name="view_stock_levels"
+    ),
+    path(
+        "inventory/categories/<int:id>/count/",
+        views.count_inventory,
+        name="count_inventory",
+    ),
+    path(
+        "inventory/categories/<int:id>/shrinkage/",
+        views.view_shrinkage,
+        name="view_shrinkage",
+    ),
+    path(
+        "inventory/counts/<int:id>/",
+        views.view_inventory_count,
+        name="view_inventory_count",
+    ),
+    path("menu/snapshot/", views.view_menu_snapshot, name="menu_snapshot"),
+    path("purchases/sync/", views.sync_purchases, name="sync_purchases"),
     path("purchases/<int:id>/edit/", views.edit_purchase, name="edit_purchase"),
     path("<str:table>/<int:id>/edit/", views.edit_instance, name="edit"),
     path("<str:table>/<int:id>/delete/", views.delete_instance, name="delete"),
@@ -23,4 +54,6 @@ urlpatterns = [
         name="menu_options",
     ),
     path("purchases/<int:id>/comp/", views.comp_purchase, name="comp_purchase"),
+    path("tabs/<int:id>/comp/", views.comp_tab, name="comp_tab"),
+    path("tabs/<int:id>/<str:operation>/", views.operate_tab, name="operate_tab"),
 ]
@@ -1,7 +1,41 @@
-from django.shortcuts import get_object_or_404, render, redirect
+import json
 
-from .models import Customer, Tab
-from .data import objects
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render, redirect
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from . import (
+    audit,
+    counts,
+    events,
+    inventory,
+    menu,
+    metrics,
+    querylog,
+    stocklevels,
+    tabs,
+)
+from .forms import CloseOutForm, CountSheetFormSet, EventPlanForm
+from .models import (
+    AuditEntry,
+    InventoryCount,
+    ShiftReport,
+    Tab,
+    TabEntry,
+    get_version,
+)
+from .data import objects, tab_operations
+from .orders import get_tab, place_order, sync_orders
 
 
 ########################################################################
@@ -17,24 +51,38 @@ def view_all_instances(request, table, id=None):
     else:
         instances = objects[table]["model"].objects.all()
         context = {"instances": instances}
+    if table == "menu":
+        # Evaluated only if the page is rendered.
+        context["instances"] = SimpleLazyObject(
+            lambda: inventory.annotate_makeable(instances)
+        )
+    elif table == "tabs":
+        context["instances"] = tabs.with_balances(instances.select_related("customer"))
 
-    return render(request, f"cantina/{table}.html", context)
+    return render_conditional(
+        request, f"cantina/{table}.html", context, objects[table]["depends"]
+    )
 
 
 def view_instance(request, table, id):
     instance = get_object_or_404(objects[table]["model"], pk=id)
     context = {"instance": instance}
+    if table == "customers":
+        context["tabs"] = tabs.with_balances(instance.tab_set.all())
 
     if table.endswith("s"):
-        return render(request, f"cantina/{table[:-1]}.html", context)
+        template = f"cantina/{table[:-1]}.html"
     else:
-        return render(request, f"cantina/{table}_item.html", context)
+        template = f"cantina/{table}_item.html"
+    return render_conditional(request, template, context, objects[table]["depends"])
 
 
 def view_categories(request, table):
     categories = objects[table]["categories"].objects.all()
     context = {"categories": categories, "table": table}
-    return render(request, "cantina/categories.html", context)
+    return render_conditional(
+        request, "cantina/categories.html", context, [objects[table]["categories"]]
+    )
 
 
 def add_instance(request, table, id=None, item=None):
@@ -42,22 +90,28 @@ def add_instance(request, table, id=None, item=None):
     item = get_object_or_404(objects["menu"]["model"], pk=item) if item else None
 
     if request.method == "POST":
-        form = objects[table]["form"](data=request.POST)
+        data = request.POST.copy()
+        if not data.get("idempotency_key"):
+            # A key sent as a header is validated like the form field.
+            data["idempotency_key"] = request.headers.get("Idempotency-Key", "")
+        form = objects[table]["form"](data=data)
 
         if form.is_valid():
             if table == "purchases":
-                purchase = form.save(commit=False)
-                purchase.tab = get_tab(request.POST["customer"])
-                purchase.update_amount()
-                purchase.save()
+                place_order(
+                    request.POST["customer"],
+                    [(form.cleaned_data["item"], form.cleaned_data["quantity"])],
+                    form.cleaned_data["idempotency_key"] or None,
+                )
                 return redirect(
                     "cantina:view_category", table="menu", id=item.category.id
                 )
             elif table == "components":
-                form.save()
+                audit.record(form.save(), AuditEntry.CREATE)
                 return redirect("cantina:view", table="menu", id=item.id)
             else:
                 instance = form.save()
+                audit.record(instance, AuditEntry.CREATE)
                 return redirect("cantina:view", table=table, id=instance.id)
     else:
         form = objects[table]["form"](initial={"category": category, "item": item})
@@ -68,12 +122,16 @@ def add_instance(request, table, id=None, item=None):
 
 def edit_instance(request, table, id):
     instance = get_object_or_404(objects[table]["model"], pk=id)
+    before = audit.snapshot(instance)
 
     if request.method == "POST":
         form = objects[table]["form"](instance=instance, data=request.POST)
 
         if form.is_valid():
             form.save()
+            audit.record(instance, AuditEntry.CHANGE, before)
+            if table == "tabs" and instance.closed and not before["closed"]:
+                events.publish("close", [instance.id])
             if table == "components":
                 return redirect("cantina:view", table="menu", id=instance.item.id)
             else:
@@ -87,15 +145,21 @@ def edit_instance(request, table, id):
 
 def edit_purchase(request, id):
     purchase = get_object_or_404(objects["purchases"]["model"], pk=id)
+    previous_tab, previous_amount = purchase.tab, purchase.amount
+    before = audit.snapshot(purchase)
 
     if request.method == "POST":
         form = objects["purchases"]["form"](instance=purchase, data=request.POST)
 
         if form.is_valid():
-            purchase = form.save(commit=False)
-            purchase.tab = get_tab(request.POST["customer"])
-            purchase.update_amount()
-            purchase.save()
+            with transaction.atomic():
+                purchase = form.save(commit=False)
+                purchase.tab = get_tab(request.POST["customer"])
+                purchase.update_amount()
+                purchase.save()
+                tabs.record_purchase_change(purchase, previous_tab, previous_amount)
+                audit.record(purchase, AuditEntry.CHANGE, before)
+                events.publish("purchase", sorted({previous_tab.id, purchase.tab_id}))
             return redirect("cantina:view", table="tabs", id=purchase.tab.id)
     else:
         form = objects["purchases"]["form"](
@@ -106,9 +170,20 @@ def edit_purchase(request, id):
     return render(request, "cantina/edit_instance.html", context)
 
 
+@transaction.atomic
 def delete_instance(request, table, id):
     instance = get_object_or_404(objects[table]["model"], pk=id)
-    instance.delete()
+    audit.record(instance, AuditEntry.DELETE)
+    if table == "purchases":
+        instance.tab.record_entry(TabEntry.VOID, -instance.amount, instance)
+        events.publish("purchase", [instance.tab_id])
+    elif table == "menu":
+        tabs.void_purchases(instance.purchase_set.all())
+
+    if table in ("customers", "tabs"):
+        instance.archive()
+    else:
+        instance.delete()
 
     if table == "purchases":
         return redirect("cantina:view", table="tabs", id=instance.tab.id)
@@ -120,29 +195,258 @@ def delete_instance(request, table, id):
         return redirect("cantina:view_all", table=table)
 
 
+@transaction.atomic
 def comp_purchase(request, id):
     purchase = get_object_or_404(objects["purchases"]["model"], pk=id)
+    before = audit.snapshot(purchase)
+    amount = purchase.amount
     purchase.comp()
     purchase.save()
+    audit.record(purchase, AuditEntry.COMP, before)
+    purchase.tab.record_entry(TabEntry.COMP, -amount, purchase)
+    events.publish("comp", [purchase.tab_id])
 
     return redirect("cantina:view", table="tabs", id=purchase.tab.id)
 
 
+def comp_tab(request, id):
+    tab = get_object_or_404(Tab, pk=id, closed__isnull=True)
+    tabs.comp_all(tab)
+
+    return redirect("cantina:view", table="tabs", id=tab.id)
+
+
+def operate_tab(request, id, operation):
+    tab = get_object_or_404(Tab, pk=id, closed__isnull=True)
+    if operation not in tab_operations:
+        raise Http404(f"Unknown tab operation: {operation}")
+
+    if request.method == "POST":
+        form = tab_operations[operation]["form"](tab, data=request.POST)
+
+        if form.is_valid():
+            result = tab_operations[operation]["function"](tab, **form.cleaned_data)
+            return redirect("cantina:view", table="tabs", id=result.id)
+    else:
+        form = tab_operations[operation]["form"](tab)
+
+    context = {"instance": tab, "form": form, "operation": operation}
+    return render(request, "cantina/operate_tab.html", context)
+
+
+def close_tabs(request):
+    if request.method == "POST":
+        form = CloseOutForm(data=request.POST)
+
+        if form.is_valid():
+            report = tabs.close_out(form.cleaned_data["tabs"] or None)
+            return redirect("cantina:view_shift_report", id=report.id)
+    else:
+        form = CloseOutForm()
+
+    return render(request, "cantina/close_tabs.html", {"form": form})
+
+
+def view_shift_report(request, id):
+    report = get_object_or_404(ShiftReport, pk=id)
+    return render(request, "cantina/shift_report.html", {"instance": report})
+
+
+def view_tab_rows(request):
+    ids = [id for id in request.GET.getlist("tab") if id.isdecimal()]
+    instances = tabs.with_balances(
+        Tab.objects.filter(id__in=ids).select_related("customer")
+    )
+    return render(request, "cantina/tab_rows.html", {"instances": instances})
+
+
+def view_tab_purchases(request, id):
+    tab = get_object_or_404(Tab, pk=id)
+    return render(request, "cantina/tab_purchases.html", {"instance": tab})
+
+
+async def stream_events(request):
+    # A WSGI worker would buffer the endless stream and never respond, so
+    # the stream is only served by the ASGI workers. EventSource gives up
+    # on a 204 instead of reconnecting.
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(events.stream(), content_type="text/event-stream")
+    response["X-Accel-Buffering"] = "no"
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@csrf_exempt
+@require_POST
+def sync_purchases(request):
+    try:
+        orders = json.loads(request.body)["orders"]
+        if not all(isinstance(order, dict) for order in orders):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse(
+            {"error": "Expected a JSON object with a list of orders."}, status=400
+        )
+
+    try:
+        results = sync_orders(orders)
+    except IntegrityError:
+        return JsonResponse(
+            {"error": "Another sync with the same keys is in progress."}, status=409
+        )
+
+    return JsonResponse(results)
+
+
+def view_inventory_valuation(request):
+    context = {"valuation": inventory.get_valuation()}
+    return render(request, "cantina/inventory_valuation.html", context)
+
+
+def count_inventory(request, id):
+    category = get_object_or_404(objects["inventory"]["categories"], pk=id)
+    items = category.inventoryitem_set.all()
+
+    if request.method == "POST":
+        formset = CountSheetFormSet(queryset=items, data=request.POST)
+
+        if formset.is_valid():
+            count = counts.record_count(
+                category,
+                {form.instance.id: form.cleaned_data["stock"] for form in formset},
+            )
+            return redirect("cantina:view_inventory_count", id=count.id)
+    else:
+        formset = CountSheetFormSet(queryset=items)
+
+    context = {"category": category, "formset": formset}
+    return render(request, "cantina/count_inventory.html", context)
+
+
+def view_inventory_count(request, id):
+    count = get_object_or_404(InventoryCount, pk=id)
+    context = {"instance": count, "lines": count.inventorycountline_set.all()}
+    return render(request, "cantina/inventory_count.html", context)
+
+
+def view_shrinkage(request, id):
+    category = get_object_or_404(objects["inventory"]["categories"], pk=id)
+    days = request.GET.get("days", "")
+    try:
+        since = (
+            timezone.now() - timezone.timedelta(days=int(days))
+            if days.isdecimal()
+            else None
+        )
+    except OverflowError:
+        since = None
+
+    context = {"category": category, "periods": counts.shrinkage(category, since)}
+    return render(request, "cantina/shrinkage.html", context)
+
+
+def view_stock_levels(request, id):
+    item = get_object_or_404(objects["inventory"]["model"], pk=id)
+    try:
+        end = parse_datetime(request.GET.get("end", "")) or timezone.now()
+        start = parse_datetime(
+            request.GET.get("start", "")
+        ) or end - timezone.timedelta(days=7)
+        if timezone.is_naive(start) or timezone.is_naive(end):
+            raise ValueError
+    except ValueError:
+        return JsonResponse(
+            {"error": "Expected ISO 8601 start and end times with a UTC offset."},
+            status=400,
+        )
+
+    points = stocklevels.series(item.id, start, end)
+    return JsonResponse(
+        {
+            "item": item.id,
+            "levels": [
+                [time.isoformat(), None if level is None else str(level)]
+                for time, level in points
+            ],
+        }
+    )
+
+
+def plan_event(request):
+    plan = None
+
+    if request.method == "POST":
+        form = EventPlanForm(data=request.POST)
+
+        if form.is_valid():
+            plan = inventory.plan_requirements(form.get_order_mix())
+    else:
+        form = EventPlanForm()
+
+    context = {"form": form, "plan": plan}
+    return render(request, "cantina/plan_event.html", context)
+
+
+def view_menu_snapshot(request):
+    version = menu.latest_version()
+    etag = quote_etag(str(version))
+    response = get_conditional_response(request, etag=etag)
+
+    if response is None:
+        since = request.GET.get("since", "")
+        delta = menu.get_delta(int(since), version) if since.isdigit() else None
+        if delta is not None:
+            response = JsonResponse({"version": version, "since": int(since), **delta})
+        else:
+            response = JsonResponse({"version": version, **menu.get_document(version)})
+
+    response["ETag"] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def view_metrics(request):
+    return HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@staff_member_required
+def view_querylog(request):
+    lines = [f"{'count':>8} {'total':>10} {'max':>8}  view [table]: fingerprint"]
+    for entry in querylog.top():
+        lines.append(
+            f"{entry.count:>8} {entry.seconds:>10.4f} {entry.max_seconds:>8.4f}  "
+            f"{entry.view} [{entry.table}]: {entry.fingerprint}"
+        )
+    if "dump" in request.GET:
+        querylog.dump()
+
+    return HttpResponse("\n".join(lines) + "\n", content_type="text/plain")
+
+
 ########################################################################
 #                                                                      #
 #                           HELPER FUNCTIONS                           #
 #                                                                      #
 ########################################################################
-def get_tab(customer: int) -> Tab:
+def render_conditional(request, template: str, context: dict, models: list):
     """
-    Return customer's open tab or, if the customer does not currently
-    have an open tab, create one and return.
+    Render a template with Last-Modified and ETag headers computed from
+    the rows of the given models and the deployed build, answering with
+    304 Not Modified without rendering when the client's copy is still
+    current.
     """
-    customer = Customer.objects.get(pk=customer)
-    try:
-        tab = customer.tab_set.get(closed__isnull=True)
-    except Tab.DoesNotExist:
-        tab = Tab.objects.create(customer=customer)
-        tab.save()
-
-    return tab
+    latest, version = get_version(models)
+    etag = quote_etag(f"{version}-{settings.BUILD_ID}")
+    last_modified = int(max(latest.timestamp() if latest else 0, settings.BUILD_TIME))
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    if response is None:
+        response = render(request, template, context)
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+    return response
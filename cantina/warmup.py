@@ -0,0 +1,73 @@
+import pathlib
+
+from django.core.cache import caches
+from django.db import connections
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.template.utils import get_app_template_dirs
+from django.urls import URLPattern, get_resolver
+
+
+def warm_up() -> dict:
+    """
+    Do the work a worker would otherwise do lazily while serving its
+    first requests: import every view through the URLconf, resolve
+    every URL name, compile every template and open the database and
+    cache connections. Return the number of each thing warmed.
+    """
+    return {
+        "urls": warm_urls(),
+        "templates": warm_templates(),
+        "connections": warm_connections(),
+    }
+
+
+def warm_urls(resolver=None) -> int:
+    """
+    Import the URLconf, compile the pattern of every URL and populate
+    the reverse lookup tables. Return the number of named URLs.
+    """
+    resolver = resolver or get_resolver()
+    # Both attributes are computed and cached on first access.
+    resolver.reverse_dict
+    count = 0
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex
+        if isinstance(pattern, URLPattern):
+            count += bool(pattern.name)
+        else:
+            count += warm_urls(pattern)
+    return count
+
+
+def warm_templates() -> int:
+    """
+    Compile every template found by the Django template engines so
+    they are held by the cached loader. Return the number compiled.
+    """
+    count = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        directories = [*engine.engine.dirs, *get_app_template_dirs("templates")]
+        names = {
+            path.relative_to(directory).as_posix()
+            for directory in map(pathlib.Path, directories)
+            for path in directory.rglob("*.html")
+        }
+        for name in names:
+            engine.get_template(name)
+        count += len(names)
+    return count
+
+
+def warm_connections() -> int:
+    """
+    Open a connection to every database and cache. Return the number
+    of connections opened.
+    """
+    for connection in connections.all():
+        connection.ensure_connection()
+    for cache in caches.all():
+        cache.get("warmup")
+    return len(connections.all()) + len(caches.all())
@@ -9,6 +9,9 @@ https://docs.djangoproject.com/en/5.0/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
+
+import os
+import time
 from pathlib import Path
 from . import config
 
@@ -41,11 +44,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "cantina.middleware.MetricsMiddleware",
+    "cantina.middleware.QueryLogMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "cantina.middleware.StaticFilesMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "cantina.middleware.AuditMiddleware",
+    "cantina.middleware.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -54,10 +62,18 @@ ROOT_URLCONF = "cosmos_cantina.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "cantina.templating.TimedDjangoTemplates",
         "DIRS": [],
-        "APP_DIRS": True,
         "OPTIONS": {
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
+            ],
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
@@ -82,6 +98,8 @@ DATABASES = {
         "PASSWORD": config.DB_PASSWORD,
         "HOST": config.DB_HOST,
         "PORT": config.DB_PORT,
+        "CONN_MAX_AGE": 60,
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
@@ -122,6 +140,95 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+# Outside of development, `manage.py collectstatic` writes content-hashed
+# copies of every file along with gzip (and brotli) variants, which are
+# served with far-future cache headers by StaticFilesMiddleware.
+
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage"
+            if DEBUG
+            else "cantina.storage.CompressedManifestStaticFilesStorage"
+        ),
+    },
+}
+
+# Request profiling
+# Staff can profile a request by adding ?profile to its URL; terminals
+# can send a token from `manage.py profile_token` in X-Cantina-Profile.
+
+PROFILE_DIR = BASE_DIR / "profiles"
+
+PROFILE_TOKEN_MAX_AGE = 60 * 60
+
+PROFILE_TRACEBACK_LIMIT = 1
+
+# Query log
+# Queries are fingerprinted per view and table; the top offenders are
+# shown at /querylog and dumped to QUERYLOG_FILE periodically.
+
+QUERYLOG_FILE = BASE_DIR / "querylog.json"
+
+QUERYLOG_DUMP_INTERVAL = 5 * 60
+
+QUERYLOG_MAX_FINGERPRINTS = 1000
+
+QUERYLOG_SLOW_SECONDS = 0.1
+
+# Menu snapshots
+# Number of published menu versions kept for terminals requesting deltas.
+
+MENU_SNAPSHOT_HISTORY = 50
+
+# Inventory
+# Inventory is stocked in bottles while recipes are measured in ounces.
+
+OUNCES_PER_BOTTLE = "25.36"
+
+# Usage beyond this fraction of what recipes account for is flagged as an
+# over or under pour in shrinkage reports.
+
+SHRINKAGE_TOLERANCE = "0.05"
+
+# Demand forecasting
+# Smoothing factors for the level and weekday seasons of daily usage, and
+# the days of usage covered by reorder points and reorder amounts.
+
+FORECAST_ALPHA = 0.3
+
+FORECAST_GAMMA = 0.1
+
+REORDER_LEAD_DAYS = 3
+
+REORDER_CYCLE_DAYS = 7
+
+REORDER_SAFETY_FACTOR = 1.65
+
+# Live events
+# Seconds between keepalive comments on a quiet stream and before a client
+# or listener reconnects, and the events a slow stream may fall behind by.
+
+EVENTS_KEEPALIVE = 15
+
+EVENTS_RETRY = 3
+
+EVENTS_QUEUE_SIZE = 100
+
+# Conditional pages
+# The deployed code and templates are part of the ETag and Last-Modified
+# time of pages, so browsers fetch them again after a deploy. Set
+# CANTINA_BUILD_ID to the release; it defaults to when the process started.
+
+BUILD_TIME = time.time()
+
+BUILD_ID = os.environ.get("CANTINA_BUILD_ID", str(int(BUILD_TIME)))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
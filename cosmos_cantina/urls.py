@@ -17,7 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from cantina import views
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", views.view_metrics, name="metrics"),
+    path("querylog", views.view_querylog, name="querylog"),
     path("", include("cantina.urls")),
 ]
@@ -0,0 +1,16 @@
+wsgi_app = "cosmos_cantina.wsgi:application"
+
+
+def post_worker_init(worker):
+    """
+    Warm up each worker once it has loaded the application, before it
+    accepts any requests.
+    """
+    from cantina.warmup import warm_up
+
+    counts = warm_up()
+    worker.log.info(
+        "Warmed %(urls)s URLs, %(templates)s templates and %(connections)s "
+        "connections.",
+        counts,
+    )
@@ -0,0 +1,7 @@
+# The live event stream holds a connection open per screen, so it is served
+# by ASGI workers, alongside the WSGI workers configured in gunicorn.conf.py.
+# Route requests for /events/ to these workers and disable proxy buffering.
+# Without that route the WSGI workers answer /events/ with 204 No Content,
+# which stops pages from listening, and screens only update on reload.
+wsgi_app = "cosmos_cantina.asgi:application"
+worker_class = "uvicorn.workers.UvicornWorker"